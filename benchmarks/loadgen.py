@@ -0,0 +1,329 @@
+"""
+Replay request traces against an OpenAI-compatible endpoint (the real gateway or
+mock_inference) at a fixed concurrency and report latency, time to first token,
+throughput and payload sizes per service.
+
+    python benchmarks/loadgen.py run benchmarks/traces/demo.jsonl \
+        --target http://localhost:8090/v1 --concurrency 8 --requests 200 --output results.json
+    python benchmarks/loadgen.py run benchmarks/traces/extraction_api.jsonl --api-target http://localhost:8000
+    python benchmarks/loadgen.py compare baseline.json results.json
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def load_file_images(path, max_pages):
+    """Return JPEG/PNG bytes for an image file, or rendered pages for a PDF."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:4] != b'%PDF':
+        return [data]
+
+    import fitz  # PyMuPDF, only needed for PDF traces
+
+    images = []
+    with fitz.open(stream=data, filetype="pdf") as pdf_document:
+        for index in range(min(pdf_document.page_count, max_pages)):
+            pix = pdf_document[index].get_pixmap(matrix=fitz.Matrix(2, 2))
+            images.append(pix.tobytes("jpeg"))
+    return images
+
+
+def image_mime_type(image_bytes):
+    if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        return "image/png"
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return "image/webp"
+    return "image/jpeg"
+
+
+def multipart_body(fields, file_path):
+    """Encode form fields and one file upload as (body bytes, content type)."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                 f'filename="{os.path.basename(file_path)}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def build_request(record, trace_dir, default_model):
+    """
+    Turn a trace record into (service, url path, body bytes, content type, stream flag).
+    Record kinds:
+        chat   - "messages" sent as-is
+        vision - "prompt" plus "files" (images or PDFs, relative to the trace file)
+        upload - "file" and form "fields" posted to an extraction API "path"
+    """
+    kind = record.get("kind", "chat")
+    if kind == "upload":
+        fields = dict(record.get("fields", {}))
+        stream = record.get("stream", True)
+        fields["stream"] = "true" if stream else "false"
+        body, content_type = multipart_body(fields, os.path.join(trace_dir, record["file"]))
+        return record.get("service", kind), record["path"], body, content_type, stream
+    if kind == "chat":
+        messages = record["messages"]
+    elif kind == "vision":
+        content = [{"type": "text", "text": record["prompt"]}]
+        for name in record.get("files", []):
+            for image in load_file_images(os.path.join(trace_dir, name), record.get("max_pages", 30)):
+                content.append({
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{image_mime_type(image)};base64,{base64.b64encode(image).decode()}"}
+                })
+        messages = [{"role": "user", "content": content}]
+    else:
+        raise ValueError(f"unknown trace record kind '{kind}'")
+
+    stream = record.get("stream", True)
+    body = {
+        "model": record.get("model") or default_model,
+        "messages": messages,
+        "max_tokens": record.get("max_tokens", 1024),
+        "temperature": record.get("temperature", 0.1),
+        "stream": stream
+    }
+    if stream:
+        body["stream_options"] = {"include_usage": True}
+    return (record.get("service", kind), record.get("path", "/chat/completions"), json.dumps(body).encode(),
+            "application/json", stream)
+
+
+def send(session, url, headers, body, stream, timeout):
+    """
+    Send one request. Returns a sample dict with timings and sizes. Streams are
+    OpenAI-style "data:" chunks, or the extraction APIs' "token"/"result" events.
+    """
+    sample = {"request_bytes": len(body), "response_bytes": 0, "ttft": None, "error": None, "usage": None}
+    start = time.perf_counter()
+    try:
+        with session.post(url, headers=headers, data=body, stream=stream, timeout=timeout) as response:
+            if response.status_code >= 400:
+                sample["error"] = f"HTTP {response.status_code}"
+                sample["response_bytes"] = len(response.content)
+            elif stream:
+                event = None
+                for line in response.iter_lines():
+                    sample["response_bytes"] += len(line) + 1
+                    if line.startswith(b"event:"):
+                        event = line[6:].strip()
+                        if event == b"token" and sample["ttft"] is None:
+                            sample["ttft"] = time.perf_counter() - start
+                        continue
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if event == b"error":
+                        sample["error"] = "stream error"
+                    if event is not None:
+                        if event != b"token":
+                            sample["usage"] = chunk.get("usage")
+                        continue
+                    if chunk.get("usage"):
+                        sample["usage"] = chunk["usage"]
+                    if sample["ttft"] is None and any(
+                            (choice.get("delta") or {}).get("content") for choice in chunk.get("choices") or []):
+                        sample["ttft"] = time.perf_counter() - start
+            else:
+                sample["response_bytes"] = len(response.content)
+                sample["usage"] = response.json().get("usage")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        sample["error"] = type(e).__name__
+    sample["latency"] = time.perf_counter() - start
+    return sample
+
+
+def summarize(samples, wall_seconds):
+    ok = [sample for sample in samples if not sample["error"]]
+    latencies = [sample["latency"] * 1000 for sample in ok]
+    ttfts = [sample["ttft"] * 1000 for sample in ok if sample["ttft"] is not None]
+    errors = {}
+    for sample in samples:
+        if sample["error"]:
+            errors[sample["error"]] = errors.get(sample["error"], 0) + 1
+    completion_tokens = sum((sample["usage"] or {}).get("completion_tokens", 0) for sample in ok)
+
+    def stats(values):
+        return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+                "mean": sum(values) / len(values) if values else None}
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "latency_ms": stats(latencies),
+        "ttft_ms": stats(ttfts),
+        "throughput_rps": len(ok) / wall_seconds if wall_seconds else None,
+        "completion_tokens_per_s": completion_tokens / wall_seconds if wall_seconds else None,
+        "request_kb": stats([sample["request_bytes"] / 1024 for sample in samples]),
+        "response_kb": stats([sample["response_bytes"] / 1024 for sample in ok]),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    trace_dir = os.path.dirname(os.path.abspath(args.trace))
+    with open(args.trace, 'r') as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    if args.service:
+        records = [record for record in records if record.get("service") in args.service]
+    if not records:
+        sys.exit("No trace records to replay")
+
+    # Encode every body once so the generator measures the server, not itself
+    prepared = [build_request(record, trace_dir, args.model) for record in records]
+    total = args.requests or len(prepared)
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=args.concurrency, pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    samples = {}
+    lock = threading.Lock()
+
+    def worker(index):
+        service, path, body, content_type, stream = prepared[index % len(prepared)]
+        headers = {"Content-Type": content_type}
+        if content_type.startswith("multipart/"):
+            # Extraction API uploads go through nginx and use the service's own upstream key
+            target = args.api_target
+        else:
+            target = args.target
+            headers["Authorization"] = f"Bearer {args.api_key}"
+        sample = send(session, f"{target.rstrip('/')}{path}", headers, body, stream, args.timeout)
+        with lock:
+            samples.setdefault(service, []).append(sample)
+
+    print(f"Replaying {total} requests from {len(prepared)} trace records at concurrency {args.concurrency}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(total)))
+    wall_seconds = time.perf_counter() - start
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "trace": args.trace,
+            "target": args.target,
+            "api_target": args.api_target,
+            "concurrency": args.concurrency,
+            "requests": total,
+            "wall_seconds": wall_seconds
+        },
+        "services": {service: summarize(service_samples, wall_seconds) for service, service_samples in samples.items()}
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def fmt(value, digits=0):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def print_results(results):
+    print(f"{'service':<12}{'reqs':>6}{'errs':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'ttft p50':>10}{'rps':>8}{'req KB':>9}")
+    for service, summary in sorted(results["services"].items()):
+        print(f"{service:<12}{summary['requests']:>6}{sum(summary['errors'].values()):>6}"
+              f"{fmt(summary['latency_ms']['p50']):>9}{fmt(summary['latency_ms']['p95']):>9}"
+              f"{fmt(summary['latency_ms']['p99']):>9}{fmt(summary['ttft_ms']['p50']):>10}"
+              f"{fmt(summary['throughput_rps'], 2):>8}{fmt(summary['request_kb']['p50'], 1):>9}")
+
+
+def compare(args):
+    """Print per-service changes in the headline metrics between two result files."""
+    with open(args.baseline, 'r') as file:
+        baseline = json.load(file)
+    with open(args.candidate, 'r') as file:
+        candidate = json.load(file)
+
+    metrics = [("latency_ms", "p50"), ("latency_ms", "p95"), ("latency_ms", "p99"), ("ttft_ms", "p50"),
+               ("request_kb", "p50")]
+    print(f"baseline {baseline['meta'].get('commit')} -> candidate {candidate['meta'].get('commit')}")
+    for service in sorted(set(baseline["services"]) | set(candidate["services"])):
+        old = baseline["services"].get(service)
+        new = candidate["services"].get(service)
+        if not old or not new:
+            print(f"{service}: only in {'candidate' if new else 'baseline'}")
+            continue
+        parts = []
+        for group, key in metrics + [("throughput_rps", None)]:
+            before = old[group][key] if key else old[group]
+            after = new[group][key] if key else new[group]
+            label = f"{group.split('_')[0]} {key}" if key else "rps"
+            if before and after is not None:
+                parts.append(f"{label} {fmt(before, 1)}->{fmt(after, 1)} ({(after - before) / before * 100:+.1f}%)")
+        print(f"{service}: " + ", ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="replay a trace")
+    run_parser.add_argument("trace", help="JSONL trace file")
+    run_parser.add_argument("--target", default=os.environ.get("API_ENDPOINT", "http://localhost:8090/v1"),
+                            help="OpenAI-compatible base URL (default: $API_ENDPOINT or the local mock)")
+    run_parser.add_argument("--api-target", default="http://localhost:8000",
+                            help="base URL for extraction API upload records (default: local nginx)")
+    run_parser.add_argument("--api-key", default=os.environ.get("API_KEY", "mock"))
+    run_parser.add_argument("--model", default=os.environ.get("MODEL_NAME", "llama-vision"),
+                            help="model for records that do not name one")
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument("--requests", type=int, default=0, help="total requests (default: one pass over the trace)")
+    run_parser.add_argument("--service", action="append", help="only replay records for this service (repeatable)")
+    run_parser.add_argument("--timeout", type=float, default=300)
+    run_parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Measure the transient memory of building and sending one vision request body,
+comparing the old path (base64 string, data URL, json.dumps, encode) with the
+streamed ChatRequestBody the OCR and healthcare apps now send.
+
+    python benchmarks/memory.py --sizes 1 5 20
+    python benchmarks/memory.py --sizes 20 --target http://localhost:8090/v1 --output memory.json
+
+Peak memory is measured with tracemalloc, above the image buffer itself. Without
+--target the body is read in 16 KiB blocks, as urllib3 reads it; with --target it
+is POSTed to the endpoint (mock_inference) through requests.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "healthcare", "src"))
+
+from utils.request_body import ChatRequestBody, InlineImage  # noqa: E402
+
+BLOCK_SIZE = 16384
+MIB = 1024 * 1024
+
+
+def payload(image_url, model):
+    return {
+        "model": model,
+        "messages": [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "Extract all text from this document."},
+                {"type": "image_url", "image_url": {"url": image_url}}
+            ]
+        }],
+        "max_tokens": 16,
+        "stream": False,
+        "temperature": 0.0
+    }
+
+
+def legacy_body(image, model):
+    image_b64 = base64.b64encode(image).decode()
+    return json.dumps(payload(f"data:image/jpeg;base64,{image_b64}", model)).encode()
+
+
+def streamed_body(image, model):
+    return ChatRequestBody(payload(InlineImage(image, "image/jpeg"), model))
+
+
+def consume(body):
+    """Read the body the way the HTTP client does; returns the bytes seen."""
+    if isinstance(body, bytes):
+        # requests hands bytes to the socket as they are
+        return len(body)
+    total = 0
+    while True:
+        block = body.read(BLOCK_SIZE)
+        if not block:
+            return total
+        total += len(block)
+
+
+def measure(build, image, model, session=None, target=None):
+    """Return (peak bytes above baseline, seconds, body size) for one request body."""
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started_at = time.perf_counter()
+    body = build(image, model)
+    size = len(body)
+    if session is not None:
+        response = session.post(target.rstrip('/') + "/chat/completions", data=body,
+                                headers={"Content-Type": "application/json", "Authorization": "Bearer mock"})
+        response.raise_for_status()
+    else:
+        consume(body)
+    elapsed = time.perf_counter() - started_at
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    del body
+    return peak, elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 5, 20], help="image sizes in MiB")
+    parser.add_argument("--target", help="POST each body to this OpenAI-compatible endpoint")
+    parser.add_argument("--model", default=os.environ.get("VISION_MODEL_NAME", "llama-vision"))
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args()
+
+    session = None
+    if args.target:
+        import requests
+
+        session = requests.Session()
+
+    tracemalloc.start()
+    results = []
+    print(f"{'image':>9} {'body':>9} {'legacy peak':>12} {'streamed peak':>14} {'legacy s':>9} {'streamed s':>11}")
+    for size_mib in args.sizes:
+        image = os.urandom(int(size_mib * MIB))
+        legacy_peak, legacy_s, body_size = measure(legacy_body, image, args.model, session, args.target)
+        streamed_peak, streamed_s, streamed_size = measure(streamed_body, image, args.model, session, args.target)
+        assert streamed_size == body_size, "streamed body size differs from json.dumps"
+        results.append({
+            "image_mib": size_mib,
+            "body_mib": round(body_size / MIB, 2),
+            "legacy_peak_mib": round(legacy_peak / MIB, 2),
+            "streamed_peak_mib": round(streamed_peak / MIB, 2),
+            "legacy_s": round(legacy_s, 3),
+            "streamed_s": round(streamed_s, 3),
+        })
+        row = results[-1]
+        print(f"{size_mib:>7.1f}MB {row['body_mib']:>7.1f}MB {row['legacy_peak_mib']:>10.1f}MB "
+              f"{row['streamed_peak_mib']:>12.2f}MB {row['legacy_s']:>9.3f} {row['streamed_s']:>11.3f}")
+        del image
+    tracemalloc.stop()
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({"target": args.target, "block_size": BLOCK_SIZE, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
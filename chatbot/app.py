@@ -1,21 +1,21 @@
 import streamlit as st
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain.memory import ConversationBufferMemory
-from langchain.callbacks.base import BaseCallbackHandler
 import os
+import time
 from decouple import config
-from tools import load_system_messages, fetch_available_models
+from tools import (PROMPT_CACHE_HINTS, cached_prompt_tokens, get_chat_model, load_system_messages,
+                   prompt_cache_options, retrieval_query, retrieved_context, static_system_message)
+from history import ConversationHistory
+from session_store import current_session, get_session_store
+from metrics import start_metrics_server
+from model_catalog import describe_model, get_model_catalog
+from startup import prewarm, record_startup
 
+# Prometheus metrics for this container, started once per process
+start_metrics_server()
 
-class StreamHandler(BaseCallbackHandler):
-    def __init__(self, container, initial_text=""):
-        self.container = container
-        self.text = initial_text
-
-    def on_llm_new_token(self, token: str, **kwargs) -> None:
-        self.text += token
-        self.container.markdown(self.text)
+# LangChain loads in the background while the page paints; the first chat turn waits for it if needed
+prewarm("model_catalog:warm_model_catalog", "tools:warm_context_index", "langchain_openai",
+        "langchain_core.messages", "stream_handler", "tiktoken")
 
 system_messages = load_system_messages()
 
@@ -30,27 +30,12 @@ if api_endpoint and api_endpoint.endswith('/chat/completions'):
 api_key = st.sidebar.text_input('API Key', type='password', value=config('API_KEY', default=''))
 # Dynamic model selection with API integration
 if api_endpoint and api_key:
-    # Initialize session state for cached models
-    if 'cached_models' not in st.session_state:
-        st.session_state.cached_models = []
-        st.session_state.models_fetched = False
-        st.session_state.last_endpoint = ""
-        st.session_state.last_api_key = ""
-    
-    # Check if we need to refresh models (endpoint or key changed)
-    if (st.session_state.last_endpoint != api_endpoint or 
-        st.session_state.last_api_key != api_key or 
-        not st.session_state.models_fetched):
-        
-        with st.sidebar:
-            with st.spinner("Fetching available models..."):
-                st.session_state.cached_models = fetch_available_models(api_endpoint, api_key)
-                st.session_state.models_fetched = True
-                st.session_state.last_endpoint = api_endpoint
-                st.session_state.last_api_key = api_key
-    
+    # Shared by all sessions and refreshed in the background; only the first lookup for an endpoint waits
+    catalog = get_model_catalog().get(api_endpoint, api_key)
+    models = {model["id"]: model for model in catalog["models"]}
+
     # Use available models or fallback to default
-    available_models = st.session_state.cached_models
+    available_models = list(models)
     if available_models:
         # Default selection
         default_model = config('MODEL_NAME', default='llama-vision-llama-3-1')
@@ -65,8 +50,14 @@ if api_endpoint and api_key:
             index=default_index,
             help="Choose from available endpoints"
         )
+        st.sidebar.caption(describe_model(models[model_name]))
     else:
-        st.sidebar.warning("No models found. Please check your API credentials.")
+        if catalog["loading"]:
+            st.sidebar.info("Fetching available models...")
+        elif catalog["error"]:
+            st.sidebar.error(catalog["error"])
+        else:
+            st.sidebar.warning("No models found. Please check your API credentials.")
         model_name = config('MODEL_NAME', default='llama-vision-llama-3-1')
         
 else:
@@ -90,9 +81,13 @@ option = st.sidebar.selectbox(
 
 system_message = st.sidebar.text_area("System Message", value=system_messages.get(option))
 
+# Conversation of this tab, reloaded from the session store after a page reload
+session_store = get_session_store()
+chat_session = current_session()
+
 # Clear chat button
 if st.sidebar.button("Clear Chat"):
-    st.session_state.messages = []
+    session_store.clear(chat_session)
     st.rerun()
 
 # Check if required fields are filled
@@ -112,45 +107,54 @@ if os.path.exists(logo_path):
 else:
     st.warning("Logo file not found. Please ensure 'ntnx_logo.png' is in the same directory as this script.")
 
-# Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
 # Display chat messages
-for message in st.session_state.messages:
+for message in chat_session.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
 # Chat input - only enable if required fields are valid
 if required_fields_valid:
     if prompt := st.chat_input("You:"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        session_store.append(chat_session, {"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
 
         try:
-            # Initialize ChatOpenAI and memory
-            llm = ChatOpenAI(
-                openai_api_key=api_key,
-                model_name=model_name,
-                openai_api_base=api_endpoint,
-                temperature=temperature,
-                streaming=True
-            )
-            memory = ConversationBufferMemory(return_messages=True)
-
-            # Generate AI response
-            messages = [
-                SystemMessage(content=system_message)
-            ] + [HumanMessage(content=msg["content"]) if msg["role"] == "user" else AIMessage(content=msg["content"]) for msg in st.session_state.messages]
+            # Reuse the ChatOpenAI client for this endpoint, key, model and temperature
+            llm = get_chat_model(api_endpoint, api_key, model_name, temperature)
+
+            # Generate AI response from the system message, rolling summary and recent turns. The
+            # system message is the same on every turn; this turn's retrieved context goes last
+            static_message = static_system_message(system_message)
+            context = retrieved_context(system_message, retrieval_query(chat_session.messages))
+            history = ConversationHistory.from_state(chat_session.state.get("history"))
+            messages = history.build_messages(static_message, chat_session.messages, llm, context=context,
+                                              cache_hint=PROMPT_CACHE_HINTS)
+            if history.to_state() != chat_session.state.get("history"):
+                session_store.save_state(chat_session, {"history": history.to_state()})
             with st.chat_message("assistant"):
+                from stream_handler import StreamHandler
+
                 stream_handler = StreamHandler(st.empty())
-                response = llm(messages, callbacks=[stream_handler])
-                st.session_state.messages.append({"role": "assistant", "content": stream_handler.text})
+                started_at = time.perf_counter()
+                response = llm(messages, callbacks=[stream_handler], **prompt_cache_options(static_message))
+                # Measured latency per model, shown in the sidebar and kept for routing
+                get_model_catalog().record_latency(
+                    api_endpoint, model_name,
+                    ttft=stream_handler.first_token_at - started_at if stream_handler.first_token_at else None,
+                    total=time.perf_counter() - started_at
+                )
+                session_store.append(chat_session, {"role": "assistant", "content": stream_handler.text})
+
+                prompt_tokens, cached_tokens = cached_prompt_tokens(response)
+                if prompt_tokens and cached_tokens is not None:
+                    st.caption(f"Prompt: {prompt_tokens} tokens, {cached_tokens} from the prefix cache")
         
         except Exception as e:
             st.error("An error occurred while connecting to the API. Please check your API endpoint and credentials.")
             # Optionally log the error for debugging purposes
             # print(e)
 
+record_startup("first_render")
+
 # Run the app: streamlit run chatbot_app.py
\ No newline at end of file
@@ -0,0 +1,184 @@
+import logging
+from functools import lru_cache
+
+from decouple import config
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Tokens of conversation history (summary, retrieved context and verbatim turns) sent with each request
+HISTORY_TOKEN_BUDGET = config('HISTORY_TOKEN_BUDGET', default=4000, cast=int)
+# Most recent user/assistant turns kept verbatim, budget permitting
+HISTORY_MAX_TURNS = config('HISTORY_MAX_TURNS', default=10, cast=int)
+# Once the verbatim window overflows, it is folded down to this fraction of the budget and turn
+# limit, so a summary call happens every few turns rather than on every turn
+HISTORY_FOLD_RATIO = config('HISTORY_FOLD_RATIO', default=0.5, cast=float)
+HISTORY_SUMMARY_MAX_TOKENS = config('HISTORY_SUMMARY_MAX_TOKENS', default=300, cast=int)
+HISTORY_TOKEN_ENCODING = config('HISTORY_TOKEN_ENCODING', default='cl100k_base')
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an assistant.
+Keep every fact, decision, name, number and open question that later turns may depend on.
+Write at most {max_tokens} tokens of plain prose.
+
+Current summary:
+{summary}
+
+New conversation turns to fold in:
+{turns}
+
+Updated summary:"""
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(HISTORY_TOKEN_ENCODING)
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; containers may be offline
+        logger.warning(f"tiktoken unavailable ({str(e)}), estimating tokens from length")
+        return None
+
+
+def count_tokens(text):
+    """Count the tokens in text, estimating 4 characters per token without tiktoken."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message):
+    """Return the token count of a chat message dict, computing it once."""
+    if "tokens" not in message:
+        message["tokens"] = count_tokens(message["content"])
+    return message["tokens"]
+
+
+class ConversationHistory:
+    """
+    Per-session history state: a rolling summary of the turns that no longer fit the
+    token budget, and the index of the first message not yet folded into it.
+    """
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, max_turns=HISTORY_MAX_TURNS,
+                 summary_max_tokens=HISTORY_SUMMARY_MAX_TOKENS):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summarized_upto = 0
+        self.last_context_tokens = 0
+
+    def to_state(self):
+        """The summary state, as a JSON-serializable dict for the session store."""
+        return {"summary": self.summary, "summary_tokens": self.summary_tokens,
+                "summarized_upto": self.summarized_upto}
+
+    @classmethod
+    def from_state(cls, state):
+        """A history restored from to_state(), or a fresh one for None."""
+        history = cls()
+        if state:
+            history.summary = state.get("summary", "")
+            history.summary_tokens = state.get("summary_tokens", 0)
+            history.summarized_upto = state.get("summarized_upto", 0)
+        return history
+
+    def _window_start(self, messages, ratio=1.0, context_tokens=0):
+        """
+        Index of the oldest message that fits in the verbatim window, scaled by ratio,
+        after the summary and this turn's retrieved context are taken out of the budget.
+        The window always starts on a user message, as strict-alternation chat templates require.
+        """
+        budget = (self.token_budget - self.summary_tokens - context_tokens) * ratio
+        max_messages = max(2, int(self.max_turns * 2 * ratio))
+        start = len(messages)
+        used = 0
+        while start > self.summarized_upto:
+            tokens = message_tokens(messages[start - 1])
+            # The latest message is always sent, even if it alone exceeds the budget
+            if start < len(messages) and (used + tokens > budget or len(messages) - start >= max_messages):
+                break
+            used += tokens
+            start -= 1
+        while start < len(messages) - 1 and messages[start]["role"] != "user":
+            start += 1
+        return start
+
+    def _fold_into_summary(self, llm, messages):
+        from langchain_core.messages import HumanMessage
+
+        turns = "\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in messages)
+        prompt = SUMMARY_PROMPT.format(
+            max_tokens=self.summary_max_tokens,
+            summary=self.summary or "(empty)",
+            turns=turns
+        )
+        with span("history_summary"):
+            response = llm.invoke([HumanMessage(content=prompt)])
+        self.summary = response.content.strip()
+        self.summary_tokens = count_tokens(self.summary)
+
+    def build_messages(self, system_message, messages, llm, context="", cache_hint=False):
+        """
+        Assemble the request messages: system prompt, rolling summary, then as many
+        recent turns as fit the token budget, less the retrieved context. When the turns overflow the budget or
+        turn limit, the oldest are folded into the summary in one batch, down to
+        HISTORY_FOLD_RATIO of the limits, so earlier turns are never re-summarized
+        and most turns need no summary call.
+        Between folds the summary and the start of the window stay byte-identical
+        and everything that changes per turn comes last, so consecutive requests
+        share the whole earlier conversation as a prefix for the server's cache.
+        Args:
+            system_message (str): System prompt, identical on every turn
+            messages (list): Session messages as {"role", "content"} dicts, oldest first
+            llm: Chat model used to update the summary
+            context (str): Retrieved context for this turn, sent with the latest user message
+            cache_hint (bool): Mark the system prompt as a cacheable prefix (cache_control)
+        Returns:
+            list: LangChain messages for the request
+        """
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+        context_tokens = count_tokens(context) if context else 0
+        start = self._window_start(messages, context_tokens=context_tokens)
+        if start > self.summarized_upto:
+            # Over the budget or turn limit: fold down to the low-water mark, not just below the limit,
+            # so the next fold (and its summary call) is several turns away
+            fold_upto = max(start, self._window_start(messages, HISTORY_FOLD_RATIO, context_tokens))
+            try:
+                self._fold_into_summary(llm, messages[self.summarized_upto:fold_upto])
+                self.summarized_upto = fold_upto
+                logger.info(f"Folded history up to message {fold_upto} into a {self.summary_tokens}-token summary")
+                # A longer summary leaves less room for verbatim turns
+                start = max(self._window_start(messages, context_tokens=context_tokens), fold_upto)
+            except Exception as e:
+                # The turns stay unsummarized and the fold is retried next turn; only this request
+                # leaves out what does not fit the budget
+                logger.error(f"Error summarizing conversation history, messages {self.summarized_upto}-"
+                             f"{start - 1} left out of this request only: {str(e)}")
+
+        if cache_hint:
+            request = [SystemMessage(content=[
+                {"type": "text", "text": system_message, "cache_control": {"type": "ephemeral"}}
+            ])]
+        else:
+            request = [SystemMessage(content=system_message)]
+        if self.summary:
+            request.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for index, message in enumerate(messages[start:], start):
+            if message["role"] == "user":
+                content = message["content"]
+                if context and index == len(messages) - 1:
+                    # Not stored with the message, so earlier turns stay byte-identical in later requests
+                    content = f"Reference context:\n{context}\n\n----\n\n{content}"
+                request.append(HumanMessage(content=content))
+            else:
+                request.append(AIMessage(content=message["content"]))
+
+        self.last_context_tokens = (self.summary_tokens + context_tokens +
+                                    sum(message_tokens(m) for m in messages[start:]))
+        return request
@@ -0,0 +1,256 @@
+# Shared module: chatbot/metrics.py is the canonical copy. Edit it there and run
+# "bash sync_shared.sh" to update the copies in the other apps (see README.md).
+"""
+Process-wide counters and histograms rendered in the Prometheus text format, and
+span() timers for the stages of a request (preprocess, render, encode, HTTP
+request, first and last token). Each container serves its metrics on
+METRICS_PORT; the HTTP APIs also expose them at /metrics.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_PORT = config('METRICS_PORT', default=9100, cast=int)
+
+# Seconds, from cache hits and small encodes up to long multi-page generations
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (1024, 10240, 102400, 262144, 524288, 1048576, 2097152, 5242880, 10485760, 26214400)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{str(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation):
+        metric = Counter(name, documentation)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, buckets=SECONDS_BUCKETS):
+        metric = Histogram(name, documentation, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("nai_stage_seconds", "Time spent in each stage of a request")
+REQUESTS = REGISTRY.counter("nai_model_requests_total", "Model API requests by outcome")
+TOKENS = REGISTRY.counter("nai_tokens_total", "Prompt and completion tokens reported in API usage")
+PAYLOAD_BYTES = REGISTRY.histogram("nai_request_payload_bytes", "Size of model API request bodies", BYTES_BUCKETS)
+CACHE_LOOKUPS = REGISTRY.counter("nai_cache_lookups_total", "Cache lookups by cache and result")
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    logger.debug(f"{stage} took {seconds * 1000:.1f}ms")
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one observation of stage."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started_at)
+
+
+def record_request(outcome):
+    REQUESTS.inc(outcome=outcome)
+
+
+def record_usage(usage):
+    """Count tokens from an OpenAI usage dict (or LangChain usage metadata)."""
+    if not usage:
+        return
+    prompt_tokens = usage.get("prompt_tokens", usage.get("input_tokens"))
+    completion_tokens = usage.get("completion_tokens", usage.get("output_tokens"))
+    if prompt_tokens:
+        TOKENS.inc(prompt_tokens, kind="prompt")
+    if completion_tokens:
+        TOKENS.inc(completion_tokens, kind="completion")
+    cached_tokens = ((usage.get("prompt_tokens_details") or {}).get("cached_tokens") or
+                     (usage.get("input_token_details") or {}).get("cache_read"))
+    if cached_tokens:
+        TOKENS.inc(cached_tokens, kind="cached_prompt")
+
+
+def record_cache(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics on port from a daemon thread, once per process."""
+    global _server
+    if not METRICS_ENABLED:
+        return
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            # Another process in the container already serves the port
+            logger.warning(f"Metrics server not started on port {port}: {str(e)}")
+            _server = False
+            return
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving metrics on :{port}/metrics")
+
+
+_callbacks = None
+
+
+def langchain_callbacks():
+    """
+    Return callback handlers that record timings, outcomes and token usage for every
+    call made through a LangChain chat model. LangChain is imported only here.
+    """
+    global _callbacks
+    if _callbacks is not None:
+        return _callbacks
+
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsHandler(BaseCallbackHandler):
+        def __init__(self):
+            # run_id -> (start time, first token seen); models are shared across sessions
+            self._runs = {}
+            self._lock = threading.Lock()
+
+        def _start(self, run_id):
+            with self._lock:
+                self._runs[run_id] = [time.perf_counter(), False]
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id)
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            with self._lock:
+                run = self._runs.get(run_id)
+                if run is None or run[1]:
+                    return
+                run[1] = True
+            observe_stage("first_token", time.perf_counter() - run[0])
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            with self._lock:
+                run = self._runs.pop(run_id, None)
+            if run is not None:
+                observe_stage("last_token", time.perf_counter() - run[0])
+            record_request("ok")
+            usage = (response.llm_output or {}).get("token_usage")
+            if not usage:
+                for generations in response.generations:
+                    for generation in generations:
+                        message = getattr(generation, "message", None)
+                        usage = getattr(message, "usage_metadata", None) or usage
+            record_usage(usage)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            with self._lock:
+                self._runs.pop(run_id, None)
+            record_request("error")
+
+    _callbacks = [LLMMetricsHandler()]
+    return _callbacks
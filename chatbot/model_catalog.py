@@ -0,0 +1,234 @@
+"""
+Process-wide catalog of the models served at each endpoint, shared by every
+Streamlit session. Model lists are cached per (endpoint, API key hash) with a
+TTL and refreshed on a background thread, so the sidebar shows the last known
+list instead of waiting on /models. Each model also carries metadata for routing:
+context length and vision support (from the /models entry, or guessed from the
+model name) and latency measured from chat turns.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+
+import requests
+from decouple import config
+
+from http_client import get_session
+from metrics import observe_stage, record_cache
+
+logger = logging.getLogger(__name__)
+
+MODEL_CATALOG_TTL_SECONDS = config('MODEL_CATALOG_TTL_SECONDS', default=300, cast=int)
+MODEL_CATALOG_ERROR_TTL_SECONDS = config('MODEL_CATALOG_ERROR_TTL_SECONDS', default=30, cast=int)
+# How long a session with no list yet for its endpoint waits for the first fetch
+MODEL_CATALOG_WAIT_SECONDS = config('MODEL_CATALOG_WAIT_SECONDS', default=2.0, cast=float)
+# Endpoints kept in the catalog; the least recently used beyond this are dropped
+MODEL_CATALOG_MAX_ENDPOINTS = config('MODEL_CATALOG_MAX_ENDPOINTS', default=16, cast=int)
+# Weight of the newest sample in the moving latency averages
+MODEL_LATENCY_SMOOTHING = 0.2
+
+# Fields OpenAI-compatible servers use for the context window (vLLM, OpenRouter, LM Studio, ...)
+CONTEXT_LENGTH_FIELDS = ("max_model_len", "context_length", "context_window", "max_context_length",
+                         "max_input_tokens")
+# Model name fragments of common vision-language models
+VISION_NAME_PATTERN = re.compile(r"vision|(^|[-_/.])vl([-_/.]|$)|llava|pixtral|minicpm-v|internvl|paligemma|"
+                                 r"molmo|qwen2\.5-vl|gemma-3", re.IGNORECASE)
+
+
+def _context_length(entry):
+    for field in CONTEXT_LENGTH_FIELDS:
+        value = entry.get(field)
+        if isinstance(value, int) and value > 0:
+            return value
+    return None
+
+
+def _supports_vision(entry):
+    """(supports vision, "metadata" or "name" for where that came from)."""
+    capabilities = entry.get("capabilities")
+    if isinstance(capabilities, dict) and "vision" in capabilities:
+        return bool(capabilities["vision"]), "metadata"
+    if isinstance(capabilities, list):
+        return "vision" in capabilities, "metadata"
+    for field in ("input_modalities", "modalities"):
+        modalities = entry.get(field)
+        if isinstance(modalities, list):
+            return "image" in modalities, "metadata"
+    architecture = entry.get("architecture")
+    if isinstance(architecture, dict) and isinstance(architecture.get("input_modalities"), list):
+        return "image" in architecture["input_modalities"], "metadata"
+    return bool(VISION_NAME_PATTERN.search(entry.get("id", ""))), "name"
+
+
+def fetch_available_models(api_endpoint, api_key):
+    """
+    Fetch the models served at an OpenAI-compatible endpoint.
+    Returns:
+        tuple: (sorted list of model metadata dicts, error message or None)
+    """
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
+
+    # Construct the models endpoint URL
+    if api_endpoint.endswith('/'):
+        models_url = f"{api_endpoint}models"
+    else:
+        models_url = f"{api_endpoint}/models"
+
+    try:
+        started_at = time.perf_counter()
+        response = get_session().get(models_url, headers=headers, timeout=10)
+        observe_stage("model_list", time.perf_counter() - started_at)
+
+        if response.status_code == 401:
+            return [], "Authentication failed. Please check your API key."
+        if response.status_code == 404:
+            return [], "Models endpoint not found. Please check your API endpoint URL."
+        if response.status_code != 200:
+            return [], f"Failed to fetch models: {response.status_code} - {response.text}"
+
+        models = []
+        for entry in response.json().get('data', []):
+            vision, vision_source = _supports_vision(entry)
+            models.append({
+                "id": entry["id"],
+                "context_length": _context_length(entry),
+                "vision": vision,
+                "vision_source": vision_source,
+            })
+        # Sort models alphabetically for better UX
+        models.sort(key=lambda model: model["id"])
+        return models, None
+
+    except requests.exceptions.ConnectionError:
+        return [], "Connection failed. Please check your API endpoint URL and internet connection."
+    except requests.exceptions.Timeout:
+        return [], "Request timed out. Please try again."
+    except requests.exceptions.RequestException as e:
+        return [], f"Error connecting to API: {str(e)}"
+    except (ValueError, KeyError, AttributeError) as e:
+        return [], f"Error parsing response: {str(e)}"
+
+
+class ModelCatalog:
+    """
+    Model lists and metadata per (endpoint, API key hash). A lookup never waits on
+    a refresh of a list it already has: an expired list is returned as is while a
+    single background fetch replaces it. Latency samples are kept per (endpoint,
+    model) and survive refreshes.
+    """
+
+    def __init__(self, ttl_seconds=MODEL_CATALOG_TTL_SECONDS, max_endpoints=MODEL_CATALOG_MAX_ENDPOINTS):
+        self.ttl_seconds = ttl_seconds
+        self.max_endpoints = max_endpoints
+        self._entries = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self, key, api_endpoint, api_key, done):
+        models, error = fetch_available_models(api_endpoint, api_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # A failed refresh keeps the last good list
+                if not error or not entry["models"]:
+                    entry["models"] = models
+                entry["error"] = error
+                entry["fetched_at"] = time.time()
+                entry["refreshing"] = None
+        if error:
+            logger.warning(f"Model list refresh for {api_endpoint} failed: {error}")
+        else:
+            logger.info(f"Model list for {api_endpoint}: {len(models)} models")
+        done.set()
+
+    def get(self, api_endpoint, api_key, wait=MODEL_CATALOG_WAIT_SECONDS):
+        """
+        Return the catalog entry for an endpoint and key, refreshing it in the
+        background when it is missing or older than the TTL. Only a first lookup
+        waits, for at most wait seconds.
+        Returns:
+            dict: "models" (list of metadata dicts, empty until the first fetch
+                  finishes), "error" (message of the last failed fetch or None),
+                  "fetched_at" (time of the last fetch or None) and "loading"
+        """
+        key = (api_endpoint, hashlib.sha256(api_key.encode()).hexdigest())
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                entry = {"models": [], "error": None, "fetched_at": None, "refreshing": None}
+            # Most recently used last, so the oldest endpoint is dropped first
+            self._entries[key] = entry
+            while len(self._entries) > self.max_endpoints:
+                del self._entries[next(iter(self._entries))]
+            # A failed fetch is retried sooner than a good list is refreshed
+            ttl_seconds = min(self.ttl_seconds, MODEL_CATALOG_ERROR_TTL_SECONDS) if entry["error"] else self.ttl_seconds
+            stale = entry["fetched_at"] is None or time.time() - entry["fetched_at"] >= ttl_seconds
+            record_cache("model_list", not stale)
+            done = entry["refreshing"]
+            if stale and done is None:
+                done = entry["refreshing"] = threading.Event()
+                threading.Thread(target=self._refresh, args=(key, api_endpoint, api_key, done),
+                                 name="model-catalog", daemon=True).start()
+
+        if entry["fetched_at"] is None and done is not None:
+            done.wait(wait)
+        with self._lock:
+            models = [dict(model, **self._latency.get((api_endpoint, model["id"]), {}))
+                      for model in entry["models"]]
+            return {"models": models, "error": entry["error"], "fetched_at": entry["fetched_at"],
+                    "loading": entry["fetched_at"] is None}
+
+    def record_latency(self, api_endpoint, model_name, ttft=None, total=None):
+        """Fold one chat turn's time to first token and total time (seconds) into the model's averages."""
+        with self._lock:
+            stats = self._latency.setdefault((api_endpoint, model_name), {"latency_samples": 0})
+            stats["latency_samples"] += 1
+            for name, value in (("ttft_ms", ttft), ("latency_ms", total)):
+                if value is None:
+                    continue
+                value *= 1000
+                previous = stats.get(name)
+                stats[name] = round(value if previous is None else
+                                    previous + MODEL_LATENCY_SMOOTHING * (value - previous), 1)
+
+
+def describe_model(model):
+    """One-line summary of a catalog model's metadata for the sidebar."""
+    parts = []
+    if model.get("context_length"):
+        parts.append(f"{model['context_length']:,}-token context")
+    if model.get("vision"):
+        parts.append("vision" if model.get("vision_source") == "metadata" else "vision (by name)")
+    if model.get("ttft_ms") is not None:
+        parts.append(f"~{model['ttft_ms']:.0f}ms to first token")
+    if model.get("latency_ms") is not None:
+        parts.append(f"~{model['latency_ms'] / 1000:.1f}s per reply")
+    return ", ".join(parts) or "No metadata yet"
+
+
+_model_catalog = None
+_model_catalog_lock = threading.Lock()
+
+
+def get_model_catalog():
+    """Return the process-wide model catalog."""
+    global _model_catalog
+    with _model_catalog_lock:
+        if _model_catalog is None:
+            _model_catalog = ModelCatalog()
+        return _model_catalog
+
+
+def warm_model_catalog():
+    """Start fetching the model list for the configured endpoint and key, so the first session finds it."""
+    api_endpoint = config('API_ENDPOINT', default='https://nai.tmelab.net/api/v1')
+    api_key = config('API_KEY', default='')
+    if api_endpoint and api_key:
+        if api_endpoint.endswith('/chat/completions'):
+            api_endpoint = api_endpoint[:-len('/chat/completions')]
+        get_model_catalog().get(api_endpoint, api_key, wait=0)
@@ -0,0 +1,202 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+CONTEXTS_DIR = config('CONTEXTS_DIR', default='contexts')
+RETRIEVAL_INDEX_PATH = config('RETRIEVAL_INDEX_PATH', default='.context_index.json')
+RETRIEVAL_TOP_K = config('RETRIEVAL_TOP_K', default=4, cast=int)
+# Target chunk length in words
+RETRIEVAL_CHUNK_WORDS = config('RETRIEVAL_CHUNK_WORDS', default=180, cast=int)
+# How often a chat turn checks the context files for changes, instead of on every turn
+RETRIEVAL_STALE_CHECK_SECONDS = config('RETRIEVAL_STALE_CHECK_SECONDS', default=30, cast=float)
+
+CONTEXT_EXTENSIONS = ('.txt', '.md')
+INDEX_VERSION = 1
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_SECTION_BREAK = re.compile(r"^\s*-{3,}\s*$", re.MULTILINE)
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its me my of on or our
+so that the their them this to was we what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def chunk_text(text, chunk_words=RETRIEVAL_CHUNK_WORDS):
+    """
+    Split a context file into chunks: first on "----" section breaks, then on
+    paragraphs, packing paragraphs up to chunk_words. A section's first line
+    (e.g. "[NCI – Nutanix Cloud Infrastructure]") is repeated on each of its chunks.
+    """
+    chunks = []
+    for section in _SECTION_BREAK.split(text):
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", section) if p.strip()]
+        if not paragraphs:
+            continue
+        heading = paragraphs[0] if len(paragraphs[0].split()) <= 12 else None
+
+        current, words = [], 0
+        for paragraph in paragraphs:
+            length = len(paragraph.split())
+            if current and words + length > chunk_words:
+                chunks.append("\n\n".join(current))
+                current, words = ([heading], len(heading.split())) if heading else ([], 0)
+            current.append(paragraph)
+            words += length
+        if current and current != [heading]:
+            chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _manifest(contexts_dir):
+    """Return {relative path: [mtime_ns, size]} for every context file."""
+    manifest = {}
+    for root, _, files in os.walk(contexts_dir):
+        for name in sorted(files):
+            if not name.endswith(CONTEXT_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            manifest[os.path.relpath(path, contexts_dir)] = [stat.st_mtime_ns, stat.st_size]
+    return manifest
+
+
+class ContextIndex:
+    """BM25 index over chunks of the files under the contexts directory."""
+
+    def __init__(self, contexts_dir, manifest, chunks, postings, avg_length):
+        self.contexts_dir = contexts_dir
+        self.manifest = manifest
+        self.chunks = chunks
+        self.postings = postings
+        self.avg_length = avg_length
+
+    @classmethod
+    def build(cls, contexts_dir=CONTEXTS_DIR, chunk_words=RETRIEVAL_CHUNK_WORDS):
+        manifest = _manifest(contexts_dir)
+        chunks = []
+        postings = {}
+        for relative_path in manifest:
+            with open(os.path.join(contexts_dir, relative_path), 'r') as file:
+                text = file.read()
+            source = os.path.join(contexts_dir, relative_path)
+            for chunk in chunk_text(text, chunk_words):
+                terms = Counter(tokenize(chunk))
+                index = len(chunks)
+                chunks.append({"source": source, "text": chunk, "length": sum(terms.values())})
+                for term, frequency in terms.items():
+                    postings.setdefault(term, []).append([index, frequency])
+
+        avg_length = sum(chunk["length"] for chunk in chunks) / len(chunks) if chunks else 0
+        logger.info(f"Indexed {len(chunks)} chunks from {len(manifest)} context files")
+        return cls(contexts_dir, manifest, chunks, postings, avg_length)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as file:
+            data = json.load(file)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported index version {data.get('version')}")
+        return cls(data["contexts_dir"], data["manifest"], data["chunks"], data["postings"], data["avg_length"])
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump({
+                "version": INDEX_VERSION,
+                "contexts_dir": self.contexts_dir,
+                "manifest": self.manifest,
+                "chunks": self.chunks,
+                "postings": self.postings,
+                "avg_length": self.avg_length
+            }, file)
+        os.replace(tmp_path, path)
+
+    def is_stale(self):
+        return _manifest(self.contexts_dir) != self.manifest
+
+    def search(self, query, top_k=RETRIEVAL_TOP_K, source_prefix=None):
+        """
+        Return the top_k chunks for query, best first.
+        Args:
+            query (str): Free-text query
+            top_k (int): Maximum number of chunks
+            source_prefix (str): Only consider chunks from files under this path
+        Returns:
+            list: Chunk dicts with "source", "text" and "score"
+        """
+        scores = {}
+        chunk_count = len(self.chunks)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, frequency in postings:
+                length_norm = 1 - BM25_B + BM25_B * self.chunks[index]["length"] / (self.avg_length or 1)
+                score = idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                scores[index] = scores.get(index, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for index, score in ranked:
+            chunk = self.chunks[index]
+            if source_prefix and not os.path.normpath(chunk["source"]).startswith(os.path.normpath(source_prefix)):
+                continue
+            results.append({**chunk, "score": score})
+            if len(results) >= top_k:
+                break
+        return results
+
+
+_index = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_context_index(contexts_dir=CONTEXTS_DIR, index_path=RETRIEVAL_INDEX_PATH):
+    """
+    Return the process-wide context index. It is loaded from index_path when that
+    matches the files on disk, and rebuilt (and saved) only when a file was added,
+    removed or modified. The files are checked at most every RETRIEVAL_STALE_CHECK_SECONDS.
+    """
+    global _index, _index_checked_at
+    with _index_lock:
+        now = time.monotonic()
+        if _index is not None and now - _index_checked_at < RETRIEVAL_STALE_CHECK_SECONDS:
+            return _index
+        _index_checked_at = now
+        if _index is not None and not _index.is_stale():
+            return _index
+
+        if _index is None and os.path.exists(index_path):
+            try:
+                index = ContextIndex.load(index_path)
+                if index.contexts_dir == contexts_dir and not index.is_stale():
+                    _index = index
+                    return _index
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable context index {index_path}: {str(e)}")
+
+        _index = ContextIndex.build(contexts_dir)
+        try:
+            _index.save(index_path)
+        except OSError as e:
+            logger.warning(f"Could not save context index to {index_path}: {str(e)}")
+        return _index
@@ -0,0 +1,16 @@
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class StreamHandler(BaseCallbackHandler):
+    def __init__(self, container, initial_text=""):
+        self.container = container
+        self.text = initial_text
+        self.first_token_at = None
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.text += token
+        self.container.markdown(self.text)
@@ -1,62 +1,65 @@
 import json
-import requests
+import hashlib
 import streamlit as st
 import logging
 import re
 from decouple import config
+from http_client import DEFAULT_TIMEOUT, HTTP_MAX_RETRIES, get_httpx_client
+from metrics import langchain_callbacks, span
 
 
 logging.basicConfig(level=config('LOG_LEVEL', default='INFO'))
 logger = logging.getLogger(__name__)
 
+# "retrieval" injects only the context chunks relevant to each turn; "inline" injects whole files
+CONTEXT_MODE = config('CONTEXT_MODE', default='retrieval')
 
-def fetch_available_models(api_endpoint, api_key):
-    """Fetch available models from the OpenAI endpoint"""
-    try:
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        # Construct the models endpoint URL
-        if api_endpoint.endswith('/'):
-            models_url = f"{api_endpoint}models"
-        else:
-            models_url = f"{api_endpoint}/models"
-        
-        response = requests.get(models_url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            models = [model['id'] for model in data.get('data', [])]
-            # Sort models alphabetically for better UX
-            models.sort()
-            return models
-        elif response.status_code == 401:
-            st.error("Authentication failed. Please check your API key.")
-            return []
-        elif response.status_code == 404:
-            st.error("Models endpoint not found. Please check your API endpoint URL.")
-            return []
-        else:
-            st.error(f"Failed to fetch models: {response.status_code} - {response.text}")
-            return []
-            
-    except requests.exceptions.ConnectionError:
-        st.error("Connection failed. Please check your API endpoint URL and internet connection.")
-        return []
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-        return []
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error connecting to API: {str(e)}")
-        return []
-    except json.JSONDecodeError as e:
-        st.error(f"Error parsing response: {str(e)}")
-        return []
-    except Exception as e:
-        st.error(f"Unexpected error: {str(e)}")
-        return []
+# Matches {{context:path}} tags naming a .txt/.md file or a directory of them
+CONTEXT_TAG_PATTERN = r'\{\{context:(.*?)\}\}'
+
+# Stands in for {{context:path}} tags in the static system message in retrieval mode
+RETRIEVED_CONTEXT_POINTER = "(Relevant context is provided with each user message, under \"Reference context\".)"
+
+# Mark the static system message as cacheable and send a prompt_cache_key with each request,
+# for servers and gateways that take prefix-caching hints
+PROMPT_CACHE_HINTS = config('PROMPT_CACHE_HINTS', default=False, cast=bool)
+
+# Bound on live ChatOpenAI clients kept across Streamlit reruns and sessions
+CLIENT_CACHE_MAX_ENTRIES = config('CLIENT_CACHE_MAX_ENTRIES', default=8, cast=int)
+CLIENT_CACHE_TTL_SECONDS = config('CLIENT_CACHE_TTL_SECONDS', default=3600, cast=int)
+
+
+def api_key_hash(api_key):
+    """Fingerprint an API key so it can be used in cache keys without storing it."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+@st.cache_resource(max_entries=CLIENT_CACHE_MAX_ENTRIES, ttl=CLIENT_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_chat_model(api_endpoint, key_hash, model_name, temperature, _api_key):
+    from langchain_openai import ChatOpenAI
+
+    logger.info(f"Creating ChatOpenAI client for {model_name} at {api_endpoint}")
+    return ChatOpenAI(
+        openai_api_key=_api_key,
+        model_name=model_name,
+        openai_api_base=api_endpoint,
+        temperature=temperature,
+        streaming=True,
+        stream_usage=True,
+        callbacks=langchain_callbacks(),
+        http_client=get_httpx_client(),
+        max_retries=HTTP_MAX_RETRIES,
+        timeout=DEFAULT_TIMEOUT
+    )
+
+
+def get_chat_model(api_endpoint, api_key, model_name, temperature):
+    """
+    Return a ChatOpenAI client shared across reruns and sessions, keyed on
+    (endpoint, API key hash, model, temperature). The API key itself is not hashed
+    into the cache key by Streamlit.
+    """
+    return _cached_chat_model(api_endpoint, api_key_hash(api_key), model_name, temperature, api_key)
 
 
 def load_file_text(filename):
@@ -75,13 +78,13 @@ def process_text_with_context(text):
     if not text:
         return text
         
-    # Pattern to match {{context:filename.txt}} tags, ensuring filename ends with .txt
-    pattern = r'\{\{context:(.*?\.txt)\}\}'
+    # Pattern to match {{context:filename}} tags
+    pattern = CONTEXT_TAG_PATTERN
     
     def replace_with_content(match):
         filename = match.group(1)
-        if not filename.endswith('.txt'):
-            logger.warning(f'Skipping {filename} - not a .txt file')
+        if not filename.endswith(('.txt', '.md')):
+            logger.warning(f'Skipping {filename} - not a .txt or .md file')
             return match.group(0)
         content = load_file_text(filename)
         if content is None:
@@ -95,6 +98,77 @@ def process_text_with_context(text):
     return processed_text
 
 
+def retrieval_query(messages, turns=2):
+    """Build the retrieval query from the latest user turns, so follow-ups keep their topic."""
+    user_turns = [message["content"] for message in messages if message["role"] == "user"]
+    return "\n".join(user_turns[-turns:])
+
+
+def static_system_message(text):
+    """
+    The part of the system message that is the same on every turn, sent first so the
+    server's prefix cache can reuse it. In retrieval mode each {{context:path}} tag is
+    replaced by a fixed pointer to the context that retrieved_context() attaches to
+    the latest user message; in inline mode the tags were already expanded by
+    load_system_messages and text is returned unchanged.
+    """
+    if CONTEXT_MODE != 'retrieval' or not text:
+        return text
+    return re.sub(CONTEXT_TAG_PATTERN, lambda match: RETRIEVED_CONTEXT_POINTER, text)
+
+
+def warm_context_index():
+    """Load or build the context index ahead of the first chat turn, in retrieval mode."""
+    if CONTEXT_MODE == 'retrieval':
+        from retrieval import get_context_index
+
+        get_context_index()
+
+
+def retrieved_context(text, query):
+    """
+    In retrieval mode, the chunks most relevant to query from each file (or directory)
+    named by a {{context:path}} tag in text, as one block. Empty in inline mode or
+    when text has no tags.
+    """
+    if CONTEXT_MODE != 'retrieval' or not text:
+        return ""
+    tags = re.findall(CONTEXT_TAG_PATTERN, text)
+    if not tags:
+        return ""
+
+    from retrieval import get_context_index
+
+    index = get_context_index()
+    blocks = []
+    with span("retrieval"):
+        for source_prefix in tags:
+            chunks = index.search(query, source_prefix=source_prefix)
+            if not chunks:
+                blocks.append("(No relevant context found.)")
+            else:
+                blocks.append("\n\n----\n\n".join(f"[Source: {chunk['source']}]\n{chunk['text']}"
+                                                    for chunk in chunks))
+    return "\n\n".join(blocks)
+
+
+def prompt_cache_options(system_message):
+    """
+    Extra request options for the model call. With PROMPT_CACHE_HINTS, requests carry
+    a prompt_cache_key derived from the static system message, so gateways that route
+    on it send conversations with the same prefix to the same replica.
+    """
+    if not PROMPT_CACHE_HINTS or not system_message:
+        return {}
+    prefix_key = hashlib.sha256(system_message.encode()).hexdigest()[:32]
+    return {"extra_body": {"prompt_cache_key": prefix_key}}
+
+
+def cached_prompt_tokens(response):
+    """(prompt tokens, prompt tokens served from the server's prefix cache or None) of a chat model reply."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens"), (usage.get("input_token_details") or {}).get("cache_read")
+
 
 @st.cache_data
 def load_system_messages(system_messages_json='system_messages.json'):
@@ -103,6 +177,10 @@ def load_system_messages(system_messages_json='system_messages.json'):
     
     system_messages = {}
     for item in data:
-        system_messages[item['name']] = process_text_with_context(item['message'])
+        if CONTEXT_MODE == 'retrieval':
+            # Tags become a fixed pointer in static_system_message; retrieved_context fills them per turn
+            system_messages[item['name']] = item['message']
+        else:
+            system_messages[item['name']] = process_text_with_context(item['message'])
 
     return system_messages
\ No newline at end of file
@@ -1,114 +1,216 @@
 import streamlit as st
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain.memory import ConversationBufferMemory
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-from langchain.agents import AgentType, initialize_agent
-from langchain.tools import Tool
-from typing import List, Dict
-import json
-from langchain.prompts import MessagesPlaceholder
-import requests
+from typing import List, Dict, Tuple
+import hashlib
+import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 from decouple import config
+from http_client import DEFAULT_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES, get_httpx_client, get_session
+from flight_cache import get_flight_status_cache
+from metrics import langchain_callbacks, span, start_metrics_server
+from session_store import current_session, get_session_store
+from startup import prewarm, record_startup
 
+logging.basicConfig(level=config('LOG_LEVEL', default='INFO'))
 
+# Bound on live agent executors kept across Streamlit reruns and sessions
+CLIENT_CACHE_MAX_ENTRIES = config('CLIENT_CACHE_MAX_ENTRIES', default=8, cast=int)
+CLIENT_CACHE_TTL_SECONDS = config('CLIENT_CACHE_TTL_SECONDS', default=3600, cast=int)
 
-class StreamHandler(StreamingStdOutCallbackHandler):
-    def __init__(self, container, debug_container):
-        super().__init__()
-        self.container = container
-        self.debug_container = debug_container
-        self.text = ""
-        self.debug_text = ""
-
-    def on_llm_start(self, serialized, prompts, **kwargs):
-        self.text += "Starting LLM...\n"
-        self.container.markdown(self.text)
-
-    def on_llm_new_token(self, token: str, **kwargs) -> None:
-        self.text += token
-        self.container.markdown(self.text)
-
-    def on_llm_end(self, response, **kwargs) -> None:
-        self.text += "\nLLM finished.\n"
-        self.container.markdown(self.text)
-
-    def on_llm_error(self, error, **kwargs) -> None:
-        self.text += f"Error: {str(error)}\n"
-        self.container.markdown(self.text)
-    
-    def __init__(self, container, debug_container):
-        super().__init__()
-        self.container = container
-        self.debug_container = debug_container
-        self.text = ""
-        self.debug_text = ""
-
-    def on_llm_start(self, serialized, prompts, **kwargs):
-        print("Starting LLM...")
-        self.text += "Starting LLM...\n"
-        self.container.markdown(self.text)
-
-    def on_llm_new_token(self, token: str, **kwargs) -> None:
-        self.debug_text += token
-        if self.debug_container:
-            self.debug_container.text(self.debug_text)
-        self.text += token
-        self.container.markdown(self.text)
-
-    def on_tool_start(self, serialized, input_str, **kwargs):
-        print("Tool start:", serialized, input_str)
-        self.text += f"\nUsing tool: {serialized['name']}\n"
-        self.container.markdown(self.text)
-
-    def on_tool_end(self, output: str, **kwargs) -> None:
-        print("Tool end:", output)
-        self.text += f"Tool output: {output}\n"
-        self.container.markdown(self.text)
-
-    def on_chain_end(self, outputs, **kwargs):
-        print("Chain end:", outputs)
-        if outputs and isinstance(outputs, dict):
-            self.text += f"\nFinal output: {outputs.get('output', '')}\n"
-            self.container.markdown(self.text)
-
-    def on_chain_error(self, error: Exception, **kwargs) -> None:
-        print("Chain error:", error)
-        self.text += f"\nError: {str(error)}\n"
-        self.container.markdown(self.text)
+# Read timeout for the flight-status service; slower lookups fall back to cached results
+FLIGHT_STATUS_TIMEOUT = (HTTP_CONNECT_TIMEOUT, config('FLIGHT_STATUS_READ_TIMEOUT', default=8.0, cast=float))
 
-def get_flight_info(query: str) -> str:
-    """Function to return Qatar Airways flight information between specified airports"""
-    try:
-        departure, arrival = query.split(',')
-        departure = departure.strip().upper()
-        arrival = arrival.strip().upper()
-    except ValueError:
-        return "Error: Please provide both departure and arrival airport codes separated by a comma (e.g., 'DOH,DXB')."
+# Limits for multi-route, multi-date lookups
+FLIGHT_LOOKUP_WORKERS = config('FLIGHT_LOOKUP_WORKERS', default=8, cast=int)
+FLIGHT_MAX_LOOKUPS = config('FLIGHT_MAX_LOOKUPS', default=24, cast=int)
+FLIGHT_MAX_DAYS = config('FLIGHT_MAX_DAYS', default=7, cast=int)
 
 
+def fetch_flight_status(departure: str, arrival: str, scheduled_date: str) -> List[Dict]:
+    """Query the Qatar Airways flight-status service for one route and date"""
     qa_url = 'https://qoreservices.qatarairways.com/fltstatus-services/flight/getStatus'
     params = {
         "departureStation": departure,
         "arrivalStation": arrival,
-        "scheduledDate": datetime.now().strftime("%Y-%m-%d"),
+        "scheduledDate": scheduled_date,
         "appLocale": "en"
     }
-    response = requests.post(qa_url, json=params)
-    flights = response.json().get('flights', [])
-    text_flights = f'Flights from {departure} to {arrival} on {datetime.now().strftime("%d-%B-%Y")}:\n'
-    counter = 1
-    for flight in flights:
-        record = f"({counter}) Flight: QR{flight['flightNumber']}, Departure Time: {flight['departureDateScheduled']}, Arrival Time: {flight['arrivalDateScheduled']}, Status: {flight['flightStatus']}\n"
-        text_flights += record
-        counter += 1
+    with span("flight_status"):
+        response = get_session().post(qa_url, json=params, timeout=FLIGHT_STATUS_TIMEOUT)
+        response.raise_for_status()
+        return response.json().get('flights', [])
+
+
+def parse_flight_query(query: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Parse a flight tool query into routes and dates.
+    Accepted forms: "DOH,DXB", "DOH,LHR/CDG/FRA", "DOH,LHR; CDG,DOH", each optionally
+    followed by "| YYYY-MM-DD" or "| YYYY-MM-DD to YYYY-MM-DD". Dates default to today.
+    Raises ValueError for malformed input.
+    """
+    route_part, _, date_part = query.partition('|')
+
+    routes = []
+    for route in route_part.split(';'):
+        if not route.strip():
+            continue
+        departures, arrivals = route.split(',')
+        for departure in departures.split('/'):
+            for arrival in arrivals.split('/'):
+                departure_code, arrival_code = departure.strip().upper(), arrival.strip().upper()
+                if not departure_code or not arrival_code:
+                    raise ValueError(f"incomplete route '{route.strip()}'")
+                if (departure_code, arrival_code) not in routes:
+                    routes.append((departure_code, arrival_code))
+    if not routes:
+        raise ValueError("no routes given")
+
+    date_part = date_part.strip().replace('..', ' to ')
+    if not date_part:
+        dates = [datetime.now().strftime("%Y-%m-%d")]
+    else:
+        first, _, last = date_part.partition(' to ')
+        start = datetime.strptime(first.strip(), "%Y-%m-%d")
+        end = datetime.strptime(last.strip(), "%Y-%m-%d") if last.strip() else start
+        if end < start:
+            start, end = end, start
+        days = min((end - start).days + 1, FLIGHT_MAX_DAYS)
+        dates = [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)]
+
+    return routes, dates
+
+
+def lookup_flight_status(departure: str, arrival: str, scheduled_date: str) -> Dict:
+    """Look up one route and date through the shared cache; never raises"""
+    try:
+        # Repeated and concurrent lookups of the same route share one upstream call
+        flights, fetched_at, stale = get_flight_status_cache().get(
+            (departure, arrival, scheduled_date),
+            lambda: fetch_flight_status(departure, arrival, scheduled_date)
+        )
+        return {"flights": flights, "fetched_at": fetched_at, "stale": stale, "error": None}
+    except Exception as e:
+        return {"flights": [], "fetched_at": None, "stale": False, "error": str(e)}
+
+
+def get_flight_info(query: str) -> str:
+    """Function to return Qatar Airways flight information for one or more routes and dates"""
+    try:
+        routes, dates = parse_flight_query(query)
+    except ValueError:
+        return ("Error: Please provide departure and arrival airport codes separated by a comma (e.g., 'DOH,DXB'). "
+                "Separate several routes with ';' or list alternatives with '/' (e.g., 'DOH,LHR/CDG'), and optionally add "
+                "'| YYYY-MM-DD' or '| YYYY-MM-DD to YYYY-MM-DD' for other dates.")
+
+    lookups = [(departure, arrival, scheduled_date) for scheduled_date in dates for departure, arrival in routes]
+    truncated = len(lookups) > FLIGHT_MAX_LOOKUPS
+    lookups = lookups[:FLIGHT_MAX_LOOKUPS]
+
+    # Query every route and date at once instead of one agent step per route
+    with ThreadPoolExecutor(max_workers=max(1, min(FLIGHT_LOOKUP_WORKERS, len(lookups)))) as executor:
+        results = list(executor.map(lambda lookup: lookup_flight_status(*lookup), lookups))
+
+    rows = []
+    notes = []
+    for (departure, arrival, scheduled_date), result in zip(lookups, results):
+        route = f"{departure}-{arrival}"
+        if result["error"]:
+            notes.append(f"{route} on {scheduled_date}: flight status service unavailable")
+            continue
+        if result["stale"]:
+            notes.append(f"{route} on {scheduled_date}: live status unavailable, showing status as of "
+                         f"{datetime.fromtimestamp(result['fetched_at']).strftime('%H:%M')}")
+        if not result["flights"]:
+            notes.append(f"{route} on {scheduled_date}: no flights found")
+        for flight in result["flights"]:
+            rows.append(f"{scheduled_date} | {route} | QR{flight['flightNumber']} | {flight['departureDateScheduled']} | "
+                        f"{flight['arrivalDateScheduled']} | {flight['flightStatus']}")
+
+    text_flights = f"Qatar Airways flights ({len(routes)} route(s), {len(dates)} date(s)):\n"
+    if rows:
+        text_flights += "Date | Route | Flight | Departure Time | Arrival Time | Status\n"
+        text_flights += "\n".join(rows) + "\n"
+    for note in notes:
+        text_flights += f"- {note}\n"
+    if truncated:
+        text_flights += f"- Only the first {FLIGHT_MAX_LOOKUPS} route/date combinations were checked\n"
 
     return text_flights
 
 
+def api_key_hash(api_key):
+    """Fingerprint an API key so it can be used in cache keys without storing it."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+@st.cache_resource(max_entries=CLIENT_CACHE_MAX_ENTRIES, ttl=CLIENT_CACHE_TTL_SECONDS, show_spinner=False)
+def get_flight_agent(api_endpoint, key_hash, model_name, today, _api_key):
+    """
+    Build the flight agent executor once per (endpoint, API key hash, model, date) and
+    share it across reruns and sessions. The executor holds no memory, so it is safe
+    to share; today only keys the cache so the date in the system message stays current.
+    """
+    from langchain.agents import AgentType, initialize_agent
+    from langchain.prompts import MessagesPlaceholder
+    from langchain.tools import Tool
+    from langchain_openai import ChatOpenAI
+
+    # Initialize ChatOpenAI
+    llm = ChatOpenAI(
+        openai_api_key=_api_key,
+        model_name=model_name,
+        openai_api_base=api_endpoint,
+        streaming=True,
+        stream_usage=True,
+        callbacks=langchain_callbacks(),
+        http_client=get_httpx_client(),
+        max_retries=HTTP_MAX_RETRIES,
+        timeout=DEFAULT_TIMEOUT
+    )
+
+    # Create the flight info tool
+    flight_tool = Tool(
+        name="Flight Information",
+        func=get_flight_info,
+        description="Use this tool to get Qatar Airways flight information between airports. Input is a departure and arrival airport code separated by a comma (e.g., 'DOH,DXB' for flights from Doha to Dubai). Check several routes in one call by separating them with ';' (e.g., 'DOH,LHR; LHR,DOH') or listing alternative airports with '/' (e.g., 'DOH,LHR/CDG/FRA'). Add '| YYYY-MM-DD' or '| YYYY-MM-DD to YYYY-MM-DD' for dates other than today."
+    )
+
+    # Define the system message to control the chatbot's behavior
+    system_message = f"""You are an AI assistant specializing in Qatar Airways flights, with a focus on flights to and from Doha Hamad International Airport (DOH). 
+    Your primary function is to provide information about Qatar Airways flights, their schedules, and general information about traveling with Qatar Airways.
+    When using the Flight Information tool, always provide both the departure and arrival airport codes, separated by a comma.
+    When a question covers several airports or dates, ask for all of them in a single Flight Information call.
+    Only use the provided flight information tool when specific flight details are requested.
+    If asked about flights from other airlines, politely explain that you can only provide information about Qatar Airways flights.
+    Be helpful, concise, and friendly in your responses.
+
+    Today's date is {datetime.now().strftime("%d-%B-%Y")}.
+    """
+
+    # Initialize the agent with the tool and the system message
+    agent = initialize_agent(
+        tools=[flight_tool],
+        llm=llm,
+        agent=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
+        verbose=True,
+        handle_parsing_errors=True,
+        agent_kwargs={
+            "system_message": system_message,
+            "extra_prompt_messages": [MessagesPlaceholder(variable_name="chat_history")]
+        }
+    )
+
+    return agent
+
+
+# Prometheus metrics for this container, started once per process
+start_metrics_server()
+
+# LangChain and the agent machinery load in the background while the page paints
+prewarm("langchain_openai", "langchain.agents", "langchain.tools", "langchain.prompts", "stream_handler")
+
 # Sidebar for user input
 st.sidebar.header("Configuration")
 api_endpoint = st.sidebar.text_input('API Endpoint URL', value=config('API_ENDPOINT', default='https://nai.tmelab.net/api/v1'))
@@ -124,9 +226,13 @@ required_fields_filled = bool(api_endpoint and model_name and api_key)
 if not required_fields_filled:
     st.warning("Please fill in all required fields in the sidebar (API Endpoint, Model Name, and API Key)")
 
+# Conversation of this tab, reloaded from the session store after a page reload
+session_store = get_session_store()
+chat_session = current_session()
+
 # Clear chat button
 if st.sidebar.button("Clear Chat"):
-    st.session_state.messages = []
+    session_store.clear(chat_session)
     st.rerun()
 
 # Main chat interface
@@ -139,74 +245,37 @@ else:
 
 st.title("Qatar Airways Flight Information Chatbot")
 
-# Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
 # Display chat messages
-for message in st.session_state.messages:
+for message in chat_session.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
 # Chat input - now conditional
 if required_fields_filled:
     if prompt := st.chat_input("You:"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        session_store.append(chat_session, {"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Initialize ChatOpenAI and memory
-        llm = ChatOpenAI(
-            openai_api_key=api_key,
-            model_name=model_name,
-            openai_api_base=api_endpoint,
-            streaming=True
-        )
-        memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-
-        # Create the flight info tool
-        flight_tool = Tool(
-            name="Flight Information",
-            func=get_flight_info,
-            description="Use this tool to get Qatar Airways flight information between two airports. Input should be two airport codes separated by a comma (e.g., 'DOH,DXB' for flights from Doha to Dubai)."
-        )
-
-        # Define the system message to control the chatbot's behavior
-        system_message = f"""You are an AI assistant specializing in Qatar Airways flights, with a focus on flights to and from Doha Hamad International Airport (DOH). 
-        Your primary function is to provide information about Qatar Airways flights, their schedules, and general information about traveling with Qatar Airways.
-        When using the Flight Information tool, always provide both the departure and arrival airport codes, separated by a comma.
-        Only use the provided flight information tool when specific flight details are requested.
-        If asked about flights from other airlines, politely explain that you can only provide information about Qatar Airways flights.
-        Be helpful, concise, and friendly in your responses.
-        
-        Today's date is {datetime.now().strftime("%d-%B-%Y")}.
-        """
-
-        # Initialize the agent with the tool and the system message
-        agent = initialize_agent(
-            tools=[flight_tool],
-            llm=llm,
-            agent=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
-            verbose=True,
-            memory=memory,
-            handle_parsing_errors=True,
-            agent_kwargs={
-                "system_message": system_message,
-                "extra_prompt_messages": [MessagesPlaceholder(variable_name="chat_history")]
-            }
-        )
+        # Reuse the agent executor for this endpoint, key, model and day
+        agent = get_flight_agent(api_endpoint, api_key_hash(api_key), model_name,
+                                 datetime.now().strftime("%Y-%m-%d"), api_key)
 
         # Generate AI response
         with st.chat_message("assistant"):
             response_container = st.empty()
             debug_container = st.empty() if debug_mode else None
+            from stream_handler import StreamHandler
+
             stream_handler = StreamHandler(response_container, debug_container)
             try:
-                response = agent.run(
-                    input=prompt,
-                    callbacks=[stream_handler]
-                )
-                st.session_state.messages.append({"role": "assistant", "content": response})
+                with span("agent_turn"):
+                    response = agent.run(
+                        input=prompt,
+                        chat_history=[],
+                        callbacks=[stream_handler]
+                    )
+                session_store.append(chat_session, {"role": "assistant", "content": response})
                 response_container.markdown(response)
                 sleep(5)
             except Exception as e:
@@ -223,4 +292,6 @@ else:
     # Disabled chat input
     st.chat_input("You:", disabled=True)
 
+record_startup("first_render")
+
 # Run the app: streamlit run chatbot_app.py
\ No newline at end of file
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from decouple import config
+
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+FLIGHT_CACHE_TTL_SECONDS = config('FLIGHT_CACHE_TTL_SECONDS', default=120, cast=int)
+# How old a result may be and still be served when the upstream is slow or failing
+FLIGHT_CACHE_STALE_SECONDS = config('FLIGHT_CACHE_STALE_SECONDS', default=21600, cast=int)
+# Directory for the on-disk fallback; empty disables it
+FLIGHT_CACHE_DIR = config('FLIGHT_CACHE_DIR', default='/tmp/flight_cache')
+
+
+class FlightStatusCache:
+    """
+    TTL cache for flight-status lookups with single-flight coalescing: concurrent
+    callers asking for the same key while a fetch is running wait for that fetch
+    instead of issuing their own. Results are also written to disk so a stale copy
+    can be served when the upstream times out or fails.
+    """
+
+    def __init__(self, ttl_seconds=FLIGHT_CACHE_TTL_SECONDS, stale_seconds=FLIGHT_CACHE_STALE_SECONDS,
+                 cache_dir=FLIGHT_CACHE_DIR):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.cache_dir = cache_dir or None
+        self._memory = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        name = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r') as file:
+                record = json.load(file)
+            return record["stored_at"], record["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, stored_at, value):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as file:
+                json.dump({"key": key, "stored_at": stored_at, "value": value}, file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write flight cache entry: {str(e)}")
+
+    def _newest(self, key, lookup):
+        """Return the newest (stored_at, value) from memory or disk, or None."""
+        candidates = [entry for entry in (self._memory.get(lookup), self._read_disk(key)) if entry]
+        return max(candidates, key=lambda entry: entry[0]) if candidates else None
+
+    def get(self, key, fetch):
+        """
+        Return (value, stored_at, stale) for key, calling fetch() on a miss.
+        Args:
+            key (tuple): JSON-serializable cache key
+            fetch (callable): Returns a fresh JSON-serializable value or raises
+        Returns:
+            tuple: (value, time the value was fetched, True if the value is past its TTL)
+        Raises:
+            Exception: Whatever fetch raised, when no stale copy is available
+        """
+        key = list(key)
+        lookup = json.dumps(key)
+        with self._lock:
+            entry = self._memory.get(lookup)
+            if entry and time.time() - entry[0] < self.ttl_seconds:
+                record_cache("flight_status", True)
+                return entry[1], entry[0], False
+            future = self._inflight.get(lookup)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[lookup] = future
+        # Callers that join an in-flight fetch count as hits; only the leader calls upstream
+        record_cache("flight_status", not leader)
+
+        if leader:
+            self._lead(key, lookup, fetch, future)
+        return future.result()
+
+    def _lead(self, key, lookup, fetch, future):
+        # Another process may have refreshed the shared disk copy
+        on_disk = self._read_disk(key)
+        if on_disk and time.time() - on_disk[0] < self.ttl_seconds:
+            with self._lock:
+                self._memory[lookup] = on_disk
+                self._inflight.pop(lookup, None)
+            future.set_result((on_disk[1], on_disk[0], False))
+            return
+
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                newest = self._newest(key, lookup)
+                self._inflight.pop(lookup, None)
+            if newest and time.time() - newest[0] < self.stale_seconds:
+                logger.warning(f"Serving stale flight status for {key}: {str(e)}")
+                future.set_result((newest[1], newest[0], True))
+            else:
+                future.set_exception(e)
+            return
+
+        stored_at = time.time()
+        with self._lock:
+            # Entries too old to serve even as a fallback are dropped
+            for old_lookup, (old_stored_at, _) in list(self._memory.items()):
+                if stored_at - old_stored_at > self.stale_seconds:
+                    del self._memory[old_lookup]
+            self._memory[lookup] = (stored_at, value)
+            self._inflight.pop(lookup, None)
+        self._write_disk(key, stored_at, value)
+        future.set_result((value, stored_at, False))
+
+
+_flight_status_cache = None
+_flight_status_cache_lock = threading.Lock()
+
+
+def get_flight_status_cache():
+    """Return the process-wide flight-status cache shared by every Streamlit session."""
+    global _flight_status_cache
+    with _flight_status_cache_lock:
+        if _flight_status_cache is None:
+            _flight_status_cache = FlightStatusCache()
+    return _flight_status_cache
@@ -0,0 +1,223 @@
+"""
+Chat sessions kept in a local SQLite database, with each message stored as a
+zstandard-compressed blob, instead of in Streamlit session state. Only a bounded
+working set of recently active sessions is held in memory; idle sessions are
+evicted and reloaded lazily from the database when their user comes back. The
+session id travels in the page URL, so a reload picks up the same conversation.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from decouple import config
+
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# SQLite database file; empty keeps sessions in memory only, as before
+SESSION_STORE_PATH = config('SESSION_STORE_PATH', default='/tmp/nai_sessions/sessions.db')
+# Sessions held decompressed in memory; the least recently used beyond this are evicted
+SESSION_MEMORY_SESSIONS = config('SESSION_MEMORY_SESSIONS', default=64, cast=int)
+# Sessions untouched for this long are evicted from memory even under the limit
+SESSION_IDLE_SECONDS = config('SESSION_IDLE_SECONDS', default=600, cast=int)
+# Sessions not updated for this long are deleted from the database
+SESSION_RETENTION_DAYS = config('SESSION_RETENTION_DAYS', default=7, cast=float)
+SESSION_ZSTD_LEVEL = config('SESSION_ZSTD_LEVEL', default=3, cast=int)
+
+# Name of the URL query parameter that carries the session id
+SESSION_QUERY_PARAM = "session"
+_SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ChatSession:
+    """Messages ({"role", "content"} dicts, oldest first) and app state of one conversation."""
+
+    __slots__ = ("session_id", "messages", "state", "last_used")
+
+    def __init__(self, session_id, messages=None, state=None):
+        self.session_id = session_id
+        self.messages = messages or []
+        self.state = state or {}
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Write-through session store: every appended message is compressed and written
+    to SQLite at once, so evicting a session from memory never loses anything.
+    """
+
+    def __init__(self, path=SESSION_STORE_PATH, memory_sessions=SESSION_MEMORY_SESSIONS,
+                 idle_seconds=SESSION_IDLE_SECONDS, retention_days=SESSION_RETENTION_DAYS,
+                 level=SESSION_ZSTD_LEVEL):
+        self.memory_sessions = max(1, memory_sessions)
+        self.idle_seconds = idle_seconds
+        self.retention_seconds = retention_days * 86400
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._purged_at = time.monotonic()
+        if path:
+            try:
+                self._open(path, level)
+            except Exception as e:
+                # Chat still works, but sessions do not survive eviction or a reload
+                logger.warning(f"Session store unavailable ({str(e)}), keeping sessions in memory only")
+                self._db = None
+
+    def _open(self, path, level):
+        import zstandard
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection shared by every script thread, serialized by self._lock
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, state BLOB)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS messages ("
+                         "session_id TEXT NOT NULL, seq INTEGER NOT NULL, message BLOB NOT NULL, "
+                         "PRIMARY KEY (session_id, seq))")
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._purge_expired()
+
+    def _pack(self, value):
+        return self._compressor.compress(json.dumps(value).encode())
+
+    def _unpack(self, blob):
+        return json.loads(self._decompressor.decompress(blob))
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = "SELECT session_id FROM sessions WHERE updated_at < ?"
+        self._db.execute(f"DELETE FROM messages WHERE session_id IN ({expired})", (cutoff,))
+        deleted = self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+        if deleted:
+            logger.info(f"Deleted {deleted} chat sessions idle for over {self.retention_seconds / 86400:g} days")
+
+    def _evict(self):
+        # Least recently used first; the working set is bounded by count and by idle time
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.memory_sessions and now - session.last_used < self.idle_seconds:
+                break
+            del self._sessions[session_id]
+
+    def _load(self, session_id):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        messages = [self._unpack(blob) for (blob,) in self._db.execute(
+            "SELECT message FROM messages WHERE session_id = ? ORDER BY seq", (session_id,))]
+        return ChatSession(session_id, messages, self._unpack(row[0]) if row[0] else {})
+
+    def get(self, session_id):
+        """Return the session, from memory, from the database, or new and empty."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            record_cache("session", session is not None)
+            if session is None:
+                try:
+                    session = self._load(session_id)
+                except (sqlite3.Error, ValueError) as e:
+                    logger.error(f"Could not load chat session: {str(e)}")
+                    session = None
+                session = session or ChatSession(session_id)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            self._evict()
+            if self._db is not None and session.last_used - self._purged_at > 3600:
+                self._purged_at = session.last_used
+                try:
+                    self._purge_expired()
+                except sqlite3.Error as e:
+                    logger.error(f"Could not delete expired chat sessions: {str(e)}")
+            return session
+
+    def append(self, session, message):
+        """Add a message to the end of the session and write it through to the database."""
+        with self._lock:
+            session.messages.append(message)
+            session.last_used = time.monotonic()
+            if self._db is None:
+                return
+            try:
+                self._db.execute("BEGIN")
+                self._db.execute("INSERT INTO sessions (session_id, updated_at) VALUES (?, ?) "
+                                 "ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                                 (session.session_id, time.time()))
+                self._db.execute("INSERT OR REPLACE INTO messages (session_id, seq, message) VALUES (?, ?, ?)",
+                                 (session.session_id, len(session.messages) - 1,
+                                  self._pack({"role": message["role"], "content": message["content"]})))
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._db.execute("ROLLBACK")
+                logger.error(f"Could not save chat message: {str(e)}")
+
+    def save_state(self, session, state):
+        """Replace the app state (JSON-serializable dict) kept with the session."""
+        with self._lock:
+            session.state = state
+            if self._db is None:
+                return
+            try:
+                self._db.execute("INSERT INTO sessions (session_id, updated_at, state) VALUES (?, ?, ?) "
+                                 "ON CONFLICT (session_id) DO UPDATE SET "
+                                 "updated_at = excluded.updated_at, state = excluded.state",
+                                 (session.session_id, time.time(), self._pack(state)))
+            except sqlite3.Error as e:
+                logger.error(f"Could not save chat session state: {str(e)}")
+
+    def clear(self, session):
+        """Delete every message and the state of the session."""
+        with self._lock:
+            session.messages = []
+            session.state = {}
+            if self._db is None:
+                return
+            try:
+                self._db.execute("DELETE FROM messages WHERE session_id = ?", (session.session_id,))
+                self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session.session_id,))
+            except sqlite3.Error as e:
+                logger.error(f"Could not clear chat session: {str(e)}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the process-wide session store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
+
+
+def current_session():
+    """
+    The chat session of this browser tab. The id is kept in the page URL, so a
+    reload (or a reconnect after the session was evicted) finds the same session.
+    """
+    import streamlit as st
+
+    session_id = st.query_params.get(SESSION_QUERY_PARAM, "")
+    if not _SESSION_ID_PATTERN.match(session_id):
+        session_id = uuid.uuid4().hex
+        st.query_params[SESSION_QUERY_PARAM] = session_id
+    return get_session_store().get(session_id)
@@ -0,0 +1,108 @@
+# Shared module: chatbot/startup.py is the canonical copy. Edit it there and run
+# "bash sync_shared.sh" to update the copies in the other apps (see README.md).
+"""
+Cold-start helpers. Heavy modules are imported on a background thread while the
+first page paints, instead of at the top of the script, and each process logs a
+startup report: how long each of those imports took and how long after process
+start the first render (or API readiness) came. Both are also recorded in
+nai_stage_seconds, as "import:<module>" and the milestone name.
+"""
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+from decouple import config
+
+from metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PREWARM = config('STARTUP_PREWARM', default=True, cast=bool)
+
+# Origin for process_uptime() when /proc is not available
+_loaded_at = time.monotonic()
+_import_seconds = {}
+_milestones = {}
+_prewarm_started = False
+_lock = threading.Lock()
+
+
+def process_uptime():
+    """Seconds since this process started."""
+    try:
+        with open("/proc/self/stat") as file:
+            # starttime is field 22; count from the field after the parenthesized command name
+            start_ticks = int(file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as file:
+            system_uptime = float(file.read().split()[0])
+        return max(0.0, system_uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _loaded_at
+
+
+def timed_import(name):
+    """
+    Import a module, recording the time taken if this call is what loaded it.
+    Times are incremental: dependencies already loaded by an earlier import are not counted again.
+    """
+    already_loaded = name in sys.modules
+    started_at = time.perf_counter()
+    # Always go through the import system, which waits for an import in progress on another thread
+    module = importlib.import_module(name)
+    if not already_loaded:
+        seconds = time.perf_counter() - started_at
+        with _lock:
+            _import_seconds.setdefault(name, seconds)
+        observe_stage(f"import:{name}", seconds)
+    return module
+
+
+def _prewarm(targets):
+    started_at = time.perf_counter()
+    for target in targets:
+        name, _, function = target.partition(":")
+        try:
+            module = timed_import(name)
+            if function:
+                getattr(module, function)()
+        except Exception as e:
+            logger.warning(f"Prewarm of {target} failed: {str(e)}")
+    with _lock:
+        imports = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in _import_seconds.items())
+    logger.info(f"Prewarm finished in {time.perf_counter() - started_at:.2f}s ({imports or 'nothing to load'})")
+
+
+def prewarm(*targets):
+    """
+    Import modules on a daemon thread, once per process, so the first request that
+    needs them does not pay for the import. A target is a module name, or
+    "module:function" to also call a no-argument function once it is imported.
+    A request that needs a module before it is loaded waits on the same import.
+    """
+    global _prewarm_started
+    with _lock:
+        if _prewarm_started or not STARTUP_PREWARM:
+            return
+        _prewarm_started = True
+    threading.Thread(target=_prewarm, args=(targets,), name="prewarm", daemon=True).start()
+
+
+def record_startup(milestone="first_render"):
+    """Record, once per process, how long after process start a milestone was reached, and log the report."""
+    with _lock:
+        if milestone in _milestones:
+            return
+        seconds = _milestones[milestone] = process_uptime()
+        imports = ", ".join(f"{name} {value:.2f}s" for name, value in _import_seconds.items())
+    observe_stage(milestone, seconds)
+    logger.info(f"Startup: {milestone} {seconds:.2f}s after process start "
+                f"(imports so far: {imports or 'none'})")
+
+
+def startup_report():
+    """Import times per module and milestone times, in seconds."""
+    with _lock:
+        return {"imports": dict(_import_seconds), "milestones": dict(_milestones)}
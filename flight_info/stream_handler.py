@@ -0,0 +1,51 @@
+from langchain_core.callbacks import StreamingStdOutCallbackHandler
+
+
+class StreamHandler(StreamingStdOutCallbackHandler):
+    def __init__(self, container, debug_container):
+        super().__init__()
+        self.container = container
+        self.debug_container = debug_container
+        self.text = ""
+        self.debug_text = ""
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        print("Starting LLM...")
+        self.text += "Starting LLM...\n"
+        self.container.markdown(self.text)
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self.debug_text += token
+        if self.debug_container:
+            self.debug_container.text(self.debug_text)
+        self.text += token
+        self.container.markdown(self.text)
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        self.text += "\nLLM finished.\n"
+        self.container.markdown(self.text)
+
+    def on_llm_error(self, error, **kwargs) -> None:
+        self.text += f"Error: {str(error)}\n"
+        self.container.markdown(self.text)
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        print("Tool start:", serialized, input_str)
+        self.text += f"\nUsing tool: {serialized['name']}\n"
+        self.container.markdown(self.text)
+
+    def on_tool_end(self, output: str, **kwargs) -> None:
+        print("Tool end:", output)
+        self.text += f"Tool output: {output}\n"
+        self.container.markdown(self.text)
+
+    def on_chain_end(self, outputs, **kwargs):
+        print("Chain end:", outputs)
+        if outputs and isinstance(outputs, dict):
+            self.text += f"\nFinal output: {outputs.get('output', '')}\n"
+            self.container.markdown(self.text)
+
+    def on_chain_error(self, error: Exception, **kwargs) -> None:
+        print("Chain error:", error)
+        self.text += f"\nError: {str(error)}\n"
+        self.container.markdown(self.text)
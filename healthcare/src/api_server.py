@@ -0,0 +1,182 @@
+"""
+Headless HTTP API over the same analysis path as the Streamlit UI, for pipelines
+that push documents without a browser in the loop.
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8080
+
+POST /analyze takes a multipart upload ("file", plus optional "prompt", "model",
+"text_model", "multi_page", "text_layer", "structured" and "stream" fields) and returns the extraction as JSON, or as
+server-sent events ("token", then "result" or "error") when stream is true.
+The upstream API key defaults to API_KEY and can be overridden per request with
+an "Authorization: Bearer" header.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from decouple import config
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from config.prompts import DEFAULT_PROMPT, STRUCTURED_PROMPT
+from config.settings import (
+    API_MAX_CONCURRENCY,
+    API_MAX_UPLOAD_MB,
+    PDF_MULTI_PAGE,
+    PDF_TEXT_LAYER,
+    STRUCTURED_OUTPUT,
+    TEXT_MODEL_NAME,
+)
+from utils.api_handler import analyze_image
+from utils.image_processor import preprocess_image
+from utils.metrics import REGISTRY
+from utils.startup import prewarm, record_startup, startup_report
+
+logging.basicConfig(level=config('LOG_LEVEL', default='INFO'))
+logger = logging.getLogger("healthcare_api")
+
+API_ENDPOINT = config('API_ENDPOINT', default='https://nai.tmelab.net/api/v1')
+API_KEY = config('API_KEY', default='')
+VISION_MODEL_NAME = config('VISION_MODEL_NAME', default='llama-vision')
+
+_analysis_slots = asyncio.Semaphore(API_MAX_CONCURRENCY)
+
+
+def _flag(value, default):
+    if value is None or value == "":
+        return default
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def _summarize(result):
+    """Flatten an analyze_image result into the API response body."""
+    return {
+        "content": result["choices"][0]["message"]["content"],
+        "model": result.get("model"),
+        "usage": result.get("usage"),
+        "cache_hit": bool(result.get("cache_hit")),
+        "ttft_ms": result.get("ttft_ms"),
+        "page_count": result.get("page_count"),
+        "page_stats": result.get("page_stats"),
+        "text_pages": result.get("text_pages"),
+        "extraction": result.get("extraction"),
+    }
+
+
+def _run_analysis(api_endpoint, file_bytes, prompt, multi_page, structured, text_layer, on_token=None):
+    """Preprocess and analyze one document; runs on a worker thread."""
+    processed_file = preprocess_image(file_bytes)
+    if processed_file is None:
+        return {"error": "Failed to process the document"}
+    return analyze_image(api_endpoint, processed_file, prompt, multi_page=multi_page, on_token=on_token,
+                         structured=structured, text_layer=text_layer)
+
+
+async def analyze(request: Request):
+    max_bytes = API_MAX_UPLOAD_MB * 1024 * 1024
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        return JSONResponse({"error": f"Upload exceeds {API_MAX_UPLOAD_MB}MB"}, status_code=413)
+
+    try:
+        form = await request.form(max_files=1)
+    except Exception as e:
+        return JSONResponse({"error": f"Invalid multipart body: {str(e)}"}, status_code=400)
+    upload = form.get("file")
+    if upload is None or isinstance(upload, str):
+        return JSONResponse({"error": "Missing 'file' upload"}, status_code=400)
+    file_bytes = await upload.read()
+    await form.close()
+    if not file_bytes:
+        return JSONResponse({"error": "Empty 'file' upload"}, status_code=400)
+    if len(file_bytes) > max_bytes:
+        return JSONResponse({"error": f"Upload exceeds {API_MAX_UPLOAD_MB}MB"}, status_code=413)
+
+    authorization = request.headers.get("authorization", "")
+    api_endpoint = {
+        "url": API_ENDPOINT,
+        "model_name": form.get("model") or VISION_MODEL_NAME,
+        "text_model_name": form.get("text_model") or TEXT_MODEL_NAME,
+        "api_key": authorization[7:] if authorization.lower().startswith("bearer ") else API_KEY
+    }
+    multi_page = _flag(form.get("multi_page", request.query_params.get("multi_page")), PDF_MULTI_PAGE)
+    structured = _flag(form.get("structured", request.query_params.get("structured")), STRUCTURED_OUTPUT)
+    text_layer = _flag(form.get("text_layer", request.query_params.get("text_layer")), PDF_TEXT_LAYER)
+    prompt = form.get("prompt") or (STRUCTURED_PROMPT if structured else DEFAULT_PROMPT)
+    stream = _flag(form.get("stream", request.query_params.get("stream")), False)
+    logger.info(f"POST /analyze file={upload.filename} size={len(file_bytes) / 1024:.1f}KB "
+                f"multi_page={multi_page} text_layer={text_layer} structured={structured} stream={stream}")
+
+    if not stream:
+        async with _analysis_slots:
+            result = await run_in_threadpool(_run_analysis, api_endpoint, file_bytes, prompt, multi_page, structured,
+                                             text_layer)
+        if "error" in result:
+            return JSONResponse({"error": result["error"]}, status_code=502)
+        try:
+            return JSONResponse(_summarize(result))
+        except (KeyError, IndexError):
+            return JSONResponse({"error": "Unexpected API response format"}, status_code=502)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_token(token, batch=0):
+        # Called from the analysis thread (and its per-batch threads)
+        loop.call_soon_threadsafe(events.put_nowait, ("token", {"text": token, "batch": batch}))
+
+    async def run():
+        async with _analysis_slots:
+            try:
+                result = await run_in_threadpool(
+                    _run_analysis, api_endpoint, file_bytes, prompt, multi_page, structured, text_layer, on_token)
+                if "error" in result:
+                    events.put_nowait(("error", {"error": result["error"]}))
+                else:
+                    events.put_nowait(("result", _summarize(result)))
+            except Exception as e:
+                logger.error(f"Analysis failed: {str(e)}")
+                events.put_nowait(("error", {"error": str(e)}))
+
+    # The analysis runs to completion (and fills the result cache) even if the client disconnects
+    task = asyncio.create_task(run())
+
+    async def event_stream():
+        while True:
+            event, data = await events.get()
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event != "token":
+                break
+        await task
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "startup": startup_report()})
+
+
+async def metrics(request):
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start the PDF render workers and load pydantic before the first request needs them
+    prewarm("utils.pdf_renderer:warm_render_pool", "utils.extraction_schema")
+    record_startup("api_ready")
+    yield
+
+
+routes = [
+    Route("/analyze", analyze, methods=["POST"]),
+    Route("/health", health, methods=["GET"]),
+    Route("/metrics", metrics, methods=["GET"]),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
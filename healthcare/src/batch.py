@@ -0,0 +1,201 @@
+"""
+Batch extraction for a folder of documents, without the Streamlit UI.
+
+    python batch.py /data/referrals --output /data/referrals.jsonl --workers 4
+    python batch.py manifest.txt --output results.jsonl
+
+The input is a directory (walked recursively for PDFs and images) or a manifest
+file with one path per line. Each document gets one JSON line in the output.
+The output doubles as the checkpoint: rerunning the same command skips documents
+that already have a successful result, so an interrupted run resumes where it
+stopped and failed documents are retried.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from decouple import config
+
+from config.prompts import DEFAULT_PROMPT, STRUCTURED_PROMPT
+from config.settings import BATCH_WORKERS, PDF_MULTI_PAGE, PDF_TEXT_LAYER, STRUCTURED_OUTPUT, TEXT_MODEL_NAME
+from utils.api_handler import analyze_image
+from utils.image_processor import preprocess_image
+from utils.section_merger import split_sections
+
+logging.basicConfig(level=config('LOG_LEVEL', default='INFO'), format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("healthcare_batch")
+
+DOCUMENT_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.webp', '.tif', '.tiff')
+
+
+def find_documents(source):
+    """Return the document paths under a directory, or listed in a manifest file."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(DOCUMENT_EXTENSIONS))
+        return sorted(paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r') as file:
+        lines = [line.strip() for line in file]
+    return [line if os.path.isabs(line) else os.path.join(base, line)
+            for line in lines if line and not line.startswith('#')]
+
+
+def load_checkpoint(output_path):
+    """Return {path: sha256} for the documents already extracted successfully."""
+    done = {}
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if record.get("status") == "ok":
+                done[record["path"]] = record["sha256"]
+    return done
+
+
+def process_document(path, api_endpoint, prompt, multi_page, structured, done, text_layer=PDF_TEXT_LAYER):
+    """Extract one document. Returns its output record, or None if already done."""
+    started_at = time.perf_counter()
+    record = {"path": path, "sha256": None, "status": "error"}
+    try:
+        with open(path, 'rb') as file:
+            file_bytes = file.read()
+        record["sha256"] = hashlib.sha256(file_bytes).hexdigest()
+        if done.get(path) == record["sha256"]:
+            return None
+
+        processed_file = preprocess_image(file_bytes)
+        if processed_file is None:
+            record["error"] = "Failed to process the document"
+        else:
+            result = analyze_image(api_endpoint, processed_file, prompt, multi_page=multi_page, structured=structured,
+                                   text_layer=text_layer)
+            if "error" in result:
+                record["error"] = result["error"]
+            else:
+                content = result["choices"][0]["message"]["content"]
+                record.update({
+                    "status": "ok",
+                    "page_count": result.get("page_count", 1),
+                    "text_pages": result.get("text_pages", 0),
+                    "usage": result.get("usage"),
+                    "cache_hit": bool(result.get("cache_hit")),
+                })
+                if "extraction" in result:
+                    # The validated object is the compact form; the markdown can be re-rendered from it
+                    record["extraction"] = result["extraction"]
+                else:
+                    record["content"] = content
+                    record["sections"] = {title: lines for title, lines in split_sections(content).items()
+                                          if title is not None}
+    except Exception as e:
+        record["error"] = str(e)
+    record["elapsed_s"] = round(time.perf_counter() - started_at, 2)
+    record["processed_at"] = datetime.now(timezone.utc).isoformat()
+    return record
+
+
+def run_batch(paths, output_path, api_endpoint, prompt=DEFAULT_PROMPT, multi_page=PDF_MULTI_PAGE,
+              structured=STRUCTURED_OUTPUT, workers=BATCH_WORKERS, text_layer=PDF_TEXT_LAYER):
+    """
+    Extract every document in paths with a bounded worker pool, appending one JSON
+    line per document to output_path.
+    Returns:
+        dict: Counts of "ok", "failed" and "skipped" documents, and "docs_per_minute"
+    """
+    done = load_checkpoint(output_path)
+    stats = {"ok": 0, "failed": 0, "skipped": 0}
+    lock = threading.Lock()
+    started_at = time.perf_counter()
+
+    with open(output_path, 'a') as output, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(process_document, path, api_endpoint, prompt, multi_page, structured, done,
+                                   text_layer): path
+                   for path in paths}
+        try:
+            for future in as_completed(futures):
+                record = future.result()
+                with lock:
+                    if record is None:
+                        stats["skipped"] += 1
+                        continue
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    if record["status"] == "ok":
+                        stats["ok"] += 1
+                    else:
+                        stats["failed"] += 1
+                        logger.warning(f"Failed {record['path']}: {record.get('error')}")
+                    processed = stats["ok"] + stats["failed"]
+                    minutes = (time.perf_counter() - started_at) / 60
+                    logger.info(f"[{processed + stats['skipped']}/{len(paths)}] {record['path']} "
+                                f"{record['status']} in {record['elapsed_s']}s "
+                                f"({processed / minutes:.1f} docs/min, {stats['failed']} failed)")
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; finished documents are saved and will be skipped on the next run")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    minutes = (time.perf_counter() - started_at) / 60
+    processed = stats["ok"] + stats["failed"]
+    stats["docs_per_minute"] = round(processed / minutes, 1) if processed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of documents, or a manifest file with one path per line")
+    parser.add_argument("--output", required=True, help="JSONL results file (also the resume checkpoint)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="documents processed at once")
+    parser.add_argument("--model", default=config('VISION_MODEL_NAME', default='llama-vision'))
+    parser.add_argument("--text-model", default=TEXT_MODEL_NAME,
+                        help="text-only model for PDF pages sent as text (default: --model)")
+    parser.add_argument("--prompt-file", help="use this prompt instead of the default extraction prompt")
+    parser.add_argument("--first-page-only", action="store_true", help="analyze only the first page of PDFs")
+    parser.add_argument("--text-layer", action=argparse.BooleanOptionalAction, default=PDF_TEXT_LAYER,
+                        help="send pages of digital PDFs as their embedded text instead of images")
+    parser.add_argument("--structured", action=argparse.BooleanOptionalAction, default=STRUCTURED_OUTPUT,
+                        help="store the schema-validated JSON extraction instead of markdown")
+    args = parser.parse_args()
+
+    paths = find_documents(args.source)
+    if not paths:
+        sys.exit(f"No documents found in {args.source}")
+
+    prompt = STRUCTURED_PROMPT if args.structured else DEFAULT_PROMPT
+    if args.prompt_file:
+        with open(args.prompt_file, 'r') as file:
+            prompt = file.read()
+
+    api_endpoint = {
+        "url": config('API_ENDPOINT', default='https://nai.tmelab.net/api/v1'),
+        "model_name": args.model,
+        "text_model_name": args.text_model,
+        "api_key": config('API_KEY', default='')
+    }
+    logger.info(f"Processing {len(paths)} documents with {args.workers} workers into {args.output}")
+    stats = run_batch(paths, args.output, api_endpoint, prompt,
+                      multi_page=PDF_MULTI_PAGE and not args.first_page_only, structured=args.structured,
+                      workers=args.workers, text_layer=args.text_layer)
+    logger.info(f"Done: {stats['ok']} extracted, {stats['failed']} failed, {stats['skipped']} already done, "
+                f"{stats['docs_per_minute']} docs/min")
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
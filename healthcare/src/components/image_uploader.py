@@ -1,46 +1,50 @@
+def _thumbnail_strip(uploaded_file, file_hash, page_count):
+    import streamlit as st
+    from config.settings import PREVIEW_STRIP_PAGES, PREVIEW_THUMBNAIL_WIDTH
+    from utils.preview import pdf_previews
+
+    # Thumbnails render only when asked for, a strip of pages at a time
+    if not st.toggle(f"Show all {page_count} pages", key=f"strip_{file_hash}"):
+        return
+    shown_key = f"strip_pages_{file_hash}"
+    shown = min(st.session_state.get(shown_key, PREVIEW_STRIP_PAGES), page_count)
+    columns_per_row = 4
+    for start in range(0, shown, PREVIEW_STRIP_PAGES):
+        _, thumbnails = pdf_previews(file_hash, uploaded_file.getvalue(), start, start + PREVIEW_STRIP_PAGES,
+                                     PREVIEW_THUMBNAIL_WIDTH)
+        for row in range(0, len(thumbnails), columns_per_row):
+            columns = st.columns(columns_per_row)
+            for offset, thumbnail in enumerate(thumbnails[row:row + columns_per_row]):
+                columns[offset].image(thumbnail, caption=f"Page {start + row + offset + 1}",
+                                      width=PREVIEW_THUMBNAIL_WIDTH)
+    if shown < page_count and st.button("Show more pages", key=f"strip_more_{file_hash}"):
+        st.session_state[shown_key] = shown + PREVIEW_STRIP_PAGES
+        st.rerun()
+
+
 def upload_image():
     import streamlit as st
-    from PIL import Image
-    import io
-    import fitz  # PyMuPDF
+    from config.settings import PREVIEW_WIDTH
+    from utils.preview import file_digest, image_preview, pdf_previews
 
     uploaded_file = st.file_uploader("Choose an image or PDF...", type=["jpg", "jpeg", "png", "pdf"])
 
     if uploaded_file is not None:
-        # To read file as bytes:
+        # Previews are cached by file hash, so reruns do not decode or render the file again
+        file_hash = file_digest(uploaded_file)
         if uploaded_file.type.startswith('image'):
-            image = Image.open(uploaded_file)
-            # Calculate max width and height to fit on screen
-            max_width = 400
-            # Maintain aspect ratio
-            width, height = image.size
-            aspect_ratio = width / height
-            new_height = int(max_width / aspect_ratio)
-            
-            # Display image with controlled size
-            st.image(image, caption='Uploaded Image', width=max_width)
+            st.image(image_preview(file_hash, uploaded_file.getvalue()), caption='Uploaded Image', width=PREVIEW_WIDTH)
             st.success("Image uploaded successfully!")
         elif uploaded_file.type == "application/pdf":
             try:
-                # Get PDF bytes
-                pdf_bytes = uploaded_file.getvalue()
-                
-                # Open the PDF with PyMuPDF
-                pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-                
-                # Get the first page
-                first_page = pdf_document[0]
-                
-                # Render page to an image (PNG)
-                pix = first_page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                img_bytes = pix.tobytes("png")
-                
+                page_count, (first_page,) = pdf_previews(file_hash, uploaded_file.getvalue(), 0, 1)
+
                 # Display the first page as preview
-                st.image(Image.open(io.BytesIO(img_bytes)), caption=f"PDF Preview: {uploaded_file.name}", width=400)
-                st.success(f"PDF uploaded: {uploaded_file.name} ({pdf_document.page_count} pages)")
-                
-                # Close the document
-                pdf_document.close()
+                st.image(first_page, caption=f"PDF Preview: {uploaded_file.name}", width=PREVIEW_WIDTH)
+                st.success(f"PDF uploaded: {uploaded_file.name} ({page_count} pages)")
+
+                if page_count > 1:
+                    _thumbnail_strip(uploaded_file, file_hash, page_count)
             except Exception as e:
                 st.error(f"Error previewing PDF: {str(e)}")
                 st.success(f"PDF uploaded: {uploaded_file.name}")
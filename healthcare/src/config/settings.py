@@ -1,3 +1,83 @@
 # settings.py
 
-# This file is intentionally left blank.
\ No newline at end of file
+from decouple import config
+
+# Multi-page PDF analysis
+PDF_MULTI_PAGE = config('PDF_MULTI_PAGE', default=True, cast=bool)
+PDF_RENDER_ZOOM = config('PDF_RENDER_ZOOM', default=3.0, cast=float)
+PDF_MAX_PAGES = config('PDF_MAX_PAGES', default=30, cast=int)
+# Upper bound on the pixels rendered across all pages of one document
+PDF_MAX_TOTAL_PIXELS = config('PDF_MAX_TOTAL_PIXELS', default=60_000_000, cast=int)
+PDF_RENDER_WORKERS = config('PDF_RENDER_WORKERS', default=4, cast=int)
+# Pages sent per vision request; 0 sends every page in a single request
+PDF_PAGES_PER_REQUEST = config('PDF_PAGES_PER_REQUEST', default=4, cast=int)
+PDF_BATCH_CONCURRENCY = config('PDF_BATCH_CONCURRENCY', default=2, cast=int)
+
+# Digital PDFs: pages with a complete text layer are sent as text instead of images
+PDF_TEXT_LAYER = config('PDF_TEXT_LAYER', default=True, cast=bool)
+# A page needs at least this much embedded text, and images covering at most this fraction of it
+PDF_TEXT_MIN_CHARS = config('PDF_TEXT_MIN_CHARS', default=200, cast=int)
+PDF_TEXT_MAX_IMAGE_AREA = config('PDF_TEXT_MAX_IMAGE_AREA', default=0.1, cast=float)
+PDF_TEXT_PAGES_PER_REQUEST = config('PDF_TEXT_PAGES_PER_REQUEST', default=10, cast=int)
+# Text-only model for those pages; empty uses the vision model with text input
+TEXT_MODEL_NAME = config('TEXT_MODEL_NAME', default='')
+
+# Vision request options
+VISION_MAX_TOKENS = config('VISION_MAX_TOKENS', default=1024, cast=int)
+VISION_TEMPERATURE = config('VISION_TEMPERATURE', default=0.1, cast=float)
+
+# Structured extraction: the model returns JSON validated against utils/extraction_schema.py
+STRUCTURED_OUTPUT = config('STRUCTURED_OUTPUT', default=False, cast=bool)
+# How the schema is enforced: json_schema (guided decoding), json_object, or none (prompt only)
+STRUCTURED_RESPONSE_FORMAT = config('STRUCTURED_RESPONSE_FORMAT', default='json_schema')
+# JSON is more verbose than the markdown report
+STRUCTURED_MAX_TOKENS = config('STRUCTURED_MAX_TOKENS', default=2048, cast=int)
+
+# Prompt-prefix caching: the extraction prompt goes first, so every request starts with the
+# same tokens. Hints mark it cacheable (cache_control) and add a prompt_cache_key, for servers
+# and gateways that take them
+PROMPT_CACHE_HINTS = config('PROMPT_CACHE_HINTS', default=False, cast=bool)
+# Send the prompt as a system message of its own rather than the first part of the user message.
+# Keeps it ahead of the image tokens for chat templates that put images first; leave off for
+# models that do not take a system prompt with an image (Llama 3.2 Vision)
+PROMPT_SYSTEM_ROLE = config('PROMPT_SYSTEM_ROLE', default=False, cast=bool)
+
+# Analysis result cache
+RESULT_CACHE_ENABLED = config('RESULT_CACHE_ENABLED', default=True, cast=bool)
+RESULT_CACHE_MEMORY_ENTRIES = config('RESULT_CACHE_MEMORY_ENTRIES', default=128, cast=int)
+# Directory for the on-disk tier shared by all processes in the container; empty disables it
+RESULT_CACHE_DIR = config('RESULT_CACHE_DIR', default='')
+RESULT_CACHE_DISK_MAX_MB = config('RESULT_CACHE_DISK_MAX_MB', default=256, cast=int)
+RESULT_CACHE_TTL_SECONDS = config('RESULT_CACHE_TTL_SECONDS', default=86400, cast=int)
+
+# Image preprocessing before upload (also applied to rendered PDF pages)
+IMAGE_OPTIMIZE_ENABLED = config('IMAGE_OPTIMIZE_ENABLED', default=True, cast=bool)
+# Longest side in pixels after downscaling; 0 disables the limit
+IMAGE_MAX_LONG_EDGE = config('IMAGE_MAX_LONG_EDGE', default=2048, cast=int)
+# Pixel budget (width x height) after downscaling; 0 disables the limit
+IMAGE_MAX_PIXELS = config('IMAGE_MAX_PIXELS', default=4_000_000, cast=int)
+# JPEG, WEBP or PNG
+IMAGE_FORMAT = config('IMAGE_FORMAT', default='JPEG')
+IMAGE_QUALITY = config('IMAGE_QUALITY', default=85, cast=int)
+IMAGE_GRAYSCALE = config('IMAGE_GRAYSCALE', default=False, cast=bool)
+IMAGE_AUTOCROP = config('IMAGE_AUTOCROP', default=True, cast=bool)
+
+# Upload previews, rendered once per file and cached across reruns
+PREVIEW_WIDTH = config('PREVIEW_WIDTH', default=400, cast=int)
+PREVIEW_CACHE_ENTRIES = config('PREVIEW_CACHE_ENTRIES', default=256, cast=int)
+# PDF page thumbnails: width and pages added per "Show more"
+PREVIEW_THUMBNAIL_WIDTH = config('PREVIEW_THUMBNAIL_WIDTH', default=160, cast=int)
+PREVIEW_STRIP_PAGES = config('PREVIEW_STRIP_PAGES', default=8, cast=int)
+
+# Streaming responses
+STREAM_RESPONSES = config('STREAM_RESPONSES', default=True, cast=bool)
+# Maximum re-renders per second while tokens stream in
+STREAM_RENDER_FPS = config('STREAM_RENDER_FPS', default=12, cast=float)
+
+# Headless HTTP API (src/api_server.py)
+# Analyses run at once per API process; further requests wait for a slot
+API_MAX_CONCURRENCY = config('API_MAX_CONCURRENCY', default=8, cast=int)
+API_MAX_UPLOAD_MB = config('API_MAX_UPLOAD_MB', default=25, cast=int)
+
+# Batch extraction (src/batch.py): documents processed at once
+BATCH_WORKERS = config('BATCH_WORKERS', default=4, cast=int)
@@ -2,10 +2,13 @@ import streamlit as st
 from components.api_endpoint import create_api_endpoint_uploader
 from components.image_uploader import upload_image
 from components.prompt_editor import edit_prompt
-from utils.api_handler import analyze_image
 from utils.image_processor import preprocess_image
+from utils.metrics import start_metrics_server
+from utils.startup import prewarm, record_startup
 from urllib.parse import urlparse
-from utils.text_effects import typing_effect
+from utils.text_effects import StreamingMarkdown, typing_effect
+from config.settings import PDF_MULTI_PAGE, PDF_TEXT_LAYER, STREAM_RESPONSES, STRUCTURED_OUTPUT, TEXT_MODEL_NAME
+from config.prompts import DEFAULT_PROMPT, STRUCTURED_PROMPT
 from decouple import config
 
 def is_valid_url(url):
@@ -16,6 +19,12 @@ def is_valid_url(url):
         return False
 
 def main():
+    # Prometheus metrics for this container, started once per process
+    start_metrics_server()
+
+    # The API client, PyMuPDF, pydantic and the PDF render workers load in the background while the page paints
+    prewarm("utils.api_handler", "utils.pdf_renderer:warm_render_pool", "utils.extraction_schema")
+
     # Configure page with custom styling
     st.set_page_config(layout="wide", page_title="Healthcare Document Assistant", page_icon="🏥", menu_items=None)
     
@@ -225,156 +234,36 @@ def main():
             st.markdown("<div style='height: 10px;'></div>", unsafe_allow_html=True)
             uploaded_image = upload_image()
 
+            analyze_all_pages = st.checkbox(
+                "Analyze all PDF pages",
+                value=PDF_MULTI_PAGE,
+                help="Render every page of a PDF and merge the per-page results. Unchecked analyzes only the first page."
+            )
+
+            use_text_layer = st.checkbox(
+                "Use PDF text layer",
+                value=PDF_TEXT_LAYER,
+                help="Send pages of digital PDFs as their embedded text instead of images. Scanned pages and pages with images still go to the vision model."
+            )
+            text_model_name = st.text_input(
+                "Text Endpoint Name",
+                value=TEXT_MODEL_NAME,
+                placeholder="Same as the endpoint above",
+                help="Text-only model for pages sent as text",
+                disabled=not use_text_layer
+            )
+
+            structured_output = st.checkbox(
+                "Structured output",
+                value=STRUCTURED_OUTPUT,
+                help="Ask the model for JSON matching the extraction schema, validate it, and render the report from it."
+            )
+
             # Prompt Section
             # st.markdown("<h3>Prompt Configuration</h3>", unsafe_allow_html=True)
             
             # Default healthcare system prompt
-            default_prompt = """
-
-You are a medical AI assistant specialized in extracting critical information from healthcare documents. Your primary responsibility is PATIENT SAFETY through accurate information extraction.
-
-## Instructions:
-Analyze the provided healthcare document and extract ONLY information that is explicitly written and clearly visible. Do not interpret, estimate, round, or fill in any missing information. Present information exactly as it appears in the document using bullet points and precise formatting.
-
-## Required Information Categories:
-
-### 1. PATIENT DEMOGRAPHICS
-- Full name, age, sex, date of birth
-- Contact information (phone, address, email)
-- Insurance information (carrier, member ID, group number)
-- Medical record number if available
-
-### 2. CLINICAL PRESENTATION
-- **Chief complaint** (exact wording from document)
-- **History of present illness** (detailed symptom description)
-- **Symptom characteristics** (duration, frequency, triggers, quality)
-- **Associated symptoms** and alleviating/aggravating factors
-- **Review of systems** findings
-
-### 3. VITAL SIGNS & MEASUREMENTS
-- All vital signs with exact values and dates taken
-- BMI and other measurements
-- Oxygen saturation if documented
-
-### 4. CURRENT MEDICATIONS & ALLERGIES
-- **All current medications** (exact names, doses, frequencies)
-- **All allergies** with specific reactions documented
-- **Recent medication changes** or new prescriptions
-
-### 5. MEDICAL HISTORY
-- **Past medical history** (conditions with diagnosis years when available)
-- **Surgical history** (procedures and years)
-- **Family history** (specific conditions and relationships)
-- **Social history** (smoking, alcohol, occupation, exercise habits)
-
-### 6. DIAGNOSTIC RESULTS
-- **Laboratory values** (exact values with units and dates)
-- **Imaging results** (specific findings, not interpretations)
-- **EKG findings** (exact technical findings)
-- **Other diagnostic tests** with dates and results
-
-### 7. CLINICAL ASSESSMENT & reasoning
-- **Primary assessment/diagnosis** (exact wording from provider)
-- **Secondary conditions** being managed
-- **Risk factors** identified by provider
-- **Clinical reasoning** for referral or treatment decisions
-- **Differential diagnoses** if mentioned
-
-### 8. URGENCY & CLINICAL DECISION-MAKING
-- **Urgency level** with specific justification from document
-- **Clinical reasoning** for urgency determination
-- **Risk stratification** comments from provider
-- **Specific questions** for consultant/specialist
-- **Treatment already initiated** 
-
-### 9. REFERRAL & FOLLOW-UP DETAILS
-- **Specific referrals** requested (specialty, preferred provider)
-- **Patient availability** and scheduling preferences
-- **Activity restrictions** or precautions ordered
-- **Follow-up requirements** and monitoring needs
-
-### 10. ADDITIONAL CLINICAL NOTES
-- **Provider observations** about patient status
-- **Patient concerns** and anxiety levels
-- **Compliance issues** or patient education needs
-- **Copies sent to** (documentation trail)
-- **Any additional clinical context** affecting care
-
-## Output Format:
-Structure your response using the exact headings above. Under each heading, use bullet points with concise, clinically relevant information. Avoid unnecessary narrative - focus on facts that impact clinical decision-making.
-
-**Example formatting based on your sample:**
-### PATIENT DEMOGRAPHICS
-- Name: James Robert Thompson, Age: 59, Sex: Male
-- DOB: 11/22/1965, MRN: WFM-789456
-- Address: 856 Maple Ridge Lane, Raleigh, NC 27612
-- Phone: (919) 555-0156, Email: j.thompson@email.com
-- Insurance: Aetna PPO - Member ID: AET987654321, Group #: 7429-EMP
-
-### CLINICAL PRESENTATION
-- Chief complaint: "Intermittent chest pain for 6 weeks, worsening with exertion"
-- History: 59-year-old male with 6-week history of substernal chest pressure, "squeezing" sensation lasting 5-10 minutes
-- Triggers: Climbing stairs or brisk walking
-- Associated symptoms: Mild shortness of breath, some improvement with sitting down
-- Frequency: Episodes occurring 3-4 times per week
-
-### VITAL SIGNS & MEASUREMENTS
-- BP: 148/92 mmHg, HR: 78 bpm regular, Temp: 98.4°F
-- Resp: 16/min, O2 Sat: 97% on room air, BMI: 32.1
-- Date: Latest visit 06/12/2025
-
-### CLINICAL ASSESSMENT & REASONING
-- Assessment: "Chest pain, likely anginal equivalent - rule out CAD"
-- Secondary: "Hypertension, suboptimally controlled; Type 2 DM with suboptimal glucose control; Dyslipidemia; Obesity"
-- Risk factors: Multiple cardiac risk factors (diabetes, hypertension, dyslipidemia, family history, former smoking)
-
-### URGENCY & CLINICAL DECISION-MAKING
-- Urgency level: Routine (checked on form)
-- Clinical reasoning: "Patient has multiple cardiac risk factors with new-onset exertional chest pain and EKG abnormalities. While troponin negative, symptoms are concerning for unstable angina or early CAD requiring prompt evaluation"
-- Specific questions for consultant: "Cardiac stress testing vs. cardiac catheterization? Optimization of cardiac medications? Risk stratification for surgical procedures?"
-
-### ADDITIONAL CLINICAL NOTES
-- Provider observations: "Patient very anxious about cardiac symptoms since father's early MI. Has been avoiding physical activity due to fear of triggering symptoms"
-- Family input: "Wife reports he seems more fatigued lately"
-- Patient compliance: "Patient understands need for specialist evaluation and is compliant with medications"
-- Activity restrictions: "Advised activity restriction pending cardiac clearance"
-
-**Counter-examples of what NOT to do:**
--  "Blood pressure approximately 150/90" (when document shows 148/92)
--  "Patient is about 60 years old" (when document shows age 59)
--  "Cholesterol around 200" (when document shows 198 mg/dL)
--  Adding information not in the document
--  "Unable to read" should be "Unable to read from document"
-
-## CRITICAL SAFETY REQUIREMENTS:
-**MEDICAL ACCURACY IS PARAMOUNT - INCORRECT INFORMATION CAN CAUSE PATIENT HARM**
-
-### Mandatory Rules:
-1. **NEVER invent, estimate, or guess information** - Only extract what is explicitly written
-2. **NEVER round numbers** - Copy all numerical values exactly as shown (e.g., if document shows "148/92 mmHg", write exactly "148/92 mmHg", not "150/90")
-3. **NEVER approximate dates** - Use exact dates as written or state "Date not specified"
-4. **NEVER interpret abbreviations** unless certain - Write exactly as shown
-5. **NEVER fill in missing information** - If information is unclear or missing, write "Not specified" or "Unable to read"
-6. **NEVER assume medication dosages** - Copy exact text including units (mg, mL, etc.)
-7. **NEVER paraphrase medical conditions** - Use exact terminology from document
-
-## Key Guidelines:
-- **Extract only explicitly documented information**
-- **Copy numerical values exactly as written**
-- **Include specific dates exactly as shown**
-- **Use exact medical terminology from document**
-- **State when information is missing rather than guessing**
-- **Preserve original formatting of critical values**
-
-## Quality Checks:
-Before finalizing your extraction, ensure you have:
-- Verified all numbers match the source exactly
-- Confirmed no information was invented or assumed
-- Checked that unclear items are marked as such
-- Ensured all medical values retain original precision
-- Confirmed dates and times are exact copies
-
-Now analyze the provided healthcare document and extract the information according to these guidelines."""
+            default_prompt = STRUCTURED_PROMPT if structured_output else DEFAULT_PROMPT
             
             # prompt = edit_prompt()
             
@@ -401,6 +290,9 @@ Now analyze the provided healthcare document and extract the information accordi
             # Process both PDFs and images equally
             
             with st.spinner('Processing document...'):
+                # Usually already loaded by prewarm(); otherwise this waits for it
+                from utils.api_handler import analyze_image
+
                 processed_file = preprocess_image(uploaded_image)
                 
                 if processed_file is None:
@@ -410,10 +302,15 @@ Now analyze the provided healthcare document and extract the information accordi
                 api_endpoint = {
                     "url": api_url,
                     "model_name": model_name,
+                    "text_model_name": text_model_name,
                     "api_key": api_key
                 }
 
-                result = analyze_image(api_endpoint, processed_file, prompt)
+                # Tokens render as they arrive when streaming is enabled
+                stream_view = StreamingMarkdown() if STREAM_RESPONSES and not structured_output else None
+                result = analyze_image(api_endpoint, processed_file, prompt, multi_page=analyze_all_pages,
+                                       on_token=stream_view, structured=structured_output,
+                                       text_layer=use_text_layer)
 
                 if "error" in result:
                     st.error(result["error"])
@@ -423,7 +320,16 @@ Now analyze the provided healthcare document and extract the information accordi
                         
                         # Check for extraction warning indicators
                         formatted_content = content
-                        if "PARTIAL TEXT EXTRACTION" in content:
+                        extraction = result.get("extraction")
+                        if extraction is not None:
+                            # Structured results report the status directly
+                            if extraction["extraction_status"] == "partial":
+                                formatted_content = ("<div class='text-extraction-warning'>PARTIAL TEXT EXTRACTION: "
+                                                     "Some text could not be fully extracted</div>\n\n" + content)
+                            elif extraction["extraction_status"] == "not_possible":
+                                formatted_content = ("<div class='text-extraction-warning'>TEXT EXTRACTION NOT POSSIBLE: "
+                                                     "The handwritten text could not be reliably extracted</div>\n\n" + content)
+                        elif "PARTIAL TEXT EXTRACTION" in content:
                             formatted_content = content.replace("PARTIAL TEXT EXTRACTION", 
                                 "<div class='text-extraction-warning'>PARTIAL TEXT EXTRACTION: Some text could not be fully extracted</div>")
                         elif "TEXT EXTRACTION NOT POSSIBLE" in content:
@@ -432,8 +338,38 @@ Now analyze the provided healthcare document and extract the information accordi
                         
                         with st.container():
                             st.markdown("<div class='analysis-results'>", unsafe_allow_html=True)
-                            typing_effect(formatted_content)
+                            if stream_view is not None and stream_view.first_token_at is not None:
+                                stream_view.finish(formatted_content)
+                            else:
+                                typing_effect(formatted_content)
                             st.markdown("</div>", unsafe_allow_html=True)
+
+                        if result.get("ttft_ms") is not None:
+                            st.caption(f"Time to first token: {result['ttft_ms']:.0f}ms")
+
+                        # Reported by servers with prefix caching and prompt token details enabled
+                        usage = result.get("usage") or {}
+                        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+                        if usage.get("prompt_tokens") and cached_tokens is not None:
+                            st.caption(f"Prompt: {usage['prompt_tokens']} tokens, "
+                                       f"{cached_tokens} from the prefix cache")
+
+                        if result.get("cache_hit"):
+                            st.caption("Served from the result cache")
+
+                        if extraction is not None:
+                            with st.expander("Structured data"):
+                                st.json(extraction)
+
+                        if result.get("page_stats"):
+                            page_stats = result["page_stats"]
+                            with st.expander(f"Page rendering ({len(page_stats)} of {result['page_count']} pages)"):
+                                st.caption(
+                                    f"Render: {sum(p['render_ms'] for p in page_stats):.0f}ms total, "
+                                    f"payload: {sum(p['payload_kb'] for p in page_stats):.0f}KB total, "
+                                    f"{result.get('text_pages', 0)} page(s) sent as text"
+                                )
+                                st.table(page_stats)
                     except (KeyError, IndexError) as e:
                         st.error("Unexpected API response format")
 
@@ -444,3 +380,4 @@ Now analyze the provided healthcare document and extract the information accordi
 
 if __name__ == "__main__":
     main()
+    record_startup("first_render")
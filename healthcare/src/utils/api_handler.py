@@ -1,18 +1,263 @@
-def analyze_image(api_endpoint, file_bytes, prompt):
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from config.settings import (
+    PDF_BATCH_CONCURRENCY,
+    PDF_MAX_PAGES,
+    PDF_MULTI_PAGE,
+    PDF_PAGES_PER_REQUEST,
+    PDF_TEXT_LAYER,
+    PDF_TEXT_PAGES_PER_REQUEST,
+    PROMPT_CACHE_HINTS,
+    PROMPT_SYSTEM_ROLE,
+    STRUCTURED_MAX_TOKENS,
+    STRUCTURED_OUTPUT,
+    STRUCTURED_RESPONSE_FORMAT,
+    TEXT_MODEL_NAME,
+    VISION_MAX_TOKENS,
+    VISION_TEMPERATURE,
+)
+from utils.http_client import get_session
+from utils.image_processor import image_mime_type
+from utils.metrics import PAYLOAD_BYTES, observe_stage, record_cache, record_request, record_usage, span
+from utils.request_body import ChatRequestBody, InlineImage
+from utils.result_cache import get_result_cache, make_cache_key
+from utils.section_merger import merge_section_reports
+from utils.streaming import read_event_stream
+
+
+def _post_completion(url, headers, model_name, prompt, images, page_note=None, on_token=None,
+                     response_format=None, max_tokens=None, texts=None):
+    """
+    Send one chat completion request with the prompt and a list of encoded images.
+    The prompt is sent first (as the first part of the user message, or with
+    PROMPT_SYSTEM_ROLE as a system message of its own) and everything that differs
+    between requests (page note, page texts, images) follows, so every request
+    shares the prompt as a prefix the server can cache.
+    When on_token is given the response is streamed and on_token receives each content delta.
+    response_format and max_tokens override the request defaults for structured output.
+    texts are page texts sent after the prompt; without images the message content is plain
+    text, which text-only models accept.
+    Returns:
+        tuple: (JSON response or error dict, list of base64 payload sizes per image,
+                seconds to the first streamed token or None)
+    """
+    prompt_part = {"type": "text", "text": prompt}
+    if PROMPT_CACHE_HINTS:
+        prompt_part["cache_control"] = {"type": "ephemeral"}
+
+    content = [] if PROMPT_SYSTEM_ROLE else [prompt_part]
+    if page_note:
+        content.append({"type": "text", "text": page_note})
+    for text in texts or []:
+        content.append({"type": "text", "text": text})
+
+    for image in images:
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                # Base64-encoded as the body is sent, straight from the image buffer
+                "url": InlineImage(image, image_mime_type(image))
+            }
+        })
+
+    # Plain text unless the parts carry the cache hint
+    if not images and not (PROMPT_CACHE_HINTS and content and content[0] is prompt_part):
+        content = "\n\n".join(part["text"] for part in content)
+
+    # Create message payload with structured content
+    messages = [
+        {
+            "role": "user",
+            "content": content
+        }
+    ]
+    if PROMPT_SYSTEM_ROLE:
+        messages.insert(0, {
+            "role": "system",
+            "content": [prompt_part] if PROMPT_CACHE_HINTS else prompt
+        })
+
+    # Prepare payload
+    payload = {
+        "model": model_name,
+        "messages": messages,
+        "max_tokens": max_tokens or VISION_MAX_TOKENS,
+        "stream": on_token is not None,
+        "temperature": VISION_TEMPERATURE
+    }
+    if response_format:
+        payload["response_format"] = response_format
+    if PROMPT_CACHE_HINTS:
+        # Gateways that route on it send requests with the same prompt to the same replica
+        payload["prompt_cache_key"] = hashlib.sha256(f"{model_name}\n{prompt}".encode()).hexdigest()[:32]
+    if on_token is not None:
+        payload["stream_options"] = {"include_usage": True}
+    with span("serialize"):
+        body = ChatRequestBody(payload)
+    PAYLOAD_BYTES.observe(len(body))
+    payload_sizes = body.image_sizes
+
+    try:
+        started_at = time.perf_counter()
+        ttft = None
+        if on_token is not None:
+            with get_session().post(url, headers=headers, data=body, stream=True) as response:
+                response.raise_for_status()
+                result, ttft = read_event_stream(response, on_token, started_at)
+        else:
+            response = get_session().post(url, headers=headers, data=body)
+            response.raise_for_status()
+            result = response.json()
+
+    except requests.exceptions.RequestException as e:
+        record_request("error")
+        return {"error": f"API request failed: {str(e)}"}, payload_sizes, None
+    except json.JSONDecodeError as e:
+        record_request("error")
+        return {"error": f"Failed to parse API response: {str(e)}"}, payload_sizes, None
+
+    elapsed = time.perf_counter() - started_at
+    observe_stage("http_request", elapsed)
+    if ttft is not None:
+        observe_stage("first_token", ttft)
+        observe_stage("last_token", elapsed)
+    record_request("ok")
+    record_usage(result.get("usage"))
+    return result, payload_sizes, ttft
+
+
+def _merge_batch_results(results, content=None):
+    """
+    Combine ordered per-batch responses into a single completion-shaped response.
+    The merged markdown report is used unless content is given.
+    """
+    if content is None:
+        content = merge_section_reports([result["choices"][0]["message"]["content"] for result in results])
+    usage = {}
+    for result in results:
+        for key, value in (result.get("usage") or {}).items():
+            if isinstance(value, int):
+                usage[key] = usage.get(key, 0) + value
+            elif key == "prompt_tokens_details" and isinstance(value, dict) and value.get("cached_tokens"):
+                details = usage.setdefault(key, {"cached_tokens": 0})
+                details["cached_tokens"] += value["cached_tokens"]
+
+    return {
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }
+        ],
+        "usage": usage
+    }
+
+
+def _structured_response_format():
+    """The response_format that constrains the model to the extraction schema, or None."""
+    from utils.extraction_schema import extraction_json_schema
+
+    if STRUCTURED_RESPONSE_FORMAT == 'json_schema':
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "healthcare_extraction", "schema": extraction_json_schema()}
+        }
+    if STRUCTURED_RESPONSE_FORMAT == 'json_object':
+        return {"type": "json_object"}
+    return None
+
+
+def _apply_structured_output(results):
+    """
+    Parse and validate each batch's JSON, merge them and render the markdown view.
+    Returns the completion-shaped result, with the parsed object under "extraction",
+    or an error dict when a batch did not return valid JSON for the schema.
+    """
+    from utils.extraction_schema import merge_extractions, parse_extraction, render_markdown
+
+    try:
+        extractions = [parse_extraction(result["choices"][0]["message"]["content"]) for result in results]
+    except ValueError as e:
+        return {"error": f"Structured output failed validation: {str(e)}"}
+
+    extraction = extractions[0] if len(extractions) == 1 else merge_extractions(extractions)
+    result = _merge_batch_results(results, content=render_markdown(extraction))
+    result["extraction"] = extraction.model_dump()
+    return result
+
+
+def analyze_image(api_endpoint, file_bytes, prompt, multi_page=None, on_token=None, structured=None,
+                  text_layer=None):
     """
     Send document analysis request to the API endpoint for processing.
     Args:
-        api_endpoint (dict): Contains url, model_name, and api_key
+        api_endpoint (dict): Contains url, model_name, and api_key, and optionally
+            text_model_name for pages sent as text (defaults to TEXT_MODEL_NAME, then model_name)
         file_bytes (bytes): File data in bytes (image or PDF)
         prompt (str): Prompt for the document analysis
+        multi_page (bool): Analyze every PDF page instead of only the first
+            (defaults to the PDF_MULTI_PAGE setting)
+        on_token (callable): When given, responses are streamed and on_token(token, batch)
+            is called with each content delta and the index of its page batch
+        structured (bool): Ask for JSON matching the extraction schema (defaults to the
+            STRUCTURED_OUTPUT setting). The schema is appended to prompt, and
+            responses are not streamed.
+        text_layer (bool): Send PDF pages with a complete embedded text layer as text,
+            and render only the other pages for the vision model (defaults to the
+            PDF_TEXT_LAYER setting)
     Returns:
-        dict: JSON response from the API
+        dict: JSON response from the API. For PDFs, "page_stats" lists the render
+            (or text extraction) time, payload size and source of each page. "cache_hit" is True when the result
+            was served from the result cache; streamed responses carry "ttft_ms".
+            Structured results carry the validated object under "extraction" and
+            its rendered markdown as the message content.
     """
-    import requests
-    import base64
-    import json
-    import io
-    import fitz  # PyMuPDF
+    # PyMuPDF loads with the renderer, on the first PDF (main.py prewarms it)
+    from utils.pdf_renderer import extract_text_layer, render_pdf_pages
+
+    if multi_page is None:
+        multi_page = PDF_MULTI_PAGE
+    if structured is None:
+        structured = STRUCTURED_OUTPUT
+    # The UI, the API and batch.py then send byte-identical prompts, which share cache entries
+    prompt = prompt.replace("\r\n", "\n").strip()
+    if text_layer is None:
+        text_layer = PDF_TEXT_LAYER
+    text_model_name = api_endpoint.get("text_model_name") or TEXT_MODEL_NAME or api_endpoint["model_name"]
+
+    response_format = None
+    max_tokens = None
+    if structured:
+        from utils.extraction_schema import structured_prompt
+
+        prompt = structured_prompt(prompt)
+        response_format = _structured_response_format()
+        max_tokens = STRUCTURED_MAX_TOKENS
+        # Partial JSON is not worth showing; the rendered report is displayed at the end
+        on_token = None
+
+    # Identical file, prompt and model options give the same answer; skip the round trip
+    cache = get_result_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(
+            file_bytes, prompt, api_endpoint["model_name"], VISION_TEMPERATURE, max_tokens or VISION_MAX_TOKENS,
+            url=api_endpoint["url"], multi_page=multi_page, pages_per_request=PDF_PAGES_PER_REQUEST,
+            **({"response_format": response_format} if structured else {}),
+            **({"text_model": text_model_name, "text_pages_per_request": PDF_TEXT_PAGES_PER_REQUEST}
+               if text_layer else {})
+        )
+        cached = cache.get(cache_key)
+        record_cache("result", cached is not None)
+        if cached is not None:
+            cached["cache_hit"] = True
+            return cached
 
     # Ensure URL ends with /chat/completions
     url = api_endpoint['url']
@@ -31,71 +276,125 @@ def analyze_image(api_endpoint, file_bytes, prompt):
         is_pdf = False
         if file_bytes[:4] == b'%PDF':
             is_pdf = True
-        
-        # For PDFs, convert first page to image
+
+        max_pages = PDF_MAX_PAGES if multi_page else 1
+        pages = None
+        text_pages = []
         if is_pdf:
-            try:
-                # Open the PDF with PyMuPDF
-                pdf_document = fitz.open(stream=file_bytes, filetype="pdf")
-                
-                # Get the first page
-                first_page = pdf_document[0]
-                
-                # Render page to an image with higher resolution
-                pix = first_page.get_pixmap(matrix=fitz.Matrix(3, 3))
-                img_data = pix.tobytes("jpeg")
-                
-                # Use the converted image instead of PDF
-                file_b64 = base64.b64encode(img_data).decode()
-                
-                # Close the document
-                pdf_document.close()
-            except Exception as e:
-                return {"error": f"PDF conversion failed: {str(e)}"}
+            vision_indices = None
+            if text_layer:
+                try:
+                    layer, page_count = extract_text_layer(file_bytes, max_pages=max_pages)
+                    observe_stage("text_extract", sum(page["extract_seconds"] for page in layer))
+                    text_pages = [page for page in layer if page["digital"]]
+                    vision_indices = [page["page"] - 1 for page in layer if not page["digital"]]
+                except Exception:
+                    # A damaged text layer is no reason to fail; render every page instead
+                    vision_indices = None
+
+            # Rasterize only the pages the text layer does not cover
+            pages = []
+            if vision_indices is None or vision_indices:
+                try:
+                    pages, page_count = render_pdf_pages(file_bytes, max_pages=max_pages, page_indices=vision_indices)
+                except Exception as e:
+                    return {"error": f"PDF conversion failed: {str(e)}"}
+            items = sorted([(page["page"], "image", page["image"]) for page in pages] +
+                           [(page["page"], "text", page["text"]) for page in text_pages])
         else:
             # For images, just use as is
-            file_b64 = base64.b64encode(file_bytes).decode()
-        
-        # Always use image/jpeg content type for API compatibility
-        content_type = "image/jpeg"
-        
-        # Create message payload with structured content
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{content_type};base64,{file_b64}"
-                        }
-                    }
-                ]
-            }
-        ]
-
-        # Prepare payload
-        payload = {
-            "model": api_endpoint["model_name"],
-            "messages": messages,
-            "max_tokens": 1024,
-            "stream": False,
-            "temperature": 0.1
-        }
+            page_count = 1
+            items = [(1, "image", file_bytes)]
 
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            return {"error": f"API request failed: {str(e)}"}
-        except json.JSONDecodeError as e:
-            return {"error": f"Failed to parse API response: {str(e)}"}
+        # Split pages into ordered batches of one kind, one request each
+        batches = []
+        for item in items:
+            kind = item[1]
+            limit = PDF_TEXT_PAGES_PER_REQUEST if kind == "text" else PDF_PAGES_PER_REQUEST
+            if batches and batches[-1][-1][1] == kind and (limit <= 0 or len(batches[-1]) < limit):
+                batches[-1].append(item)
+            else:
+                batches.append([item])
+
+        def send_batch(batch_index):
+            batch = batches[batch_index]
+            batch_on_token = None
+            if on_token is not None:
+                batch_on_token = lambda token: on_token(token, batch_index)
+            first, last = batch[0][0], batch[-1][0]
+            if batch[0][1] == "text":
+                page_note = (f"In place of page images, below is the embedded text of pages {first}-{last} "
+                             f"of a {page_count}-page document, in page order.")
+                texts = [f"[Page {number}]\n{text}" for number, _, text in batch]
+                return _post_completion(url, headers, text_model_name, prompt, [], page_note, batch_on_token,
+                                        response_format, max_tokens, texts)
+            page_note = None
+            if len(items) > 1:
+                page_note = (f"The attached images are pages {first}-{last} "
+                             f"of a {page_count}-page document, in page order.")
+            return _post_completion(url, headers, api_endpoint["model_name"], prompt,
+                                    [image for _, _, image in batch], page_note, batch_on_token,
+                                    response_format, max_tokens)
+
+        if len(batches) == 1:
+            outcomes = [send_batch(0)]
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, PDF_BATCH_CONCURRENCY)) as executor:
+                outcomes = list(executor.map(send_batch, range(len(batches))))
+
+        results = [result for result, _, _ in outcomes]
+        for result in results:
+            if "error" in result:
+                return result
+
+        if structured:
+            result = _apply_structured_output(results)
+            if "error" in result:
+                return result
+        else:
+            result = results[0] if len(results) == 1 else _merge_batch_results(results)
+
+        if pages is not None:
+            # Vision batches are in page order, so their payload sizes line up with the rendered pages
+            payload_sizes = [size for _, sizes, _ in outcomes for size in sizes]
+            page_stats = [
+                {
+                    "page": page["page"],
+                    "source": "vision",
+                    "width": page["width"],
+                    "height": page["height"],
+                    "render_ms": round(page["render_seconds"] * 1000, 1),
+                    "encode_ms": round(page["encode_seconds"] * 1000, 1),
+                    "image_kb": round(page["image_bytes"] / 1024, 1),
+                    "payload_kb": round(payload_size / 1024, 1)
+                }
+                for page, payload_size in zip(pages, payload_sizes)
+            ]
+            page_stats += [
+                {
+                    "page": page["page"],
+                    "source": "text",
+                    "width": None,
+                    "height": None,
+                    "render_ms": round(page["extract_seconds"] * 1000, 1),
+                    "encode_ms": 0.0,
+                    "image_kb": 0.0,
+                    "payload_kb": round(len(page["text"].encode()) / 1024, 1)
+                }
+                for page in text_pages
+            ]
+            result["page_stats"] = sorted(page_stats, key=lambda stats: stats["page"])
+            result["page_count"] = page_count
+            result["text_pages"] = len(text_pages)
+
+        if cache is not None:
+            cache.set(cache_key, result)
+
+        ttfts = [ttft for _, _, ttft in outcomes if ttft is not None]
+        if ttfts:
+            result["ttft_ms"] = round(min(ttfts) * 1000, 1)
+
+        return result
 
     except Exception as e:
-        return {"error": f"Image processing failed: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Image processing failed: {str(e)}"}
@@ -0,0 +1,174 @@
+import json
+import re
+from functools import lru_cache
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+from utils.section_merger import SECTION_TITLES
+
+
+class PatientDemographics(BaseModel):
+    name: Optional[str] = None
+    age: Optional[str] = None
+    sex: Optional[str] = None
+    date_of_birth: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    email: Optional[str] = None
+    insurance: Optional[str] = None
+    member_id: Optional[str] = None
+    group_number: Optional[str] = None
+    medical_record_number: Optional[str] = None
+
+
+class VitalSign(BaseModel):
+    name: str
+    value: str
+    date: Optional[str] = None
+
+
+class Medication(BaseModel):
+    name: str
+    dose: Optional[str] = None
+    frequency: Optional[str] = None
+    note: Optional[str] = None
+
+
+class Allergy(BaseModel):
+    substance: str
+    reaction: Optional[str] = None
+
+
+class HealthcareExtraction(BaseModel):
+    """
+    Structured form of the ten-section healthcare extraction. Values are copied
+    verbatim from the document; anything not written there is left empty.
+    """
+    extraction_status: Literal["complete", "partial", "not_possible"] = "complete"
+    warnings: List[str] = Field(default_factory=list)
+    demographics: PatientDemographics = Field(default_factory=PatientDemographics)
+    clinical_presentation: List[str] = Field(default_factory=list)
+    vital_signs: List[VitalSign] = Field(default_factory=list)
+    medications: List[Medication] = Field(default_factory=list)
+    allergies: List[Allergy] = Field(default_factory=list)
+    medical_history: List[str] = Field(default_factory=list)
+    diagnostic_results: List[str] = Field(default_factory=list)
+    clinical_assessment: List[str] = Field(default_factory=list)
+    urgency: List[str] = Field(default_factory=list)
+    referral_follow_up: List[str] = Field(default_factory=list)
+    additional_notes: List[str] = Field(default_factory=list)
+
+
+# Free-text list fields in the order of SECTION_TITLES they render under
+_LIST_SECTIONS = {
+    "CLINICAL PRESENTATION": "clinical_presentation",
+    "MEDICAL HISTORY": "medical_history",
+    "DIAGNOSTIC RESULTS": "diagnostic_results",
+    "CLINICAL ASSESSMENT & REASONING": "clinical_assessment",
+    "URGENCY & CLINICAL DECISION-MAKING": "urgency",
+    "REFERRAL & FOLLOW-UP DETAILS": "referral_follow_up",
+    "ADDITIONAL CLINICAL NOTES": "additional_notes",
+}
+
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+@lru_cache(maxsize=1)
+def extraction_json_schema():
+    """JSON schema sent with the request to constrain the model's output."""
+    return HealthcareExtraction.model_json_schema()
+
+
+def structured_prompt(prompt):
+    """
+    Append the schema, under its own header, to a structured-output prompt, whether
+    the built-in one or a custom one (byte-identical across calls).
+    """
+    schema = json.dumps(extraction_json_schema(), separators=(",", ":"))
+    return f"{prompt.rstrip()}\n\n## JSON schema:\n{schema}"
+
+
+def parse_extraction(content):
+    """
+    Parse and validate a model response as a HealthcareExtraction.
+    Tolerates a markdown code fence or text around the JSON object.
+    Raises:
+        ValueError: The response is not valid JSON for the schema
+    """
+    text = _CODE_FENCE.sub("", content.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("no JSON object in the response")
+    try:
+        return HealthcareExtraction.model_validate(json.loads(text[start:end + 1]))
+    except (json.JSONDecodeError, ValidationError) as e:
+        raise ValueError(str(e)) from e
+
+
+def merge_extractions(extractions):
+    """
+    Merge per-batch extractions of one document, in page order: the first value
+    wins for each demographic field, and list entries are concatenated without duplicates.
+    """
+    merged = HealthcareExtraction()
+    statuses = {extraction.extraction_status for extraction in extractions}
+    if "not_possible" in statuses and len(statuses) == 1:
+        merged.extraction_status = "not_possible"
+    elif statuses != {"complete"}:
+        merged.extraction_status = "partial"
+
+    for extraction in extractions:
+        for field, value in extraction.demographics:
+            if value and not getattr(merged.demographics, field):
+                setattr(merged.demographics, field, value)
+        for field in ("warnings", "vital_signs", "medications", "allergies", *_LIST_SECTIONS.values()):
+            bucket = getattr(merged, field)
+            for item in getattr(extraction, field):
+                if item not in bucket:
+                    bucket.append(item)
+    return merged
+
+
+def _join(*parts):
+    return ", ".join(part for part in parts if part)
+
+
+def render_markdown(extraction):
+    """Render the ten-section markdown report from a parsed extraction."""
+    sections = {title: [] for title in SECTION_TITLES}
+
+    demographics = extraction.demographics
+    for label, value in (
+            ("Name", demographics.name), ("Age", demographics.age), ("Sex", demographics.sex),
+            ("DOB", demographics.date_of_birth), ("MRN", demographics.medical_record_number),
+            ("Address", demographics.address), ("Phone", demographics.phone), ("Email", demographics.email),
+            ("Insurance", _join(demographics.insurance,
+                                demographics.member_id and f"Member ID: {demographics.member_id}",
+                                demographics.group_number and f"Group #: {demographics.group_number}"))):
+        if value:
+            sections["PATIENT DEMOGRAPHICS"].append(f"- {label}: {value}")
+
+    for vital in extraction.vital_signs:
+        date = f" ({vital.date})" if vital.date else ""
+        sections["VITAL SIGNS & MEASUREMENTS"].append(f"- {vital.name}: {vital.value}{date}")
+
+    for medication in extraction.medications:
+        details = _join(medication.dose, medication.frequency, medication.note)
+        sections["CURRENT MEDICATIONS & ALLERGIES"].append(
+            f"- {medication.name}" + (f": {details}" if details else ""))
+    for allergy in extraction.allergies:
+        reaction = f" ({allergy.reaction})" if allergy.reaction else ""
+        sections["CURRENT MEDICATIONS & ALLERGIES"].append(f"- Allergy: {allergy.substance}{reaction}")
+
+    for title, field in _LIST_SECTIONS.items():
+        sections[title].extend(f"- {item}" for item in getattr(extraction, field))
+
+    output = [f"- {warning}" for warning in extraction.warnings]
+    if extraction.warnings:
+        output.append("")
+    for title in SECTION_TITLES:
+        output.append(f"### {title}")
+        output.extend(sections[title] or ["- Not specified"])
+        output.append("")
+    return "\n".join(output).strip()
@@ -1,55 +1,163 @@
-from PIL import Image
+from PIL import Image, ImageOps
 import io
 import logging
+import math
+import time
+
+from config.settings import (
+    IMAGE_AUTOCROP,
+    IMAGE_FORMAT,
+    IMAGE_GRAYSCALE,
+    IMAGE_MAX_LONG_EDGE,
+    IMAGE_MAX_PIXELS,
+    IMAGE_OPTIMIZE_ENABLED,
+    IMAGE_QUALITY,
+)
+from utils.metrics import observe_stage, span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def optimize_image(image_bytes, max_width=800):
+# Pixels lighter than this (0-255) count as blank margin when auto-cropping
+AUTOCROP_THRESHOLD = 235
+AUTOCROP_PADDING = 16
+
+
+def image_mime_type(image_bytes):
+    """Return the MIME type of JPEG, PNG or WebP data, defaulting to image/jpeg."""
+    if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        return "image/png"
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return "image/webp"
+    return "image/jpeg"
+
+
+def autocrop_margins(image, threshold=AUTOCROP_THRESHOLD, padding=AUTOCROP_PADDING):
+    """
+    Crop near-white margins around the content of the image.
+    Returns the cropped image, or the original image if nothing can be cropped.
+    """
+    gray = image.convert("L")
+    # Anything darker than the threshold is content
+    mask = ImageOps.invert(gray).point(lambda p: 255 if p > 255 - threshold else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return image
+
+    left, top, right, bottom = bbox
+    bbox = (
+        max(0, left - padding),
+        max(0, top - padding),
+        min(image.width, right + padding),
+        min(image.height, bottom + padding)
+    )
+    if bbox == (0, 0, image.width, image.height):
+        return image
+    return image.crop(bbox)
+
+
+def target_size(width, height, max_long_edge=IMAGE_MAX_LONG_EDGE, max_pixels=IMAGE_MAX_PIXELS):
+    """Return the (width, height) that fits both the long-edge and pixel limits."""
+    scale = 1.0
+    if max_long_edge and max(width, height) > max_long_edge:
+        scale = min(scale, max_long_edge / max(width, height))
+    if max_pixels and width * height > max_pixels:
+        scale = min(scale, math.sqrt(max_pixels / (width * height)))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def encode_image(image, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY, grayscale=IMAGE_GRAYSCALE,
+                 autocrop=IMAGE_AUTOCROP, max_long_edge=IMAGE_MAX_LONG_EDGE, max_pixels=IMAGE_MAX_PIXELS):
+    """
+    Crop, downscale and re-encode a PIL image for upload.
+    Args:
+        image (PIL.Image.Image): Decoded image
+        image_format (str): JPEG, WEBP or PNG
+        quality (int): Encoder quality for JPEG and WebP
+        grayscale (bool): Convert to single-channel grayscale
+        autocrop (bool): Remove blank margins around the content
+        max_long_edge (int): Longest side after downscaling (0 for no limit)
+        max_pixels (int): Pixel budget after downscaling (0 for no limit)
+    Returns:
+        bytes: Encoded image
+    """
+    image_format = image_format.upper()
+
+    if autocrop:
+        image = autocrop_margins(image)
+
+    width, height = image.size
+    new_size = target_size(width, height, max_long_edge, max_pixels)
+    if new_size != (width, height):
+        image = image.resize(new_size, Image.LANCZOS)
+        logger.info(f"Resized image from {width}x{height} to {new_size[0]}x{new_size[1]}")
+
+    if grayscale:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        # Flatten transparency onto white; JPEG has no alpha channel
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+
+    output = io.BytesIO()
+    if image_format == "PNG":
+        image.save(output, format="PNG", optimize=True)
+    else:
+        image.save(output, format=image_format, quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def optimize_image(image_bytes, **options):
     """
-    Optimize the image by resizing while maintaining aspect ratio and original format.
-    Returns bytes of the optimized image.
+    Optimize the image for upload: crop blank margins, downscale to the configured
+    long edge or pixel budget and re-encode. Keyword options override the settings
+    (see encode_image).
+    Returns bytes of the optimized image, or the original bytes if they are smaller.
     """
     try:
-        # Open image from bytes
+        start = time.perf_counter()
+
+        # Open image from bytes, honouring camera orientation
         image = Image.open(io.BytesIO(image_bytes))
-        original_format = image.format or 'JPEG'
-        
-        # Calculate new dimensions maintaining aspect ratio
-        width, height = image.size
-        if width > max_width:
-            ratio = max_width / width
-            new_size = (max_width, int(height * ratio))
-            image = image.resize(new_size, Image.LANCZOS)
-            logger.info(f"Resized image from {width}x{height} to {new_size[0]}x{new_size[1]}")
-        
-        # Save image to bytes in original format
-        output = io.BytesIO()
-        image.save(output, format=original_format, optimize=True)
-        output.seek(0)
-        
-        optimized_size = len(output.getvalue()) / 1024  # Size in KB
-        logger.info(f"Optimized image size: {optimized_size:.2f}KB (Format: {original_format})")
-        
-        return output.getvalue()
-        
+        image = ImageOps.exif_transpose(image)
+
+        optimized = encode_image(image, **options)
+        encode_ms = (time.perf_counter() - start) * 1000
+        observe_stage("encode", encode_ms / 1000)
+
+        logger.info(f"Optimized image: {len(image_bytes) / 1024:.2f}KB -> {len(optimized) / 1024:.2f}KB "
+                    f"in {encode_ms:.0f}ms (Format: {options.get('image_format', IMAGE_FORMAT).upper()})")
+
+        if len(optimized) >= len(image_bytes) and image.size == target_size(*image.size):
+            # Nothing to shrink; keep the original encoding
+            return image_bytes
+        return optimized
+
     except Exception as e:
         logger.error(f"Error optimizing image: {str(e)}")
         return image_bytes
 
+
 def preprocess_image(file):
     """
-    Process the uploaded file (image or PDF).
+    Process the uploaded file (image or PDF), given as a Streamlit upload or raw bytes.
+    Images are optimized for upload (unless IMAGE_OPTIMIZE_ENABLED is off); PDFs are
+    returned as-is and their pages are optimized after rendering.
     Returns bytes of the file content.
     """
     if file is None:
         logger.error("No file provided")
         return None
-        
+
     try:
-        # For both images and PDFs, just return the file bytes
-        return file.getvalue()
+        with span("preprocess"):
+            file_bytes = file if isinstance(file, bytes) else file.getvalue()
+            if file_bytes[:4] == b'%PDF' or not IMAGE_OPTIMIZE_ENABLED:
+                return file_bytes
+            return optimize_image(file_bytes)
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,229 @@
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from config.settings import (
+    IMAGE_OPTIMIZE_ENABLED,
+    PDF_MAX_PAGES,
+    PDF_MAX_TOTAL_PIXELS,
+    PDF_RENDER_WORKERS,
+    PDF_RENDER_ZOOM,
+    PDF_TEXT_MAX_IMAGE_AREA,
+    PDF_TEXT_MIN_CHARS,
+)
+from utils.image_processor import encode_image, target_size
+from utils.metrics import observe_stage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shared across Streamlit sessions so worker start-up is paid once per container
+_render_pool = None
+
+
+def _get_render_pool(workers):
+    global _render_pool
+    if _render_pool is None:
+        # spawn avoids forking the multi-threaded Streamlit server
+        _render_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _render_pool
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def warm_render_pool(workers=PDF_RENDER_WORKERS):
+    """
+    Start the render workers ahead of the first multi-page PDF. Each worker imports
+    PyMuPDF and this module on start-up, which otherwise lands on the first request.
+    """
+    if workers <= 1:
+        return
+    pool = _get_render_pool(workers)
+    for _ in range(workers):
+        pool.submit(_worker_ready)
+    logger.info(f"Starting {workers} PDF render workers")
+
+
+def plan_page_zooms(pdf_document, zoom=PDF_RENDER_ZOOM, max_pages=PDF_MAX_PAGES,
+                    max_total_pixels=PDF_MAX_TOTAL_PIXELS, page_indices=None):
+    """
+    Choose the pages to render and a zoom per page that stays within the image
+    size limits and keeps the document under the pixel budget.
+    Args:
+        pdf_document (fitz.Document): Open PDF document
+        zoom (float): Preferred render zoom
+        max_pages (int): Maximum number of pages to render (0 or None for all)
+        max_total_pixels (int): Pixel budget across all rendered pages (0 or None for no cap)
+        page_indices (list): Render only these pages (0-based) instead of the first max_pages
+    Returns:
+        list: (page index, zoom) pairs in page order
+    """
+    if page_indices is None:
+        page_count = pdf_document.page_count
+        if max_pages:
+            page_count = min(page_count, max_pages)
+        page_indices = range(page_count)
+
+    plan = []
+    for index in sorted(page_indices):
+        rect = pdf_document[index].rect
+        # Render straight at upload resolution rather than downscaling afterwards
+        width, height = target_size(rect.width * zoom, rect.height * zoom)
+        plan.append((index, width / rect.width))
+
+    total_pixels = sum(
+        pdf_document[index].rect.width * pdf_document[index].rect.height * page_zoom * page_zoom
+        for index, page_zoom in plan
+    )
+    if max_total_pixels and total_pixels > max_total_pixels:
+        scale = math.sqrt(max_total_pixels / total_pixels)
+        logger.info(f"Scaling render zoom by {scale:.2f} to stay under {max_total_pixels} pixels")
+        plan = [(index, page_zoom * scale) for index, page_zoom in plan]
+
+    return plan
+
+
+def _open_pdf(source):
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _render_pages(source, page_zooms):
+    """
+    Render a run of pages and encode them for upload. Runs inside a worker process.
+    source is the PDF data, or the path of a file holding it.
+    """
+    rendered = []
+    with _open_pdf(source) as pdf_document:
+        for index, zoom in page_zooms:
+            start = time.perf_counter()
+            pix = pdf_document[index].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            # Each access to pix.samples returns a fresh copy of the pixels
+            samples = pix.samples
+            image = Image.frombytes("RGB", (pix.width, pix.height), samples)
+            rendered_at = time.perf_counter()
+            if IMAGE_OPTIMIZE_ENABLED:
+                img_data = encode_image(image)
+            else:
+                img_data = pix.tobytes("jpeg")
+            rendered.append({
+                "page": index + 1,
+                "width": pix.width,
+                "height": pix.height,
+                "zoom": round(zoom, 3),
+                "image": img_data,
+                "raw_bytes": len(samples),
+                "image_bytes": len(img_data),
+                "render_seconds": rendered_at - start,
+                "encode_seconds": time.perf_counter() - rendered_at,
+            })
+    return rendered
+
+
+def render_pdf_pages(pdf_bytes, zoom=PDF_RENDER_ZOOM, max_pages=PDF_MAX_PAGES,
+                     max_total_pixels=PDF_MAX_TOTAL_PIXELS, workers=PDF_RENDER_WORKERS, page_indices=None):
+    """
+    Render the pages of a PDF to upload-ready images, in parallel for multi-page documents.
+    Args:
+        pdf_bytes (bytes): PDF file data
+        zoom (float): Preferred render zoom
+        max_pages (int): Maximum number of pages to render (0 or None for all)
+        max_total_pixels (int): Pixel budget across all rendered pages
+        workers (int): Number of render processes
+        page_indices (list): Render only these pages (0-based), e.g. the ones without a text layer
+    Returns:
+        tuple: (list of page dicts in page order, total page count of the document)
+            Each page dict holds the encoded "image" plus its size and timings.
+    """
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        page_count = pdf_document.page_count
+        plan = plan_page_zooms(pdf_document, zoom, max_pages, max_total_pixels, page_indices)
+
+    if page_indices is None and page_count > len(plan):
+        logger.warning(f"Rendering only the first {len(plan)} of {page_count} pages")
+
+    start = time.perf_counter()
+    if workers <= 1 or len(plan) <= 1:
+        pages = _render_pages(pdf_bytes, plan)
+    else:
+        # One contiguous run of pages per worker, so each worker opens the PDF once
+        runs = min(workers, len(plan))
+        chunk_size = math.ceil(len(plan) / runs)
+        chunks = [plan[i:i + chunk_size] for i in range(0, len(plan), chunk_size)]
+        pool = _get_render_pool(workers)
+        # Workers open the document from one spilled file instead of each receiving a pickled copy
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as spill:
+            spill.write(pdf_bytes)
+            spill.flush()
+            futures = [pool.submit(_render_pages, spill.name, chunk) for chunk in chunks]
+            pages = [page for future in futures for page in future.result()]
+
+    for page in pages:
+        # Pages are timed inside the render workers and recorded here, in the serving process
+        observe_stage("render", page["render_seconds"])
+        observe_stage("encode", page["encode_seconds"])
+        logger.info(f"Rendered page {page['page']}: {page['width']}x{page['height']} in "
+                    f"{page['render_seconds'] * 1000:.0f}ms, encoded {page['raw_bytes'] / 1024:.1f}KB -> "
+                    f"{page['image_bytes'] / 1024:.1f}KB in {page['encode_seconds'] * 1000:.0f}ms")
+    render_seconds = time.perf_counter() - start
+    observe_stage("render_document", render_seconds)
+    logger.info(f"Rendered {len(pages)} pages in {render_seconds:.2f}s")
+
+    return pages, page_count
+
+
+def extract_text_layer(pdf_bytes, max_pages=PDF_MAX_PAGES, min_chars=PDF_TEXT_MIN_CHARS,
+                       max_image_area=PDF_TEXT_MAX_IMAGE_AREA):
+    """
+    Read the embedded text layer of each page, block by block in reading order.
+    A page counts as digital when its text layer has at least min_chars characters,
+    almost no glyphs without a Unicode mapping, and images cover at most
+    max_image_area of it. Scanned pages, photos and pages with figures need vision.
+    Args:
+        pdf_bytes (bytes): PDF file data
+        max_pages (int): Maximum number of pages to read (0 or None for all)
+        min_chars (int): Characters of text a digital page has at least
+        max_image_area (float): Largest fraction of a digital page covered by images
+    Returns:
+        tuple: (list of page dicts in page order, total page count of the document)
+            Each page dict holds "page" (1-based), "text", "digital" and "extract_seconds".
+    """
+    pages = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        page_count = pdf_document.page_count
+        read_count = min(page_count, max_pages) if max_pages else page_count
+        if page_count > read_count:
+            logger.warning(f"Reading the text layer of only the first {read_count} of {page_count} pages")
+        for index in range(read_count):
+            start = time.perf_counter()
+            page = pdf_document[index]
+            # Text blocks keep paragraphs and table cells together; sort=True gives reading order
+            blocks = page.get_text("blocks", sort=True)
+            text = "\n".join(block[4].strip() for block in blocks if block[6] == 0 and block[4].strip())
+            page_area = page.rect.get_area() or 1
+            image_area = sum(fitz.Rect(info["bbox"]).intersect(page.rect).get_area()
+                             for info in page.get_image_info())
+            digital = (len(text) >= min_chars
+                       and text.count("\ufffd") <= len(text) * 0.01
+                       and image_area / page_area <= max_image_area)
+            pages.append({
+                "page": index + 1,
+                "text": text,
+                "digital": digital,
+                "extract_seconds": time.perf_counter() - start,
+            })
+    return pages, page_count
@@ -0,0 +1,93 @@
+import re
+
+# The ten sections requested by the healthcare extraction prompt, in display order
+SECTION_TITLES = [
+    "PATIENT DEMOGRAPHICS",
+    "CLINICAL PRESENTATION",
+    "VITAL SIGNS & MEASUREMENTS",
+    "CURRENT MEDICATIONS & ALLERGIES",
+    "MEDICAL HISTORY",
+    "DIAGNOSTIC RESULTS",
+    "CLINICAL ASSESSMENT & REASONING",
+    "URGENCY & CLINICAL DECISION-MAKING",
+    "REFERRAL & FOLLOW-UP DETAILS",
+    "ADDITIONAL CLINICAL NOTES",
+]
+
+_HEADING = re.compile(r'^\s*#{1,6}\s*(?:\d+\.\s*)?(.+?)\s*#*\s*$')
+_PLACEHOLDER = re.compile(
+    r'^[-*]\s*(?:[^:]{1,40}:\s*)?(?:not specified|not documented|not provided|not available|'
+    r'none documented|unable to read(?: from document)?)\.?$',
+    re.IGNORECASE
+)
+
+
+def _match_section(heading):
+    """Return the canonical section title for a markdown heading, or None."""
+    normalized = heading.strip().strip('*').upper()
+    for title in SECTION_TITLES:
+        if normalized == title or normalized.startswith(title):
+            return title
+    return None
+
+
+def split_sections(content):
+    """
+    Split a markdown extraction into its sections.
+    Args:
+        content (str): Markdown produced for the extraction prompt
+    Returns:
+        dict: Section title -> list of lines. Lines before the first recognised heading
+              are stored under None; unrecognised headings keep their own text as key.
+    """
+    sections = {None: []}
+    current = None
+    for line in content.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            current = _match_section(match.group(1)) or match.group(1).strip()
+            sections.setdefault(current, [])
+            continue
+        if line.strip():
+            sections.setdefault(current, []).append(line.rstrip())
+    return sections
+
+
+def merge_section_reports(contents):
+    """
+    Merge per-page (or per-batch) extractions into a single ten-section report.
+    Args:
+        contents (list): Markdown extractions in page order
+    Returns:
+        str: Markdown report with each section appearing once
+    """
+    merged = {}
+    for content in contents:
+        for title, lines in split_sections(content).items():
+            bucket = merged.setdefault(title, [])
+            for line in lines:
+                if line not in bucket:
+                    bucket.append(line)
+
+    # Drop "Not specified" placeholders from sections another page filled in
+    for title, lines in merged.items():
+        facts = [line for line in lines if not _PLACEHOLDER.match(line.strip())]
+        if facts:
+            merged[title] = facts
+
+    output = []
+    if merged.get(None):
+        output.extend(merged[None])
+        output.append("")
+    for title in SECTION_TITLES:
+        output.append(f"### {title}")
+        output.extend(merged.get(title) or ["- Not specified"])
+        output.append("")
+    for title, lines in merged.items():
+        if title is None or title in SECTION_TITLES:
+            continue
+        output.append(f"### {title}")
+        output.extend(lines)
+        output.append("")
+
+    return "\n".join(output).strip()
@@ -0,0 +1,62 @@
+import json
+import time
+
+
+def read_event_stream(response, on_token=None, started_at=None):
+    """
+    Consume an OpenAI-compatible server-sent event stream of chat completion chunks.
+    Args:
+        response (requests.Response): Response opened with stream=True
+        on_token (callable): Called with each content delta as it arrives
+        started_at (float): time.perf_counter() when the request was sent
+    Returns:
+        tuple: (completion dict shaped like a non-streaming response,
+                seconds from started_at to the first content token, or None)
+    """
+    # SSE is always UTF-8, whatever the Content-Type header says
+    response.encoding = "utf-8"
+
+    start = started_at if started_at is not None else time.perf_counter()
+    first_token_at = None
+    parts = []
+    finish_reason = None
+    usage = None
+    model = None
+
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+
+        chunk = json.loads(data)
+        model = chunk.get("model", model)
+        if chunk.get("usage"):
+            usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            token = (choice.get("delta") or {}).get("content")
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(token)
+                if on_token is not None:
+                    on_token(token)
+            if choice.get("finish_reason"):
+                finish_reason = choice["finish_reason"]
+
+    completion = {
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(parts)},
+                "finish_reason": finish_reason
+            }
+        ]
+    }
+    if usage:
+        completion["usage"] = usage
+
+    ttft = first_token_at - start if first_token_at is not None else None
+    return completion, ttft
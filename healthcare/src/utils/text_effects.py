@@ -1,20 +1,81 @@
 import streamlit as st
+import threading
 import time
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-def typing_effect(text, speed=0.0001):
+from config.settings import STREAM_RENDER_FPS
+from utils.metrics import span
+
+
+def typing_effect(text, speed=0.0001, fps=STREAM_RENDER_FPS):
     """
     Display text with a typing effect in Streamlit
     Args:
         text (str): The text to display
         speed (float): Delay between each character in seconds
+        fps (float): Maximum re-renders per second; characters are revealed in chunks
     """
     placeholder = st.empty()
-    displayed_text = ""
-    
-    for char in text:
-        displayed_text += char
-        placeholder.markdown(f">{displayed_text}▌")
-        time.sleep(speed)
-    
+    frame_interval = 1.0 / fps if fps > 0 else 0
+    # Reveal as many characters per frame as the per-character speed allows
+    chunk_size = max(1, int(frame_interval / speed)) if speed > 0 else len(text) or 1
+
+    for end in range(chunk_size, len(text), chunk_size):
+        placeholder.markdown(f">{text[:end]}▌")
+        time.sleep(min(frame_interval, speed * chunk_size))
+
     # Final display without cursor
-    placeholder.markdown(f">{displayed_text}")
\ No newline at end of file
+    placeholder.markdown(f">{text}")
+
+
+class StreamingMarkdown:
+    """
+    Render streamed tokens into a single placeholder, re-rendering at most fps times
+    per second. Tokens may be tagged with a batch index; batches are shown in order.
+    Safe to call from worker threads.
+    """
+
+    def __init__(self, placeholder=None, fps=STREAM_RENDER_FPS):
+        self.placeholder = placeholder if placeholder is not None else st.empty()
+        self.frame_interval = 1.0 / fps if fps > 0 else 0
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.frames = 0
+        self._parts = {}
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+        self._ctx = get_script_run_ctx()
+
+    def __call__(self, token, batch=0):
+        # Worker threads need the script context to write to the page
+        if self._ctx is not None and get_script_run_ctx() is None:
+            add_script_run_ctx(threading.current_thread(), self._ctx)
+
+        with self._lock:
+            now = time.perf_counter()
+            if self.first_token_at is None:
+                self.first_token_at = now
+            self._parts.setdefault(batch, []).append(token)
+            if now - self._last_render >= self.frame_interval:
+                self._render(f">{self.text}▌")
+                self._last_render = now
+
+    @property
+    def text(self):
+        return "\n\n".join("".join(self._parts[batch]) for batch in sorted(self._parts))
+
+    @property
+    def ttft_ms(self):
+        if self.first_token_at is None:
+            return None
+        return (self.first_token_at - self.started_at) * 1000
+
+    def _render(self, markdown):
+        with span("ui_render"):
+            self.placeholder.markdown(markdown)
+        self.frames += 1
+
+    def finish(self, text=None):
+        """Render the final text (defaults to the streamed text) without a cursor."""
+        with self._lock:
+            self._render(f">{self.text if text is None else text}")
@@ -0,0 +1,186 @@
+"""
+Local stand-in for the OpenAI-compatible inference endpoint used by the demo apps,
+for load testing without GPU time. Per-request overrides are read from the
+x-mock-latency-ms, x-mock-tokens-per-second and x-mock-error-rate headers.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+
+from decouple import config
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+logging.basicConfig(level=config('LOG_LEVEL', default='INFO'))
+logger = logging.getLogger("mock_inference")
+
+MOCK_MODELS = [name.strip() for name in config(
+    'MOCK_MODELS', default='llama-vision,llama-vision-llama-3-1,llama-3-1-8b-instruct'
+).split(',') if name.strip()]
+# Time before the first token (prefill), plus an extra delay per attached image
+MOCK_LATENCY_MS = config('MOCK_LATENCY_MS', default=300, cast=float)
+MOCK_IMAGE_LATENCY_MS = config('MOCK_IMAGE_LATENCY_MS', default=200, cast=float)
+MOCK_TOKENS_PER_SECOND = config('MOCK_TOKENS_PER_SECOND', default=50, cast=float)
+MOCK_COMPLETION_TOKENS = config('MOCK_COMPLETION_TOKENS', default=200, cast=int)
+# Fraction of completion requests answered with one of MOCK_ERROR_STATUSES
+MOCK_ERROR_RATE = config('MOCK_ERROR_RATE', default=0.0, cast=float)
+MOCK_ERROR_STATUSES = [int(status) for status in config('MOCK_ERROR_STATUSES', default='429,503').split(',')]
+# Prompt tokens charged per image, as reported in usage
+MOCK_IMAGE_TOKENS = config('MOCK_IMAGE_TOKENS', default=1601, cast=int)
+# Fixed response text; empty generates filler text of MOCK_COMPLETION_TOKENS words
+MOCK_RESPONSE_TEXT = config('MOCK_RESPONSE_TEXT', default='')
+
+FILLER_WORDS = (
+    "the patient document shows values extracted from the page including name date "
+    "medication dose status flight departure arrival table row field result"
+).split()
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def inspect_messages(messages):
+    """Return (prompt token estimate, image count, total image data URL bytes)."""
+    prompt_tokens = 0
+    images = 0
+    image_bytes = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt_tokens += estimate_tokens(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                prompt_tokens += estimate_tokens(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                images += 1
+                image_bytes += len((part.get("image_url") or {}).get("url", ""))
+                prompt_tokens += MOCK_IMAGE_TOKENS
+    return prompt_tokens, images, image_bytes
+
+
+def completion_tokens(max_tokens):
+    """Split the response into the token strings that will be generated."""
+    if MOCK_RESPONSE_TEXT:
+        words = MOCK_RESPONSE_TEXT.split(" ")
+    else:
+        count = MOCK_COMPLETION_TOKENS
+        words = [FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(count)]
+    if max_tokens:
+        words = words[:max_tokens]
+    return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+
+def header_float(request, name, default):
+    try:
+        return float(request.headers.get(name, default))
+    except ValueError:
+        return default
+
+
+async def list_models(request):
+    created = int(time.time())
+    return JSONResponse({
+        "object": "list",
+        "data": [{"id": name, "object": "model", "created": created, "owned_by": "mock"} for name in MOCK_MODELS]
+    })
+
+
+async def chat_completions(request: Request):
+    received_at = time.perf_counter()
+    body = await request.body()
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        return JSONResponse({"error": {"message": "invalid JSON body"}}, status_code=400)
+
+    model = payload.get("model", "")
+    messages = payload.get("messages", [])
+    stream = bool(payload.get("stream"))
+    include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+    prompt_tokens, images, image_bytes = inspect_messages(messages)
+
+    logger.info(f"POST /chat/completions model={model} stream={stream} body={len(body) / 1024:.1f}KB "
+                f"messages={len(messages)} images={images} image_data={image_bytes / 1024:.1f}KB "
+                f"prompt_tokens~{prompt_tokens}")
+
+    error_rate = header_float(request, "x-mock-error-rate", MOCK_ERROR_RATE)
+    if random.random() < error_rate:
+        status = random.choice(MOCK_ERROR_STATUSES)
+        logger.info(f"Injecting HTTP {status}")
+        return JSONResponse({"error": {"message": f"mock injected error {status}", "type": "mock_error"}},
+                            status_code=status)
+
+    latency = header_float(request, "x-mock-latency-ms", MOCK_LATENCY_MS) + images * MOCK_IMAGE_LATENCY_MS
+    tokens_per_second = header_float(request, "x-mock-tokens-per-second", MOCK_TOKENS_PER_SECOND)
+    token_interval = 1.0 / tokens_per_second if tokens_per_second > 0 else 0
+    tokens = completion_tokens(payload.get("max_tokens"))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens + len(tokens)
+    }
+
+    await asyncio.sleep(latency / 1000)
+
+    if not stream:
+        await asyncio.sleep(token_interval * len(tokens))
+        logger.info(f"Completed {completion_id} in {time.perf_counter() - received_at:.2f}s")
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def chunk(delta, finish_reason=None):
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    async def events():
+        yield f"data: {json.dumps(chunk({'role': 'assistant', 'content': ''}))}\n\n"
+        for token in tokens:
+            yield f"data: {json.dumps(chunk({'content': token}))}\n\n"
+            await asyncio.sleep(token_interval)
+        yield f"data: {json.dumps(chunk({}, 'stop'))}\n\n"
+        if include_usage:
+            yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+        logger.info(f"Streamed {completion_id} in {time.perf_counter() - received_at:.2f}s")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+routes = [
+    Route("/v1/models", list_models, methods=["GET"]),
+    Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    # Same API without the version prefix, like the /api/v1 gateway paths
+    Route("/models", list_models, methods=["GET"]),
+    Route("/chat/completions", chat_completions, methods=["POST"]),
+    Route("/health", health, methods=["GET"]),
+]
+
+app = Starlette(routes=routes)
@@ -0,0 +1,168 @@
+"""
+Headless HTTP API over the same analysis path as the Streamlit UI, for pipelines
+that push documents without a browser in the loop.
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8080
+
+POST /analyze takes a multipart upload ("file", plus optional "prompt", "model",
+"stream" and "tiling" fields) and returns the extraction as JSON, or as server-sent
+events ("token", then "result" or "error") when stream is true.
+The upstream API key defaults to API_KEY and can be overridden per request with
+an "Authorization: Bearer" header.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from decouple import config
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from config.prompts import DEFAULT_PROMPT
+from config.settings import API_MAX_CONCURRENCY, API_MAX_UPLOAD_MB
+from utils.api_handler import analyze_image
+from utils.image_processor import preprocess_image
+from utils.metrics import REGISTRY
+from utils.startup import record_startup, startup_report
+
+logging.basicConfig(level=config('LOG_LEVEL', default='INFO'))
+logger = logging.getLogger("ocr_api")
+
+API_ENDPOINT = config('API_ENDPOINT', default='https://nai.tmelab.net/api/v1')
+API_KEY = config('API_KEY', default='')
+VISION_MODEL_NAME = config('VISION_MODEL_NAME', default='llama-vision')
+
+_analysis_slots = asyncio.Semaphore(API_MAX_CONCURRENCY)
+
+
+def _flag(value, default):
+    if value is None or value == "":
+        return default
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def _summarize(result):
+    """Flatten an analyze_image result into the API response body."""
+    return {
+        "content": result["choices"][0]["message"]["content"],
+        "model": result.get("model"),
+        "usage": result.get("usage"),
+        "cache_hit": bool(result.get("cache_hit")),
+        "ttft_ms": result.get("ttft_ms"),
+        "tile_stats": result.get("tile_stats"),
+    }
+
+
+def _run_analysis(api_endpoint, image_bytes, prompt, on_token=None, tiling=None):
+    """Preprocess and analyze one image; runs on a worker thread."""
+    processed_image = preprocess_image(image_bytes)
+    if processed_image is None:
+        return {"error": "Failed to process the image"}
+    return analyze_image(api_endpoint, processed_image, prompt, on_token=on_token,
+                         source_image=image_bytes, tiling=tiling)
+
+
+async def analyze(request: Request):
+    max_bytes = API_MAX_UPLOAD_MB * 1024 * 1024
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        return JSONResponse({"error": f"Upload exceeds {API_MAX_UPLOAD_MB}MB"}, status_code=413)
+
+    try:
+        form = await request.form(max_files=1)
+    except Exception as e:
+        return JSONResponse({"error": f"Invalid multipart body: {str(e)}"}, status_code=400)
+    upload = form.get("file")
+    if upload is None or isinstance(upload, str):
+        return JSONResponse({"error": "Missing 'file' upload"}, status_code=400)
+    file_bytes = await upload.read()
+    await form.close()
+    if not file_bytes:
+        return JSONResponse({"error": "Empty 'file' upload"}, status_code=400)
+    if len(file_bytes) > max_bytes:
+        return JSONResponse({"error": f"Upload exceeds {API_MAX_UPLOAD_MB}MB"}, status_code=413)
+
+    authorization = request.headers.get("authorization", "")
+    api_endpoint = {
+        "url": API_ENDPOINT,
+        "model_name": form.get("model") or VISION_MODEL_NAME,
+        "api_key": authorization[7:] if authorization.lower().startswith("bearer ") else API_KEY
+    }
+    prompt = form.get("prompt") or DEFAULT_PROMPT
+    stream = _flag(form.get("stream", request.query_params.get("stream")), False)
+    # Unset follows TILE_MODE
+    tiling = _flag(form.get("tiling"), None)
+    logger.info(f"POST /analyze file={upload.filename} size={len(file_bytes) / 1024:.1f}KB "
+                f"stream={stream} tiling={tiling}")
+
+    if not stream:
+        async with _analysis_slots:
+            result = await run_in_threadpool(_run_analysis, api_endpoint, file_bytes, prompt,
+                                             tiling=tiling)
+        if "error" in result:
+            return JSONResponse({"error": result["error"]}, status_code=502)
+        try:
+            return JSONResponse(_summarize(result))
+        except (KeyError, IndexError):
+            return JSONResponse({"error": "Unexpected API response format"}, status_code=502)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_token(token):
+        # Called from the analysis thread
+        loop.call_soon_threadsafe(events.put_nowait, ("token", {"text": token}))
+
+    async def run():
+        async with _analysis_slots:
+            try:
+                result = await run_in_threadpool(
+                    _run_analysis, api_endpoint, file_bytes, prompt, on_token, tiling)
+                if "error" in result:
+                    events.put_nowait(("error", {"error": result["error"]}))
+                else:
+                    events.put_nowait(("result", _summarize(result)))
+            except Exception as e:
+                logger.error(f"Analysis failed: {str(e)}")
+                events.put_nowait(("error", {"error": str(e)}))
+
+    # The analysis runs to completion (and fills the result cache) even if the client disconnects
+    task = asyncio.create_task(run())
+
+    async def event_stream():
+        while True:
+            event, data = await events.get()
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event != "token":
+                break
+        await task
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "startup": startup_report()})
+
+
+async def metrics(request):
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    record_startup("api_ready")
+    yield
+
+
+routes = [
+    Route("/analyze", analyze, methods=["POST"]),
+    Route("/health", health, methods=["GET"]),
+    Route("/metrics", metrics, methods=["GET"]),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
@@ -0,0 +1,66 @@
+import time
+
+import streamlit as st
+
+
+def _table_rows(rows, names):
+    # Images still in flight show as pending, so the table keeps upload order as results arrive
+    table = []
+    for name, row in zip(names, rows):
+        if row is None:
+            table.append({"file": name, "status": "pending", "text": "", "tokens": None, "latency_ms": None})
+            continue
+        tokens = None
+        if row["prompt_tokens"] is not None or row["completion_tokens"] is not None:
+            tokens = (row["prompt_tokens"] or 0) + (row["completion_tokens"] or 0)
+        table.append({
+            "file": row["file"],
+            "status": row["status"],
+            "text": row["text"] if row["status"] == "ok" else row["error"],
+            "tokens": tokens,
+            "latency_ms": row["latency_ms"],
+        })
+    return table
+
+
+def run_batch(api_endpoint, uploaded_files, prompt, tiling=None):
+    """Analyze a stack of uploads, streaming rows into a table. Returns the finished batch."""
+    from utils.batch import analyze_batch, images_per_minute
+
+    files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+    names = [name for name, _ in files]
+    rows = [None] * len(files)
+    progress = st.progress(0.0, text=f"0/{len(files)} images")
+    table = st.empty()
+
+    started_at = time.perf_counter()
+    for done, row in enumerate(analyze_batch(api_endpoint, files, prompt, tiling=tiling), 1):
+        rows[row.pop("index")] = row
+        rate = images_per_minute(done, time.perf_counter() - started_at)
+        progress.progress(done / len(files), text=f"{done}/{len(files)} images, {rate:.1f} images/min")
+        table.dataframe(_table_rows(rows, names), use_container_width=True, hide_index=True)
+
+    progress.empty()
+    table.empty()
+    return {"rows": rows, "elapsed_s": time.perf_counter() - started_at}
+
+
+def show_batch_results(batch):
+    """Results table, throughput and CSV/JSONL downloads for a finished batch."""
+    from utils.batch import images_per_minute, rows_to_csv, rows_to_jsonl
+
+    rows = batch["rows"]
+    failed = sum(1 for row in rows if row["status"] != "ok")
+    ok_column, failed_column, rate_column = st.columns(3)
+    ok_column.metric("Extracted", len(rows) - failed)
+    failed_column.metric("Failed", failed)
+    rate_column.metric("Images/min", f"{images_per_minute(len(rows), batch['elapsed_s']):.1f}")
+    st.caption(f"{len(rows)} images in {batch['elapsed_s']:.1f}s")
+
+    st.dataframe(_table_rows(rows, [row["file"] for row in rows]), use_container_width=True, hide_index=True)
+
+    csv_column, jsonl_column = st.columns(2)
+    csv_column.download_button("Download CSV", rows_to_csv(rows), file_name="ocr_results.csv",
+                               mime="text/csv", use_container_width=True)
+    jsonl_column.download_button("Download JSONL", rows_to_jsonl(rows), file_name="ocr_results.jsonl",
+                                 mime="application/x-ndjson", use_container_width=True)
@@ -1,17 +1,45 @@
 def upload_image():
     import streamlit as st
-    from PIL import Image
+    from config.settings import PREVIEW_WIDTH
+    from utils.preview import file_digest, image_preview
 
     st.header("Upload Image for OCR")
 
     uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
 
     if uploaded_file is not None:
-        # To read file as bytes:
-        image = Image.open(uploaded_file)
-        st.image(image, caption='Uploaded Image.', use_container_width=True)
+        # Decoded and downscaled once per file hash, not on every rerun
+        preview = image_preview(file_digest(uploaded_file), uploaded_file.getvalue())
+        st.image(preview, caption='Uploaded Image.', width=PREVIEW_WIDTH)
         st.write("")
         st.success("Image uploaded successfully!")
 
         return uploaded_file
     return None
+
+
+def upload_images():
+    import streamlit as st
+    from config.settings import PREVIEW_THUMBNAIL_WIDTH
+    from utils.preview import file_digest, image_preview
+
+    st.header("Upload Images for OCR")
+
+    uploaded_files = st.file_uploader("Choose images...", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
+
+    if uploaded_files:
+        total_mb = sum(uploaded_file.size for uploaded_file in uploaded_files) / (1024 * 1024)
+        st.success(f"{len(uploaded_files)} images uploaded ({total_mb:.1f}MB)")
+
+        # Thumbnails of a large stack render only when asked for
+        if st.toggle("Show thumbnails", key="batch_thumbnails"):
+            columns_per_row = 4
+            for row in range(0, len(uploaded_files), columns_per_row):
+                columns = st.columns(columns_per_row)
+                for column, uploaded_file in zip(columns, uploaded_files[row:row + columns_per_row]):
+                    preview = image_preview(file_digest(uploaded_file), uploaded_file.getvalue(),
+                                            PREVIEW_THUMBNAIL_WIDTH)
+                    column.image(preview, caption=uploaded_file.name, width=PREVIEW_THUMBNAIL_WIDTH)
+
+        return uploaded_files
+    return []
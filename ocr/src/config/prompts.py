@@ -0,0 +1,4 @@
+# prompts.py
+
+# Default extraction prompt, shared by the Streamlit UI and the HTTP API
+DEFAULT_PROMPT = 'You are a data analyst extracting text from licenses. Extract all the text that can be found in the image including the location. A donor that has a red heart next to the text indicates that the individual is a donor. Use a "Y" for donor and "N" for nondonor. Do not add any additional information. Format the results in a visually appealing table for a demo.'
@@ -1,3 +1,57 @@
 # settings.py
 
-# This file is intentionally left blank.
\ No newline at end of file
+from decouple import config
+
+# Vision request options
+VISION_MAX_TOKENS = config('VISION_MAX_TOKENS', default=1024, cast=int)
+VISION_TEMPERATURE = config('VISION_TEMPERATURE', default=0.3, cast=float)
+
+# Analysis result cache
+RESULT_CACHE_ENABLED = config('RESULT_CACHE_ENABLED', default=True, cast=bool)
+RESULT_CACHE_MEMORY_ENTRIES = config('RESULT_CACHE_MEMORY_ENTRIES', default=128, cast=int)
+# Directory for the on-disk tier shared by all processes in the container; empty disables it
+RESULT_CACHE_DIR = config('RESULT_CACHE_DIR', default='')
+RESULT_CACHE_DISK_MAX_MB = config('RESULT_CACHE_DISK_MAX_MB', default=256, cast=int)
+RESULT_CACHE_TTL_SECONDS = config('RESULT_CACHE_TTL_SECONDS', default=86400, cast=int)
+
+# Image preprocessing before upload
+IMAGE_OPTIMIZE_ENABLED = config('IMAGE_OPTIMIZE_ENABLED', default=True, cast=bool)
+# Longest side in pixels after downscaling; 0 disables the limit
+IMAGE_MAX_LONG_EDGE = config('IMAGE_MAX_LONG_EDGE', default=2048, cast=int)
+# Pixel budget (width x height) after downscaling; 0 disables the limit
+IMAGE_MAX_PIXELS = config('IMAGE_MAX_PIXELS', default=4_000_000, cast=int)
+# JPEG, WEBP or PNG
+IMAGE_FORMAT = config('IMAGE_FORMAT', default='JPEG')
+IMAGE_QUALITY = config('IMAGE_QUALITY', default=85, cast=int)
+IMAGE_GRAYSCALE = config('IMAGE_GRAYSCALE', default=False, cast=bool)
+IMAGE_AUTOCROP = config('IMAGE_AUTOCROP', default=True, cast=bool)
+
+# Tiled OCR for large, high-resolution images
+# auto tiles images whose long edge exceeds TILE_MIN_LONG_EDGE; off always sends one downscaled image
+TILE_MODE = config('TILE_MODE', default='auto')
+TILE_MIN_LONG_EDGE = config('TILE_MIN_LONG_EDGE', default=3000, cast=int)
+# Tile side in pixels and the overlap between neighbouring tiles
+TILE_SIZE = config('TILE_SIZE', default=1536, cast=int)
+TILE_OVERLAP = config('TILE_OVERLAP', default=128, cast=int)
+# Larger grids are scaled down to fit this many tiles
+TILE_MAX_TILES = config('TILE_MAX_TILES', default=16, cast=int)
+# Tile requests in flight at once per analysis
+TILE_CONCURRENCY = config('TILE_CONCURRENCY', default=4, cast=int)
+
+# Upload previews, rendered once per file and cached across reruns
+PREVIEW_WIDTH = config('PREVIEW_WIDTH', default=400, cast=int)
+PREVIEW_CACHE_ENTRIES = config('PREVIEW_CACHE_ENTRIES', default=256, cast=int)
+PREVIEW_THUMBNAIL_WIDTH = config('PREVIEW_THUMBNAIL_WIDTH', default=160, cast=int)
+
+# Batch upload in the UI: images analyzed at once
+BATCH_WORKERS = config('BATCH_WORKERS', default=4, cast=int)
+
+# Streaming responses
+STREAM_RESPONSES = config('STREAM_RESPONSES', default=True, cast=bool)
+# Maximum re-renders per second while tokens stream in
+STREAM_RENDER_FPS = config('STREAM_RENDER_FPS', default=12, cast=float)
+
+# Headless HTTP API (src/api_server.py)
+# Analyses run at once per API process; further requests wait for a slot
+API_MAX_CONCURRENCY = config('API_MAX_CONCURRENCY', default=8, cast=int)
+API_MAX_UPLOAD_MB = config('API_MAX_UPLOAD_MB', default=25, cast=int)
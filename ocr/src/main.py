@@ -1,11 +1,14 @@
 import streamlit as st
 from components.api_endpoint import create_api_endpoint_uploader
-from components.image_uploader import upload_image
+from components.batch_results import run_batch, show_batch_results
+from components.image_uploader import upload_image, upload_images
 from components.prompt_editor import edit_prompt
-from utils.api_handler import analyze_image
 from utils.image_processor import preprocess_image
+from utils.metrics import start_metrics_server
+from utils.startup import prewarm, record_startup
 from urllib.parse import urlparse
-from utils.text_effects import typing_effect
+from utils.text_effects import StreamingMarkdown, typing_effect
+from config.settings import STREAM_RESPONSES, TILE_MODE
 from decouple import config
 
 def is_valid_url(url):
@@ -16,6 +19,12 @@ def is_valid_url(url):
         return False
 
 def main():
+    # Prometheus metrics for this container, started once per process
+    start_metrics_server()
+
+    # The API client loads in the background while the page paints
+    prewarm("utils.api_handler", "utils.batch")
+
     # Configure page with custom styling
     st.set_page_config(layout="wide", page_title="Nutanix OCR Demo", page_icon="📄")
     
@@ -95,15 +104,27 @@ def main():
             model_name = st.text_input('Model Name', value=config('VISION_MODEL_NAME', default='llama-vision'))
             api_key = st.text_input('API Key', type='password', value=config('API_KEY', default=''))
 
-            # Image Upload Section
-            uploaded_image = upload_image()
+            # Image Upload Section; batch mode takes a stack of images and extracts them together
+            batch_mode = st.toggle("Batch mode")
+            if batch_mode:
+                uploaded_images = upload_images()
+                uploaded_image = None
+            else:
+                uploaded_image = upload_image()
 
             # Prompt Section
             st.subheader("Prompt Configuration")
             prompt = edit_prompt()
 
+            # Large originals are read tile by tile at full resolution instead of downscaled
+            tile_large_images = st.checkbox("Tile large images", value=TILE_MODE.lower() == 'auto')
+
             # Submit Button
-            submit_button = st.button("Analyze Image", use_container_width=True)
+            if batch_mode:
+                submit_button = st.button(f"Analyze {len(uploaded_images)} Images" if uploaded_images
+                                          else "Analyze Images", use_container_width=True)
+            else:
+                submit_button = st.button("Analyze Image", use_container_width=True)
             
             st.markdown('</div>', unsafe_allow_html=True)
 
@@ -112,8 +133,27 @@ def main():
         st.subheader("Results")
         
         # Process and display results
-        if submit_button and api_url and model_name and api_key and uploaded_image and prompt:
+        if batch_mode:
+            if submit_button and api_url and model_name and api_key and uploaded_images and prompt:
+                api_endpoint = {
+                    "url": api_url,
+                    "model_name": model_name,
+                    "api_key": api_key
+                }
+                # Kept across reruns, so the downloads do not clear the results
+                st.session_state["ocr_batch"] = run_batch(api_endpoint, uploaded_images, prompt,
+                                                          tiling=tile_large_images)
+            elif submit_button:
+                st.warning("Please fill in all fields before submitting.")
+            if st.session_state.get("ocr_batch"):
+                show_batch_results(st.session_state["ocr_batch"])
+
+        elif submit_button and api_url and model_name and api_key and uploaded_image and prompt:
             with st.spinner('Processing image...'):
+                # Usually already loaded by prewarm(); otherwise this waits for it
+                from utils.api_handler import analyze_image
+                from utils.tiling import should_tile
+
                 processed_image = preprocess_image(uploaded_image)
                 
                 if processed_image is None:
@@ -126,7 +166,13 @@ def main():
                     "api_key": api_key
                 }
 
-                result = analyze_image(api_endpoint, processed_image, prompt)
+                # Tokens render as they arrive when streaming is enabled
+                stream_view = StreamingMarkdown() if STREAM_RESPONSES else None
+                # The original is only copied out of the upload when it will be read tile by tile
+                source_image = (uploaded_image.getvalue() if should_tile(uploaded_image, tile_large_images)
+                                else None)
+                result = analyze_image(api_endpoint, processed_image, prompt, on_token=stream_view,
+                                       source_image=source_image, tiling=tile_large_images)
 
                 if "error" in result:
                     st.error(result["error"])
@@ -134,7 +180,25 @@ def main():
                     try:
                         content = result["choices"][0]["message"]["content"]
                         with st.container():
-                            typing_effect(content)
+                            if stream_view is not None and stream_view.first_token_at is not None:
+                                stream_view.finish(content)
+                            else:
+                                typing_effect(content)
+
+                        if result.get("ttft_ms") is not None:
+                            st.caption(f"Time to first token: {result['ttft_ms']:.0f}ms")
+
+                        tile_stats = result.get("tile_stats")
+                        if tile_stats:
+                            rows, columns = tile_stats["grid"]
+                            st.caption(f"Read as {tile_stats['tiles']} tiles ({rows}x{columns} grid) in "
+                                       f"{tile_stats['wall_ms'] / 1000:.1f}s, {tile_stats['speedup']:.1f}x "
+                                       f"faster than one tile at a time")
+                            with st.expander("Tile latency"):
+                                st.dataframe(tile_stats["tile_ms"], use_container_width=True)
+
+                        if result.get("cache_hit"):
+                            st.caption("Served from the result cache")
                     except (KeyError, IndexError) as e:
                         st.error("Unexpected API response format")
 
@@ -145,3 +209,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    record_startup("first_render")
@@ -1,17 +1,210 @@
-def analyze_image(api_endpoint, image, prompt):
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import filetype
+import requests
+
+from config.settings import (
+    TILE_CONCURRENCY,
+    TILE_MAX_TILES,
+    TILE_OVERLAP,
+    TILE_SIZE,
+    VISION_MAX_TOKENS,
+    VISION_TEMPERATURE,
+)
+from utils.http_client import get_session
+from utils.metrics import PAYLOAD_BYTES, observe_stage, record_cache, record_request, record_usage, span
+from utils.request_body import ChatRequestBody, InlineImage
+from utils.result_cache import get_result_cache, make_cache_key
+from utils.streaming import read_event_stream
+from utils.tiling import should_tile, split_image, stitch_tile_texts, tile_note
+
+logger = logging.getLogger(__name__)
+
+
+def _post_completion(url, headers, model_name, image, prompt, note=None, on_token=None):
+    """
+    Send one chat completion request for one image.
+    When on_token is given the response is streamed and on_token receives each content delta.
+    Returns:
+        tuple: (JSON response or error dict, seconds to the first streamed token or None)
+    """
+    # Detect image type
+    kind = filetype.guess(image)
+    if kind is None:
+        mime_type = 'application/octet-stream'  # fallback
+    else:
+        mime_type = kind.mime
+
+    content = [
+        { 
+            "type": "text", 
+            "text": prompt
+        }
+    ]
+    if note:
+        content.append({"type": "text", "text": note})
+    content.append({
+        "type": "image_url",
+        # Base64-encoded as the body is sent, straight from the image buffer
+        "image_url": {"url": InlineImage(image, mime_type)}
+    })
+
+    # Create message payload with structured content
+    messages = [
+        {
+            "role": "user",
+            "content": content
+        }
+    ]
+
+    # Prepare payload
+    payload = {
+        "model": model_name,
+        "messages": messages,
+        "max_tokens": VISION_MAX_TOKENS,
+        "stream": on_token is not None,
+        "temperature": VISION_TEMPERATURE
+    }
+    if on_token is not None:
+        payload["stream_options"] = {"include_usage": True}
+    with span("serialize"):
+        body = ChatRequestBody(payload)
+    PAYLOAD_BYTES.observe(len(body))
+
+    try:
+        started_at = time.perf_counter()
+        ttft = None
+        if on_token is not None:
+            with get_session().post(url, headers=headers, data=body, stream=True) as response:
+                response.raise_for_status()
+                result, ttft = read_event_stream(response, on_token, started_at)
+        else:
+            response = get_session().post(url, headers=headers, data=body)
+            response.raise_for_status()
+            result = response.json()
+
+    except requests.exceptions.RequestException as e:
+        record_request("error")
+        return {"error": f"API request failed: {str(e)}"}, None
+    except json.JSONDecodeError as e:
+        record_request("error")
+        return {"error": f"Failed to parse API response: {str(e)}"}, None
+
+    elapsed = time.perf_counter() - started_at
+    observe_stage("http_request", elapsed)
+    if ttft is not None:
+        observe_stage("first_token", ttft)
+        observe_stage("last_token", elapsed)
+    record_request("ok")
+    record_usage(result.get("usage"))
+    return result, ttft
+
+
+def _analyze_tiles(url, headers, model_name, source_image, prompt):
+    """
+    Read a large image tile by tile, TILE_CONCURRENCY requests at a time, and
+    stitch the tile texts into one completion-shaped response.
+    Returns:
+        dict: The stitched response with "tile_stats", or the first tile's error
+    """
+    with span("tile"):
+        grid, tiles = split_image(source_image)
+    sent = [tile for tile in tiles if not tile["blank"]]
+    if not sent:
+        return {"error": "Image processing failed: the image is blank"}
+
+    def send_tile(tile):
+        started_at = time.perf_counter()
+        result, _ = _post_completion(url, headers, model_name, tile["image"], prompt, note=tile_note(tile, grid))
+        return result, time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(TILE_CONCURRENCY, len(sent)))) as executor:
+        responses = list(executor.map(send_tile, sent))
+    wall_seconds = time.perf_counter() - started_at
+
+    for result, _ in responses:
+        if "error" in result:
+            return result
+
+    texts = [result["choices"][0]["message"]["content"] for result, _ in responses]
+    usage = {}
+    for result, _ in responses:
+        for key, value in (result.get("usage") or {}).items():
+            if isinstance(value, int):
+                usage[key] = usage.get(key, 0) + value
+
+    tile_seconds = [seconds for _, seconds in responses]
+    # Sequential requests would have taken the sum of the tile latencies
+    speedup = sum(tile_seconds) / wall_seconds if wall_seconds > 0 else 1.0
+    logger.info(f"Read {len(sent)} tiles ({grid[0]}x{grid[1]} grid, {len(tiles) - len(sent)} blank) "
+                f"in {wall_seconds:.2f}s, {speedup:.1f}x faster than one at a time")
+    return {
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": stitch_tile_texts(sent, texts)},
+                "finish_reason": "stop"
+            }
+        ],
+        "model": responses[0][0].get("model"),
+        "usage": usage,
+        "tile_stats": {
+            "tiles": len(sent),
+            "blank_tiles": len(tiles) - len(sent),
+            "grid": list(grid),
+            "tile_ms": [
+                {"row": tile["row"], "col": tile["col"], "ms": round(seconds * 1000, 1)}
+                for tile, seconds in zip(sent, tile_seconds)
+            ],
+            "wall_ms": round(wall_seconds * 1000, 1),
+            "sequential_ms": round(sum(tile_seconds) * 1000, 1),
+            "speedup": round(speedup, 2)
+        }
+    }
+
+
+def analyze_image(api_endpoint, image, prompt, on_token=None, source_image=None, tiling=None):
     """
     Send image analysis request to the API endpoint for OCR processing.
     Args:
         api_endpoint (dict): Contains url, model_name, and api_key
         image (bytes): Image data in bytes
         prompt (str): Prompt for the OCR analysis
+        on_token (callable): When given, the response is streamed and on_token
+            is called with each content delta as it arrives
+        source_image (bytes): The original upload, before downscaling. Large
+            originals are read tile by tile instead of as the downscaled image
+        tiling (bool): Override TILE_MODE; None follows the setting
     Returns:
-        dict: JSON response from the API
+        dict: JSON response from the API. "cache_hit" is True when the result
+            was served from the result cache; streamed responses carry "ttft_ms";
+            tiled reads carry "tile_stats" (tile count, per-tile latency, speedup).
     """
-    import requests
-    import base64
-    import json
-    import filetype
+    tiled = source_image is not None and should_tile(source_image, tiling)
+
+    # Identical image, prompt and model options give the same answer; skip the round trip
+    cache = get_result_cache()
+    cache_key = None
+    if cache is not None:
+        if tiled:
+            cache_key = make_cache_key(
+                source_image, prompt, api_endpoint["model_name"], VISION_TEMPERATURE, VISION_MAX_TOKENS,
+                url=api_endpoint["url"], tiles=[TILE_SIZE, TILE_OVERLAP, TILE_MAX_TILES]
+            )
+        else:
+            cache_key = make_cache_key(
+                image, prompt, api_endpoint["model_name"], VISION_TEMPERATURE, VISION_MAX_TOKENS,
+                url=api_endpoint["url"]
+            )
+        cached = cache.get(cache_key)
+        record_cache("result", cached is not None)
+        if cached is not None:
+            cached["cache_hit"] = True
+            return cached
 
     # Ensure URL ends with /chat/completions
     url = api_endpoint['url']
@@ -26,51 +219,21 @@ def analyze_image(api_endpoint, image, prompt):
     }
 
     try:
-        # Convert image to base64 and create content
-        image_b64 = base64.b64encode(image).decode()
-
-        # Detect image type
-        kind = filetype.guess(image)
-        if kind is None:
-            mime_type = 'application/octet-stream'  # fallback
+        ttft = None
+        if tiled:
+            # Tiles are read concurrently, so their responses are not streamed
+            result = _analyze_tiles(url, headers, api_endpoint["model_name"], source_image, prompt)
         else:
-            mime_type = kind.mime
+            result, ttft = _post_completion(url, headers, api_endpoint["model_name"], image, prompt,
+                                            on_token=on_token)
+        if "error" in result:
+            return result
 
-        # Create message payload with structured content
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    { 
-                        "type": "text", 
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:{mime_type};base64,{image_b64}"}
-                    }
-                ]
-            }
-        ]
-
-        # Prepare payload
-        payload = {
-            "model": api_endpoint["model_name"],
-            "messages": messages,
-            "max_tokens": 1024,
-            "stream": False,
-            "temperature": 0.3
-        }
-
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            return {"error": f"API request failed: {str(e)}"}
-        except json.JSONDecodeError as e:
-            return {"error": f"Failed to parse API response: {str(e)}"}
+        if cache is not None:
+            cache.set(cache_key, result)
+        if ttft is not None:
+            result["ttft_ms"] = round(ttft * 1000, 1)
+        return result
 
     except Exception as e:
-        return {"error": f"Image processing failed: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Image processing failed: {str(e)}"}
@@ -0,0 +1,93 @@
+"""
+Batch extraction for the OCR UI: a stack of uploaded images analyzed by a
+bounded worker pool, one result row per image as each finishes, exportable as
+CSV or JSON lines.
+"""
+import csv
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config.settings import BATCH_WORKERS
+from utils.api_handler import analyze_image
+from utils.image_processor import preprocess_image
+
+# Columns of the exported table, in order
+EXPORT_FIELDS = ["file", "status", "text", "prompt_tokens", "completion_tokens", "tiles", "cache_hit",
+                 "latency_ms", "error"]
+
+
+def analyze_file(api_endpoint, name, image_bytes, prompt, tiling=None):
+    """Preprocess and analyze one image. Returns its result row; errors are recorded, not raised."""
+    started_at = time.perf_counter()
+    row = {"file": name, "status": "error", "text": "", "prompt_tokens": None, "completion_tokens": None,
+           "tiles": None, "cache_hit": False, "latency_ms": None, "error": ""}
+    try:
+        processed_image = preprocess_image(image_bytes)
+        if processed_image is None:
+            row["error"] = "Failed to process the image"
+        else:
+            result = analyze_image(api_endpoint, processed_image, prompt, source_image=image_bytes, tiling=tiling)
+            if "error" in result:
+                row["error"] = result["error"]
+            else:
+                usage = result.get("usage") or {}
+                row.update({
+                    "status": "ok",
+                    "text": result["choices"][0]["message"]["content"],
+                    "prompt_tokens": usage.get("prompt_tokens"),
+                    "completion_tokens": usage.get("completion_tokens"),
+                    "tiles": (result.get("tile_stats") or {}).get("tiles"),
+                    "cache_hit": bool(result.get("cache_hit")),
+                })
+    except (KeyError, IndexError):
+        row["error"] = "Unexpected API response format"
+    except Exception as e:
+        row["error"] = str(e)
+    row["latency_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+    return row
+
+
+def analyze_batch(api_endpoint, files, prompt, workers=BATCH_WORKERS, tiling=None):
+    """
+    Analyze images with a pool of workers, yielding each result row as it finishes.
+    Args:
+        api_endpoint (dict): Contains url, model_name, and api_key
+        files (list): (file name, image bytes) pairs
+        prompt (str): Prompt for the OCR analysis
+        workers (int): Images analyzed at once
+        tiling (bool): Override TILE_MODE; None follows the setting
+    Yields:
+        dict: A result row (see EXPORT_FIELDS) with "index", the position of the file in files
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(files) or 1)))
+    try:
+        futures = {executor.submit(analyze_file, api_endpoint, name, image_bytes, prompt, tiling): index
+                   for index, (name, image_bytes) in enumerate(files)}
+        for future in as_completed(futures):
+            row = future.result()
+            row["index"] = futures[future]
+            yield row
+    finally:
+        # A batch abandoned part way (a Streamlit rerun) cancels the images not yet started
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def images_per_minute(count, seconds):
+    """Throughput of a batch so far."""
+    return count / seconds * 60 if seconds > 0 else 0.0
+
+
+def rows_to_csv(rows):
+    """Result rows as CSV text, one line per image."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def rows_to_jsonl(rows):
+    """Result rows as JSON lines, one object per image."""
+    return "".join(json.dumps({field: row.get(field) for field in EXPORT_FIELDS}) + "\n" for row in rows)
@@ -0,0 +1,93 @@
+# Shared module: chatbot/http_client.py is the canonical copy. Edit it there and run
+# "bash sync_shared.sh" to update the copies in the other apps (see README.md).
+import threading
+
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP client settings
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=5.0, cast=float)
+HTTP_READ_TIMEOUT = config('HTTP_READ_TIMEOUT', default=120.0, cast=float)
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=20, cast=int)
+HTTP_MAX_RETRIES = config('HTTP_MAX_RETRIES', default=3, cast=int)
+HTTP_BACKOFF_FACTOR = config('HTTP_BACKOFF_FACTOR', default=0.5, cast=float)
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+# Responses that mean the request was not processed and is safe to send again
+RETRY_STATUSES = (429, 502, 503, 504)
+
+_session = None
+_httpx_client = None
+_lock = threading.Lock()
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies DEFAULT_TIMEOUT when the caller does not pass one."""
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = DEFAULT_TIMEOUT
+        return super().send(request, **kwargs)
+
+
+def _retry_policy():
+    return Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        # A read timeout may mean the model is still generating; never resend those
+        read=0,
+        status=HTTP_MAX_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+def get_session():
+    """
+    Return the process-wide requests.Session.
+    Connections are pooled and kept alive across Streamlit reruns and sessions, every
+    request gets connect/read timeouts, and 429/5xx responses are retried with backoff.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = _TimeoutHTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=_retry_policy()
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def get_httpx_client():
+    """
+    Return the process-wide httpx.Client for OpenAI SDK based clients (ChatOpenAI).
+    The SDK retries 429/5xx itself (see HTTP_MAX_RETRIES); the transport retries
+    failed connects.
+    """
+    import httpx
+
+    global _httpx_client
+    with _lock:
+        if _httpx_client is None:
+            transport = httpx.HTTPTransport(
+                retries=HTTP_MAX_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_SIZE,
+                    max_keepalive_connections=HTTP_POOL_SIZE
+                )
+            )
+            _httpx_client = httpx.Client(
+                transport=transport,
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+            )
+    return _httpx_client
@@ -0,0 +1,45 @@
+import hashlib
+import io
+
+import streamlit as st
+from PIL import Image, ImageOps
+
+from config.settings import PREVIEW_CACHE_ENTRIES, PREVIEW_WIDTH
+from utils.metrics import span
+
+
+def file_digest(uploaded_file):
+    """SHA-256 of an upload, computed once per upload instead of on every rerun."""
+    file_id = getattr(uploaded_file, "file_id", None)
+    memo = st.session_state.setdefault("_preview_digest", {})
+    if file_id is not None and file_id in memo:
+        return memo[file_id]
+    digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    if file_id is not None:
+        # One entry per upload in view; a batch of uploads keeps all of theirs
+        while len(memo) >= PREVIEW_CACHE_ENTRIES:
+            memo.pop(next(iter(memo)))
+        memo[file_id] = digest
+    return digest
+
+
+def _encode_preview(image, width):
+    image = ImageOps.exif_transpose(image)
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+@st.cache_data(max_entries=PREVIEW_CACHE_ENTRIES, show_spinner=False)
+def image_preview(file_hash, _image_bytes, width=PREVIEW_WIDTH):
+    """JPEG thumbnail of an uploaded image at display width, rendered once per file hash and width."""
+    with span("preview"):
+        image = Image.open(io.BytesIO(_image_bytes))
+        # JPEGs decode straight at a reduced scale; covers either orientation after EXIF rotation
+        image.draft("RGB", (width, width))
+        return _encode_preview(image, width)
+
@@ -0,0 +1,126 @@
+# Shared module: ocr/src/utils/request_body.py is the canonical copy. Edit it there and run
+# "bash sync_shared.sh" to update the copies in the other apps (see README.md).
+"""
+Chat completion request bodies with inline images, encoded while they are sent.
+
+Building a vision request the usual way copies each image several times: the
+base64 string, the data URL, the serialized JSON and its encoded bytes, about
+five times the image size in transient memory. Here the payload is serialized
+once with a short placeholder per image. The base64 text for each image is then
+encoded from the original buffer, a block at a time, as the HTTP client reads the
+body, so peak memory per request stays at the image itself plus one block.
+"""
+import base64
+import bisect
+import io
+import json
+import uuid
+
+
+def base64_length(size):
+    """Length of the base64 encoding of size bytes, with padding."""
+    return -(-size // 3) * 4
+
+
+class InlineImage:
+    """Stands in for an image_url "url" string; serialized as a base64 data URL."""
+
+    __slots__ = ("data", "mime_type")
+
+    def __init__(self, data, mime_type):
+        self.data = memoryview(data).cast("B")
+        self.mime_type = mime_type
+
+
+class ChatRequestBody(io.RawIOBase):
+    """
+    A read-only, seekable file over the JSON encoding of payload, where each
+    InlineImage in the payload becomes a "data:<mime>;base64,..." string.
+    len(body) is the exact body size, so it is sent with a Content-Length rather
+    than chunked, and seek() lets retries resend it from the start.
+    """
+
+    def __init__(self, payload):
+        super().__init__()
+        marker = uuid.uuid4().hex
+        images = []
+
+        def placeholder(value):
+            if not isinstance(value, InlineImage):
+                raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+            images.append(value)
+            return f"{marker}:{len(images) - 1}"
+
+        skeleton = json.dumps(payload, default=placeholder)
+
+        # Alternate text and image segments; the placeholders always serialize as "marker:index"
+        self._segments = []
+        for index, image in enumerate(images):
+            before, skeleton = skeleton.split(f'"{marker}:{index}"', 1)
+            self._segments.append(f'{before}"data:{image.mime_type};base64,'.encode())
+            self._segments.append(image.data)
+            skeleton = '"' + skeleton
+        self._segments.append(skeleton.encode())
+
+        self._offsets = []
+        self._length = 0
+        for segment in self._segments:
+            self._offsets.append(self._length)
+            self._length += len(segment) if isinstance(segment, bytes) else base64_length(len(segment))
+        self._position = 0
+        self.image_sizes = [base64_length(len(image.data)) for image in images]
+
+    def __len__(self):
+        return self._length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._position = min(max(0, offset), self._length)
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = []
+        while size > 0 and self._position < self._length:
+            index = bisect.bisect_right(self._offsets, self._position) - 1
+            segment = self._segments[index]
+            offset = self._position - self._offsets[index]
+            if isinstance(segment, bytes):
+                chunk = segment[offset:offset + size]
+            else:
+                # Encode only the 3-byte groups that cover the requested span of base64 text
+                first_group = offset // 4
+                last_group = -(-min(offset + size, base64_length(len(segment))) // 4)
+                encoded = base64.b64encode(segment[first_group * 3:last_group * 3])
+                chunk = encoded[offset - first_group * 4:offset - first_group * 4 + size]
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def getvalue(self):
+        """The whole body as bytes."""
+        position = self._position
+        self.seek(0)
+        try:
+            return self.read()
+        finally:
+            self._position = position
@@ -0,0 +1,195 @@
+# Shared module: ocr/src/utils/result_cache.py is the canonical copy. Edit it there and run
+# "bash sync_shared.sh" to update the copies in the other apps (see README.md).
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config.settings import (
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK_MAX_MB,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_MEMORY_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(file_bytes, prompt, model_name, temperature, max_tokens, **extra):
+    """
+    Build a content-addressed key for an analysis request.
+    Args:
+        file_bytes (bytes): Uploaded file data
+        prompt (str): Prompt sent with the file
+        model_name (str): Model used for the analysis
+        temperature (float): Sampling temperature
+        max_tokens (int): Completion token limit
+        **extra: Any other request options that change the result
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(file_bytes).digest())
+    options = {
+        "prompt": prompt,
+        "model": model_name,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        **extra
+    }
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for analysis results: an in-memory LRU shared by every Streamlit
+    session in the process, and an optional directory of JSON files shared by every
+    process in the container. Both tiers expire entries after ttl_seconds.
+    """
+
+    def __init__(self, max_entries=128, cache_dir=None, max_disk_bytes=256 * 1024 * 1024, ttl_seconds=86400):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _expired(self, stored_at):
+        return bool(self.ttl_seconds) and time.time() - stored_at > self.ttl_seconds
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _disk_entries(self):
+        """Return (path, size, stored_at) for every file in the disk tier; set() keeps stored_at as the mtime."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    return copy.deepcopy(value)
+                del self._memory[key]
+
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as file:
+                record = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if self._expired(record["stored_at"]):
+            self._remove_disk_file(path)
+            return None
+
+        self._remember(key, record["stored_at"], record["value"])
+        return copy.deepcopy(record["value"])
+
+    def set(self, key, value):
+        """Store a JSON-serializable result under key in both tiers."""
+        stored_at = time.time()
+        self._remember(key, stored_at, copy.deepcopy(value))
+
+        if not self.cache_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump({"stored_at": stored_at, "value": value}, file)
+            # Eviction reads the expiry from the mtime instead of opening every file
+            os.utime(tmp_path, (stored_at, stored_at))
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced_size = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error writing result cache entry: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._disk_bytes += size - replaced_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, key, stored_at, value):
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _remove_disk_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict_disk(self):
+        """Delete expired, then oldest stored, files until under the size limit."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, stored_at in entries:
+            expired = self._expired(stored_at)
+            if not expired and total <= self.max_disk_bytes:
+                continue
+            self._remove_disk_file(path)
+            total -= size
+        self._disk_bytes = total
+        logger.info(f"Result cache disk tier trimmed to {total / (1024 * 1024):.1f}MB")
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide result cache, or None when caching is disabled."""
+    global _result_cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                max_entries=RESULT_CACHE_MEMORY_ENTRIES,
+                cache_dir=RESULT_CACHE_DIR or None,
+                max_disk_bytes=RESULT_CACHE_DISK_MAX_MB * 1024 * 1024,
+                ttl_seconds=RESULT_CACHE_TTL_SECONDS
+            )
+    return _result_cache
@@ -0,0 +1,165 @@
+"""
+Tiled OCR for large, high-resolution images. Downscaling a poster or a full
+scan to the upload limit makes small print unreadable, so large images are cut
+into a grid of overlapping tiles at (close to) full resolution instead, each
+tile is read by its own request, and the tile texts are stitched back together
+in reading order with the lines repeated across tile overlaps removed.
+"""
+import io
+import math
+import re
+
+from PIL import Image, ImageOps
+
+from config.settings import TILE_MAX_TILES, TILE_MIN_LONG_EDGE, TILE_MODE, TILE_OVERLAP, TILE_SIZE
+from utils.image_processor import AUTOCROP_THRESHOLD, encode_image
+
+# Lines shorter than this (after normalizing) are never treated as overlap duplicates
+MIN_DUPLICATE_LENGTH = 6
+
+
+def image_size(image_bytes):
+    """
+    (width, height) of encoded image data, read from the header without decoding.
+    image_bytes may also be a file object (a Streamlit upload), read in place and rewound.
+    """
+    file = image_bytes if hasattr(image_bytes, "read") else io.BytesIO(image_bytes)
+    position = file.tell()
+    try:
+        with Image.open(file) as image:
+            return image.size
+    finally:
+        file.seek(position)
+
+
+def should_tile(image_bytes, tiling=None):
+    """
+    Whether an image should be read tile by tile.
+    tiling overrides TILE_MODE: True tiles images whose long edge exceeds
+    TILE_MIN_LONG_EDGE, as auto does, and False never tiles.
+    """
+    if tiling is None:
+        tiling = TILE_MODE.lower() == 'auto'
+    if not tiling:
+        return False
+    try:
+        return max(image_size(image_bytes)) > TILE_MIN_LONG_EDGE
+    except Exception:
+        return False
+
+
+def _tile_count(length, tile_size, overlap):
+    if length <= tile_size:
+        return 1
+    return math.ceil((length - overlap) / (tile_size - overlap))
+
+
+def _tile_starts(length, tile_size, count):
+    # Spread the tiles evenly, so every overlap is at least the configured one
+    if count == 1:
+        return [0]
+    step = (length - tile_size) / (count - 1)
+    return [round(index * step) for index in range(count)]
+
+
+def plan_tiles(width, height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, max_tiles=TILE_MAX_TILES):
+    """
+    Cover a width x height image with a grid of overlapping tiles. When the grid
+    would need more than max_tiles tiles, the image is scaled down until it fits.
+    Returns:
+        tuple: (scale factor, (rows, columns), list of tile dicts with "row", "col"
+                and "box" in scaled pixels, in reading order)
+    """
+    overlap = min(overlap, tile_size // 2)
+    scale = 1.0
+    while True:
+        scaled_width, scaled_height = max(1, round(width * scale)), max(1, round(height * scale))
+        rows = _tile_count(scaled_height, tile_size, overlap)
+        columns = _tile_count(scaled_width, tile_size, overlap)
+        if rows * columns <= max(1, max_tiles):
+            break
+        scale *= 0.9
+
+    tiles = []
+    for row, top in enumerate(_tile_starts(scaled_height, tile_size, rows)):
+        for col, left in enumerate(_tile_starts(scaled_width, tile_size, columns)):
+            box = (left, top, min(scaled_width, left + tile_size), min(scaled_height, top + tile_size))
+            tiles.append({"row": row, "col": col, "box": box})
+    return scale, (rows, columns), tiles
+
+
+def split_image(image_bytes, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, max_tiles=TILE_MAX_TILES):
+    """
+    Cut an image into encoded, overlapping tiles. Tiles with nothing darker than
+    the auto-crop threshold are marked blank and not encoded.
+    Returns:
+        tuple: ((rows, columns), list of tile dicts with "row", "col", "box", "blank"
+                and "image" (encoded bytes, None for blank tiles))
+    """
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    scale, grid, tiles = plan_tiles(image.width, image.height, tile_size, overlap, max_tiles)
+    if scale < 1.0:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.LANCZOS)
+
+    for tile in tiles:
+        crop = image.crop(tile["box"])
+        tile["blank"] = crop.convert("L").getextrema()[0] > AUTOCROP_THRESHOLD
+        # Tiles are already within the upload limits; cropping their margins would shift the overlaps
+        tile["image"] = None if tile["blank"] else encode_image(crop, autocrop=False)
+    return grid, tiles
+
+
+def tile_note(tile, grid):
+    """Context sent with each tile's prompt."""
+    rows, columns = grid
+    return (f"This image is the tile at row {tile['row'] + 1} of {rows}, column {tile['col'] + 1} of {columns} "
+            "of a larger image, cut with overlapping edges. Transcribe only what is in this tile; "
+            "text cut off at an edge is completed by the neighbouring tile.")
+
+
+def _normalize(line):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", line.lower())).strip()
+
+
+def _is_duplicate(line, seen):
+    if len(line) < MIN_DUPLICATE_LENGTH:
+        return False
+    return any(line == other or line in other or (len(other) >= MIN_DUPLICATE_LENGTH and other in line)
+               for other in seen)
+
+
+def stitch_tile_texts(tiles, texts):
+    """
+    Join the texts read from each tile in reading order (row by row, left to right),
+    dropping lines that repeat a line of an already placed neighbour tile (left,
+    above, or diagonally above), which is text read twice from an overlap.
+    Args:
+        tiles (list): Tile dicts with "row" and "col"
+        texts (list): Text read from each tile, in the same order
+    Returns:
+        str: The stitched text
+    """
+    placed = {}
+    sections = []
+    for tile, text in sorted(zip(tiles, texts), key=lambda item: (item[0]["row"], item[0]["col"])):
+        row, col = tile["row"], tile["col"]
+        seen = set()
+        for neighbour in ((row, col - 1), (row - 1, col - 1), (row - 1, col), (row - 1, col + 1)):
+            seen.update(placed.get(neighbour, ()))
+
+        kept = []
+        normalized_lines = []
+        for line in (text or "").splitlines():
+            normalized = _normalize(line)
+            if normalized and _is_duplicate(normalized, seen):
+                continue
+            kept.append(line)
+            if normalized:
+                normalized_lines.append(normalized)
+        placed[(row, col)] = normalized_lines
+
+        section = "\n".join(kept).strip()
+        if section:
+            sections.append(section)
+    return "\n\n".join(sections)
@@ -0,0 +1,31 @@
+# Each app is built from its own Docker context, so modules shared between apps
+# are kept as copies. Edit the canonical copy (first path on each line), then
+# run "bash sync_shared.sh" to copy it over the others, or
+# "bash sync_shared.sh check" to list copies that differ from it.
+SHARED="
+chatbot/http_client.py flight_info/http_client.py healthcare/src/utils/http_client.py ocr/src/utils/http_client.py
+chatbot/metrics.py flight_info/metrics.py healthcare/src/utils/metrics.py ocr/src/utils/metrics.py
+chatbot/startup.py flight_info/startup.py
+ocr/src/utils/startup.py healthcare/src/utils/startup.py
+ocr/src/utils/result_cache.py healthcare/src/utils/result_cache.py
+ocr/src/utils/request_body.py healthcare/src/utils/request_body.py
+"
+
+cd "$(dirname "$0")" || exit 1
+status=0
+while read -r canonical copies; do
+	[ -n "$canonical" ] || continue
+	for copy in $copies; do
+		if [ "$1" = "check" ]; then
+			if ! cmp -s "$canonical" "$copy"; then
+				echo "$copy differs from $canonical"
+				status=1
+			fi
+		else
+			cp "$canonical" "$copy"
+		fi
+	done
+done <<END
+$SHARED
+END
+exit $status